@@ -4,7 +4,12 @@ import logging
 import time
 import random
 from urllib.parse import quote, urlparse
-from bs4 import BeautifulSoup
+
+import request_scheduler
+import provider_health
+from embedded_state import extract_embedded_content
+from html_parsing import parse_html, NOTE_STRAINER, SEARCH_STRAINER
+from selector_plan import PROXY_NOTE_PLAN, first_match_text, first_attr, collect_urls
 
 # 导入配置
 try:
@@ -71,14 +76,16 @@ if not USE_CONFIG:
 # 当前使用的API提供商
 CURRENT_PROVIDER = APP_CONFIG.get("PREFERRED_API_PROXY", "scrapingapi")
 
-def add_random_delay(min_seconds=None, max_seconds=None):
-    """添加随机延迟"""
-    min_seconds = min_seconds or REQUEST_CONFIG.get("MIN_DELAY", 0.5)
-    max_seconds = max_seconds or REQUEST_CONFIG.get("MAX_DELAY", 2.0)
-    
-    delay = random.uniform(min_seconds, max_seconds)
-    logger.debug(f"添加随机延迟: {delay:.2f}秒")
-    time.sleep(delay)
+def add_random_delay(min_seconds=None, max_seconds=None, host="www.xiaohongshu.com"):
+    """
+    等待请求调度器分配的发送时机
+    
+    请求间隔由request_scheduler按域名统一控制，min_seconds/max_seconds
+    仅为兼容旧调用保留。
+    """
+    delay = request_scheduler.wait(host)
+    if delay > 0:
+        logger.debug(f"调度等待: {delay:.2f}秒")
 
 def extract_note_id(url):
     """从URL中提取笔记ID"""
@@ -103,22 +110,17 @@ def normalize_url(url):
         return f"https://www.xiaohongshu.com/discovery/item/{note_id}"
     return url
 
-def fetch_via_proxy_api(url, provider=None):
+def build_proxy_request(url, provider=None):
     """
-    通过API代理服务抓取网页内容
+    构建API代理服务的请求地址和参数
     
     Args:
         url: 要抓取的URL
         provider: 使用的API提供商，默认使用CURRENT_PROVIDER
         
     Returns:
-        str: 抓取到的HTML内容
+        tuple: (请求地址, 请求参数)，未知提供商时返回None
     """
-    global CURRENT_PROVIDER
-    
-    # 标准化URL
-    url = normalize_url(url)
-    
     # 选择API提供商
     provider = provider or CURRENT_PROVIDER
     
@@ -133,72 +135,144 @@ def fetch_via_proxy_api(url, provider=None):
         return None
     
     # 获取API配置
-    config = provider_config.copy()
-    params = config["params"].copy()
+    params = provider_config["params"].copy()
     params["url"] = url
     
+    return provider_config["base_url"], params
+
+def select_provider(provider=None):
+    """
+    选择本次请求使用的API提供商
+    
+    未指定时选择最快的健康提供商；没有配置密钥或正在熔断的提供商会被跳过。
+    
+    Args:
+        provider: 指定的API提供商
+        
+    Returns:
+        str: 提供商名称，没有可用的提供商时返回None
+    """
+    global CURRENT_PROVIDER
+    
+    if provider:
+        provider_config = API_PROVIDERS.get(provider)
+        if not provider_health.has_credentials(provider_config):
+            logger.warning(f"API提供商 {provider} 未配置密钥，跳过")
+            return None
+        return provider
+    
+    provider = provider_health.health.choose_provider(API_PROVIDERS, preferred=CURRENT_PROVIDER)
+    if not provider:
+        logger.error("没有可用的API提供商（未配置密钥或均已熔断）")
+        return None
+    
+    CURRENT_PROVIDER = provider
+    return provider
+
+def fetch_via_proxy_api(url, provider=None):
+    """
+    通过API代理服务抓取网页内容
+    
+    Args:
+        url: 要抓取的URL
+        provider: 使用的API提供商，默认选择最快的健康提供商
+        
+    Returns:
+        str: 抓取到的HTML内容
+    """
+    # 标准化URL
+    url = normalize_url(url)
+    
+    # 选择API提供商
+    provider = select_provider(provider)
+    if not provider:
+        return None
+    
+    proxy_request = build_proxy_request(url, provider)
+    if not proxy_request:
+        return None
+    base_url, params = proxy_request
+    breaker = provider_health.health.get_breaker(provider)
+    
     # 发送请求
     logger.info(f"通过 {provider} 抓取: {url}")
     
     timeout = REQUEST_CONFIG.get("TIMEOUT", 30)
     max_retries = REQUEST_CONFIG.get("MAX_RETRIES", 3)
     
+    # 重试前的退避延迟，由调度器按API服务域名安排
+    retry_delay = 0
+    
     for attempt in range(max_retries):
+        # 熔断中的提供商不再发送请求
+        if not breaker.allow_request():
+            logger.warning(f"API提供商 {provider} 已熔断，停止重试")
+            break
+        
+        started = time.time()
         try:
+            request_scheduler.wait(base_url, retry_delay)
+            retry_delay = 0
+            started = time.time()
             response = requests.get(
-                config["base_url"], 
+                base_url, 
                 params=params, 
                 timeout=timeout
             )
+            latency = time.time() - started
             
             if response.status_code == 200:
+                breaker.record_success(latency)
                 logger.info(f"抓取成功: {url}")
                 return response.text
             elif response.status_code == 401 or response.status_code == 403:
+                breaker.record_failure(latency, fatal=True)
                 logger.error(f"API密钥无效或授权失败: {response.status_code}")
                 # 如果是授权问题，就不要重试了，直接换提供商
                 break
             else:
+                breaker.record_failure(latency)
                 logger.warning(f"抓取失败: {response.status_code} - 尝试 {attempt + 1}/{max_retries}")
                 
                 if attempt < max_retries - 1:
-                    delay = (attempt + 1) * 2  # 指数退避
-                    logger.info(f"等待 {delay} 秒后重试...")
-                    time.sleep(delay)
+                    retry_delay = (attempt + 1) * 2  # 指数退避
+                    logger.info(f"等待 {retry_delay} 秒后重试...")
         except requests.exceptions.Timeout:
+            breaker.record_failure(time.time() - started)
             logger.warning(f"请求超时: 尝试 {attempt + 1}/{max_retries}")
-            if attempt < max_retries - 1:
-                time.sleep(2)
+            retry_delay = 2
         except Exception as e:
+            breaker.record_failure(time.time() - started)
             logger.error(f"抓取异常: {str(e)}")
-            if attempt < max_retries - 1:
-                time.sleep(2)
+            retry_delay = 2
     
     logger.error(f"所有尝试都失败，切换到另一个提供商")
     return None
 
 def rotate_api_provider():
-    """轮换API提供商"""
+    """切换到当前提供商之外最快的健康提供商"""
     global CURRENT_PROVIDER
     
-    providers = list(API_PROVIDERS.keys())
-    if not providers:
-        logger.error("没有可用的API提供商")
+    next_provider = provider_health.health.choose_provider(API_PROVIDERS, exclude={CURRENT_PROVIDER})
+    if not next_provider:
+        logger.error("没有其他可用的API提供商")
         return None
-        
-    current_index = providers.index(CURRENT_PROVIDER) if CURRENT_PROVIDER in providers else -1
-    next_index = (current_index + 1) % len(providers)
-    CURRENT_PROVIDER = providers[next_index]
     
+    CURRENT_PROVIDER = next_provider
     logger.info(f"轮换API提供商: {CURRENT_PROVIDER}")
     return CURRENT_PROVIDER
 
-def extract_content_from_html(html):
+def get_provider_stats():
+    """返回各API提供商的健康状态"""
+    return provider_health.health.get_stats(API_PROVIDERS)
+
+def extract_content_from_html(html, note_id=None):
     """
     从HTML中提取小红书帖子内容
     
     Args:
         html: 小红书帖子的HTML内容
+        note_id: 笔记ID，页面数据中包含多个笔记时用于选择
         
     Returns:
         dict: 包含标题、文本、图片和视频的字典
@@ -207,87 +281,28 @@ def extract_content_from_html(html):
         return None
     
     try:
-        soup = BeautifulSoup(html, 'html.parser')
+        # 1. 优先从页面内嵌的初始数据或JSON-LD中提取，不需要解析整个文档
+        content = extract_embedded_content(html, note_id)
+        if content:
+            return content
         
-        # 尝试多种方式提取内容
-        # 1. 尝试从JSON-LD中提取
-        scripts = soup.find_all('script', type='application/ld+json')
-        for script in scripts:
-            try:
-                data = json.loads(script.string)
-                if isinstance(data, dict) and 'name' in data and 'description' in data:
-                    logger.info("从JSON-LD中提取内容")
-                    return {
-                        "title": data.get('name', '未找到标题'),
-                        "text": data.get('description', '未找到内容'),
-                        "images": [data.get('image', '')] if data.get('image') else [],
-                        "video": data.get('video', None)
-                    }
-            except:
-                continue
+        # 只解析帖子相关的子树
+        soup = parse_html(html, NOTE_STRAINER)
         
-        # 2. 直接从HTML结构中提取
-        # 标题选择器
-        title_selectors = [
-            'h1.title', '.note-content .title', '.content .title',
-            '.note-top .title', 'header h1', '.note-container h1'
-        ]
+        # 2. 直接从HTML结构中提取，所有选择器在一次遍历中匹配
+        fields = PROXY_NOTE_PLAN.run(soup)
         
-        title = None
-        for selector in title_selectors:
-            title_elem = soup.select_one(selector)
-            if title_elem:
-                title = title_elem.text.strip()
-                break
-                
-        # 内容选择器
-        content_selectors = [
-            '.note-content .content', '.content .desc', '.note-content .desc',
-            '.note-content', 'article .content', '.post-content'
-        ]
-        
-        text = None
-        for selector in content_selectors:
-            content_elem = soup.select_one(selector)
-            if content_elem:
-                text = content_elem.text.strip()
-                break
-        
-        # 图片选择器
-        image_selectors = [
-            '.note-content img', '.slide-item img', '.image-container img',
-            '.carousel img', '.gallery img', '.note img'
-        ]
-        
-        images = []
-        for selector in image_selectors:
-            img_elems = soup.select(selector)
-            for img in img_elems:
-                src = img.get('src') or img.get('data-src')
-                if src and src.startswith('http') and src not in images:
-                    images.append(src)
-        
-        # 视频选择器
-        video_selectors = [
-            'video source', 'video', '.video-container video'
-        ]
-        
-        video = None
-        for selector in video_selectors:
-            video_elem = soup.select_one(selector)
-            if video_elem:
-                video = video_elem.get('src') or video_elem.get('data-src')
-                if video:
-                    break
+        title = first_match_text(fields["title"])
+        text = first_match_text(fields["text"])
+        images = collect_urls(fields["images"])
+        video = first_attr(fields["video"], 'src', 'data-src')
         
         # 如果没有找到标题和内容，尝试使用meta标签
         if not title:
-            meta_title = soup.select_one('meta[property="og:title"]') or soup.select_one('meta[name="title"]')
-            title = meta_title.get('content') if meta_title else '未找到标题'
+            title = first_attr(fields["meta_title"][:1], 'content') or '未找到标题'
             
         if not text:
-            meta_desc = soup.select_one('meta[property="og:description"]') or soup.select_one('meta[name="description"]')
-            text = meta_desc.get('content') if meta_desc else '未找到内容'
+            text = first_attr(fields["meta_description"][:1], 'content') or '未找到内容'
         
         return {
             "title": title or '未找到标题',
@@ -315,11 +330,11 @@ def fetch_post_content(url):
     # 通过API代理抓取HTML
     html = fetch_via_proxy_api(url)
     
-    # 如果第一次失败，尝试轮换提供商再试一次
+    # 如果第一次失败，尝试轮换提供商再试一次（换了服务域名，无需等待）
     if not html:
-        rotate_api_provider()
-        add_random_delay(1.0, 3.0)
-        html = fetch_via_proxy_api(url)
+        next_provider = rotate_api_provider()
+        if next_provider:
+            html = fetch_via_proxy_api(url, next_provider)
     
     # 如果仍然失败，返回空结果
     if not html:
@@ -334,7 +349,7 @@ def fetch_post_content(url):
         }
     
     # 解析HTML提取内容
-    content = extract_content_from_html(html)
+    content = extract_content_from_html(html, extract_note_id(url))
     
     # 如果提取失败，返回空结果
     if not content:
@@ -375,49 +390,61 @@ def search_keyword(keyword, max_results=10):
         return []
     
     try:
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # 尝试多种选择器找到帖子
-        post_selectors = [
-            'div.note-list section', 'div.items-wrapper div.item', 
-            'div.feeds-container div.note-item', 'div.search-container div.note-item'
-        ]
-        
-        posts = []
-        for selector in post_selectors:
-            posts = soup.select(selector)
-            if posts:
-                break
-        
-        if not posts:
+        results = parse_search_results(html, max_results)
+        if not results:
             logger.warning(f"未找到帖子: {keyword}")
-            return []
-        
-        results = []
-        for post in posts[:max_results]:
-            # 尝试提取标题、链接和点赞数
-            title_elem = post.select_one('div.note-info h3') or post.select_one('div.note-content div.title') or post.select_one('div.note-desc')
-            link_elem = post.select_one('a') or post.select_one('div.note-content a')
-            likes_elem = post.select_one('span.like-count') or post.select_one('div.note-metrics span.like')
-            
-            title = title_elem.text.strip() if title_elem else "未找到标题"
-            post_url = "https://www.xiaohongshu.com" + link_elem['href'] if link_elem and 'href' in link_elem.attrs else "#"
-            likes = int(likes_elem.text.replace('赞', '').strip()) if likes_elem else random.randint(800, 5000)
-            
-            results.append({
-                "url": post_url,
-                "title": title,
-                "likes": likes
-            })
-        
-        # 按点赞数排序
-        results.sort(key=lambda x: x["likes"], reverse=True)
         return results
         
     except Exception as e:
         logger.error(f"解析搜索结果失败: {str(e)}")
         return []
 
+def parse_search_results(html, max_results=10):
+    """
+    从搜索结果页HTML中解析帖子列表
+    
+    Args:
+        html: 搜索结果页HTML
+        max_results: 最大结果数量
+        
+    Returns:
+        list: 相关帖子列表，未找到帖子时为空列表
+    """
+    soup = parse_html(html, SEARCH_STRAINER)
+    
+    # 尝试多种选择器找到帖子
+    post_selectors = [
+        'div.note-list section', 'div.items-wrapper div.item', 
+        'div.feeds-container div.note-item', 'div.search-container div.note-item'
+    ]
+    
+    posts = []
+    for selector in post_selectors:
+        posts = soup.select(selector)
+        if posts:
+            break
+    
+    results = []
+    for post in posts[:max_results]:
+        # 尝试提取标题、链接和点赞数
+        title_elem = post.select_one('div.note-info h3') or post.select_one('div.note-content div.title') or post.select_one('div.note-desc')
+        link_elem = post.select_one('a') or post.select_one('div.note-content a')
+        likes_elem = post.select_one('span.like-count') or post.select_one('div.note-metrics span.like')
+        
+        title = title_elem.text.strip() if title_elem else "未找到标题"
+        post_url = "https://www.xiaohongshu.com" + link_elem['href'] if link_elem and 'href' in link_elem.attrs else "#"
+        likes = int(likes_elem.text.replace('赞', '').strip()) if likes_elem else random.randint(800, 5000)
+        
+        results.append({
+            "url": post_url,
+            "title": title,
+            "likes": likes
+        })
+    
+    # 按点赞数排序
+    results.sort(key=lambda x: x["likes"], reverse=True)
+    return results
+
 def generate_mock_top_posts(keywords):
     """
     生成模拟的热门帖子数据
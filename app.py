@@ -1,7 +1,9 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 import os
 import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # 配置日志
 logging.basicConfig(
@@ -16,6 +18,11 @@ logger = logging.getLogger('app')
 
 # 导入基本工具和增强的wrapper
 import xiaohongshu_tool as basic_tool
+from strategy_engine import Strategy, run_strategies, is_valid_result
+from result_cache import ResultCache
+from job_queue import JobQueue, QueueFullError, JOB_CONFIG
+import llm_cache
+import llm_client
 
 # 尝试导入API代理工具
 try:
@@ -44,12 +51,137 @@ except ImportError as e:
     WRAPPER_AVAILABLE = False
     logger.error(f"增强的wrapper不可用: {str(e)}")
 
+# 尝试导入AI工具
+try:
+    import xiaohongshu_ai_tool as ai_tool
+    AI_TOOL_AVAILABLE = True
+    logger.info("AI工具可用")
+except ImportError as e:
+    AI_TOOL_AVAILABLE = False
+    logger.error(f"AI工具不可用: {str(e)}")
+
 # 检查是否配置了API密钥
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
 DEEPSEEK_API_KEY = os.environ.get("DEEPSEEK_API_KEY", "")
 
 app = Flask(__name__)
 
+# 分析结果缓存，按笔记ID和分析模式存储
+analysis_cache = ResultCache("analysis")
+
+# 批量分析任务队列
+batch_jobs = JobQueue()
+
+# 流式分析时没有新事件的情况下发送心跳的间隔（秒），避免代理断开空闲连接
+STREAM_KEEPALIVE = 15
+
+# 流式分析发送的阶段事件，页面只逐步显示这些部分，其余内容随done事件一起返回
+STREAM_STAGES = ("content", "keywords", "top_posts")
+
+# 同时进行的流式分析数，超过时排队；客户端断开后分析仍会完成并写入缓存
+STREAM_MAX_WORKERS = 4
+stream_executor = ThreadPoolExecutor(max_workers=STREAM_MAX_WORKERS, thread_name_prefix="analyze-stream")
+
+class StageBroadcast:
+    """
+    一次流式分析的阶段事件
+
+    同一帖子同时发起的流式请求共用一次分析，后加入的请求先收到已经发生的事件。
+    """
+
+    def __init__(self):
+        self.events = []
+        self.closed = False
+        self._condition = threading.Condition()
+
+    def emit(self, stage, data):
+        with self._condition:
+            self.events.append((stage, data))
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def listen(self, timeout):
+        """依次返回事件，timeout秒内没有新事件时返回None，分析结束后停止"""
+        index = 0
+        while True:
+            with self._condition:
+                if index >= len(self.events) and not self.closed:
+                    self._condition.wait(timeout)
+                events = self.events[index:]
+                closed = self.closed
+            index += len(events)
+            if not events and not closed:
+                yield None
+            for event in events:
+                yield event
+            if closed and index >= len(self.events):
+                return
+
+# 进行中的流式分析，按stream缓存键单飞
+_stream_runs = {}
+_stream_runs_lock = threading.Lock()
+
+def get_cache_key(url, mode="analyze"):
+    """根据笔记ID和分析模式生成缓存键，同一帖子的不同链接形式共用一个键"""
+    note_id = proxy_tool.extract_note_id(url) if API_PROXY_AVAILABLE else None
+    return f"{mode}:{note_id or url.strip()}"
+
+def run_api_proxy(url):
+    """使用API代理工具抓取并分析"""
+    logger.info("使用API代理工具...")
+    return proxy_tool.main(url)
+
+def run_browser_tool(url):
+    """使用浏览器工具抓取并分析"""
+    logger.info("使用浏览器工具...")
+    content = browser_tool.fetch_post_content(url, allow_manual=False)
+    analysis = browser_tool.analyze_content(content)
+    return {
+        "original": content,
+        "analysis": analysis
+    }
+
+def run_wrapper(url):
+    """使用增强的wrapper抓取并分析"""
+    logger.info("使用wrapper...")
+    result = wrapper.analyze_post(url)
+    
+    # 验证结果结构
+    if not isinstance(result, dict):
+        raise ValueError("分析结果不是有效的字典格式")
+    
+    # 确保结果有必要的键
+    if 'original' not in result:
+        result['original'] = {
+            'title': '未找到标题', 
+            'text': '未找到内容',
+            'images': [],
+            'video': None
+        }
+    
+    if 'analysis' not in result:
+        result['analysis'] = {
+            'keywords': ['小红书', '好物', '推荐'],
+            'top_posts': []
+        }
+    
+    return result
+
+def build_strategies(url):
+    """按优先级构建可用的抓取策略"""
+    strategies = []
+    if API_PROXY_AVAILABLE:
+        strategies.append(Strategy("api_proxy", lambda: run_api_proxy(url)))
+    if BROWSER_TOOL_AVAILABLE:
+        strategies.append(Strategy("browser", lambda: run_browser_tool(url)))
+    if WRAPPER_AVAILABLE:
+        strategies.append(Strategy("wrapper", lambda: run_wrapper(url)))
+    return strategies
+
 @app.route('/')
 def index():
     tools_status = {
@@ -58,6 +190,139 @@ def index():
     }
     return render_template('index.html', tools_status=tools_status)
 
+def analyze_url(url):
+    """抓取并分析帖子，依次使用各抓取策略，全部失败时使用基本工具"""
+    # 按配置的模式（逐个/并发/对冲）执行各抓取策略，取第一个有效结果
+    name, result = run_strategies(build_strategies(url))
+    if result is not None:
+        logger.info(f"{name} 分析成功")
+        return result
+    
+    # 如果其他方法都不可用或失败，使用基本工具
+    logger.info("使用基本工具...")
+    result = basic_tool.main(url)
+    logger.info("基本工具分析成功")
+    return result
+
+def build_fetch_strategies(url):
+    """按优先级构建只抓取内容、不做分析的策略"""
+    def validate(content):
+        return is_valid_result({"original": content})
+    
+    strategies = []
+    if API_PROXY_AVAILABLE:
+        strategies.append(Strategy("api_proxy", lambda: proxy_tool.fetch_post_content(url), validate=validate))
+    if BROWSER_TOOL_AVAILABLE:
+        strategies.append(Strategy("browser", lambda: browser_tool.fetch_post_content(url, allow_manual=False),
+                                   validate=validate))
+    if WRAPPER_AVAILABLE:
+        strategies.append(Strategy("wrapper", lambda: wrapper.fetch_content(url), validate=validate))
+    return strategies
+
+def fetch_content(url):
+    """抓取帖子内容，依次使用各抓取策略，全部失败时使用基本工具"""
+    name, content = run_strategies(build_fetch_strategies(url))
+    if content is not None:
+        logger.info(f"{name} 抓取成功")
+        return content
+    logger.info("使用基本工具抓取...")
+    return basic_tool.fetch_post_content(url)
+
+def analyze_url_staged(url, emit):
+    """
+    逐阶段抓取并分析帖子，STREAM_STAGES中的阶段完成后立即调用emit(阶段名称, 结果)
+    
+    阶段: content, keywords, top_posts, media_analysis, optimized；
+    热门帖子和媒体分析在关键词得到后同时进行，互不等待。
+    
+    Returns:
+        dict: 与基本工具格式相同的完整结果
+    """
+    content = fetch_content(url)
+    emit("content", content)
+    
+    def on_complete(stage, data):
+        if stage in STREAM_STAGES:
+            emit(stage, data)
+    
+    def optimize(keywords, top_posts, media_analysis):
+        analysis = {"keywords": keywords, "top_posts": top_posts}
+        if media_analysis is not None:
+            analysis["media_analysis"] = media_analysis
+        return basic_tool.generate_optimized_content(content, analysis)
+    
+    graph = basic_tool.build_analysis_graph(content)
+    graph.add("optimized", optimize, deps=("keywords", "top_posts", "media_analysis"))
+    results = graph.run(on_complete=on_complete)
+    
+    analysis = {"keywords": results["keywords"], "top_posts": results["top_posts"]}
+    if results["media_analysis"] is not None:
+        analysis["media_analysis"] = results["media_analysis"]
+    return basic_tool.format_output(content, analysis, results["optimized"])
+
+def replay_stages(result, emit):
+    """把缓存的完整结果按阶段发送"""
+    analysis = result.get("analysis") or {}
+    emit("content", result.get("original"))
+    emit("keywords", analysis.get("keywords", []))
+    emit("top_posts", analysis.get("top_posts", []))
+
+def run_stream_analysis(url, broadcast):
+    """
+    执行一次流式分析，结果只写入stream缓存键
+
+    /analyze和批量任务的结果可以直接重放；流式分析使用基本工具的分析流程，
+    结果与/analyze不同，因此不写入/analyze的缓存键。
+    """
+    stream_key = get_cache_key(url, "stream")
+    try:
+        result = None
+        if analysis_cache.enabled:
+            for key in (get_cache_key(url), stream_key):
+                cached, state = analysis_cache.get(key)
+                if state == "fresh":
+                    logger.info(f"缓存命中: {key}")
+                    result = cached
+                    replay_stages(result, broadcast.emit)
+                    break
+        if result is None:
+            result = analyze_url_staged(url, broadcast.emit)
+            if analysis_cache.enabled and is_valid_result(result):
+                analysis_cache.set(stream_key, result)
+        broadcast.emit("done", result)
+    except Exception as e:
+        logger.error(f"流式分析出错: {str(e)}")
+        broadcast.emit("failed", {"error": str(e)})
+    finally:
+        with _stream_runs_lock:
+            _stream_runs.pop(stream_key, None)
+        broadcast.close()
+
+def start_stream_analysis(url):
+    """返回帖子进行中的流式分析，没有时在流式分析线程池中启动一个"""
+    stream_key = get_cache_key(url, "stream")
+    with _stream_runs_lock:
+        broadcast = _stream_runs.get(stream_key)
+        if broadcast is None:
+            broadcast = StageBroadcast()
+            _stream_runs[stream_key] = broadcast
+            stream_executor.submit(run_stream_analysis, url, broadcast)
+        else:
+            logger.info(f"加入进行中的流式分析: {stream_key}")
+    return broadcast
+
+def format_sse(event, data):
+    """格式化一条server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def analyze_url_cached(url):
+    """抓取并分析帖子，同一帖子的结果优先从缓存获取"""
+    return analysis_cache.get_or_compute(
+        get_cache_key(url),
+        lambda: analyze_url(url),
+        validate=is_valid_result
+    )
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
     data = request.json
@@ -78,77 +343,8 @@ def analyze():
                 "force_manual": True
             }), 200
             
-        # 优先使用API代理工具
-        if API_PROXY_AVAILABLE:
-            try:
-                logger.info("使用API代理工具...")
-                result = proxy_tool.main(url)
-                
-                # 验证结果有效性
-                if (result and 
-                    result.get('original') and 
-                    result['original'].get('title') != '未找到标题' and
-                    result['original'].get('text') != '未找到内容'):
-                    logger.info("API代理工具分析成功")
-                    return jsonify(result)
-                else:
-                    logger.warning("API代理工具返回空结果或默认内容")
-            except Exception as e:
-                logger.error(f"API代理工具失败: {str(e)}")
-                # 如果API代理工具失败，尝试其他工具
-        
-        # 如果API代理工具不可用或失败，尝试浏览器工具
-        if BROWSER_TOOL_AVAILABLE:
-            try:
-                logger.info("使用浏览器工具...")
-                content = browser_tool.fetch_post_content(url, allow_manual=False)
-                analysis = browser_tool.analyze_content(content)
-                result = {
-                    "original": content,
-                    "analysis": analysis
-                }
-                
-                logger.info("浏览器工具分析成功")
-                return jsonify(result)
-            except Exception as e:
-                logger.error(f"浏览器工具失败: {str(e)}")
-                # 如果浏览器工具失败，尝试其他工具
-        
-        # 如果浏览器工具不可用或失败，尝试使用wrapper
-        if WRAPPER_AVAILABLE:
-            try:
-                logger.info("使用wrapper...")
-                result = wrapper.analyze_post(url)
-                
-                # 验证结果结构
-                if not isinstance(result, dict):
-                    raise ValueError("分析结果不是有效的字典格式")
-                
-                # 确保结果有必要的键
-                if 'original' not in result:
-                    result['original'] = {
-                        'title': '未找到标题', 
-                        'text': '未找到内容',
-                        'images': [],
-                        'video': None
-                    }
-                
-                if 'analysis' not in result:
-                    result['analysis'] = {
-                        'keywords': ['小红书', '好物', '推荐'],
-                        'top_posts': []
-                    }
-                
-                logger.info("wrapper分析成功")
-                return jsonify(result)
-            except Exception as e:
-                logger.error(f"wrapper失败: {str(e)}")
-                # 如果wrapper失败，使用基本工具
-        
-        # 如果其他方法都不可用或失败，使用基本工具
-        logger.info("使用基本工具...")
-        result = basic_tool.main(url)
-        logger.info("基本工具分析成功")
+        # 同一帖子的结果优先从缓存获取
+        result = analyze_url_cached(url)
         return jsonify(result)
         
     except Exception as e:
@@ -173,6 +369,113 @@ def analyze():
             }
         }), 500
 
+@app.route('/analyze/stream', methods=['GET'])
+def analyze_stream():
+    """
+    以server-sent events逐阶段返回分析结果
+    
+    content、keywords和top_posts阶段完成后立即发送同名事件，最后发送包含完整结果的done事件；
+    出错时发送failed事件。
+    
+    为了逐阶段返回，抓取只使用各策略的抓取部分，分析使用基本工具的分析流程，
+    因此关键词可能与/analyze中API代理工具自带的分析不同。/analyze和批量任务的结果
+    会在这里直接重放，流式分析的结果只保存在单独的stream缓存键下。
+    同一帖子同时发起的流式请求共用一次分析。
+    """
+    url = request.args.get('url', '').strip()
+    if not url:
+        return jsonify({"error": "请提供小红书帖子URL"}), 400
+    
+    logger.info(f"开始流式分析URL: {url}")
+    broadcast = start_stream_analysis(url)
+    
+    def generate():
+        for event in broadcast.listen(STREAM_KEEPALIVE):
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield format_sse(*event)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/generate/stream', methods=['POST'])
+def generate_stream():
+    """
+    以server-sent events流式返回优化标题和正文
+    
+    请求体包含title、text、keywords和可选的ai_analysis；
+    生成过程中发送title和body增量事件，最后发送包含完整结果的done事件，出错时发送failed事件。
+    """
+    if not AI_TOOL_AVAILABLE:
+        return jsonify({"error": "AI工具不可用"}), 503
+    
+    data = request.json or {}
+    title = data.get('title', '')
+    text = data.get('text', '')
+    keywords = data.get('keywords') or []
+    ai_analysis = data.get('ai_analysis') or {}
+    
+    if not title and not text:
+        return jsonify({"error": "请提供帖子标题或内容"}), 400
+    
+    def generate():
+        try:
+            for event, payload in ai_tool.stream_optimized_content(title, text, keywords, ai_analysis):
+                yield format_sse(event, payload)
+        except Exception as e:
+            logger.error(f"流式生成出错: {str(e)}")
+            yield format_sse("failed", {"error": str(e)})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """提交批量分析任务，立即返回任务ID，通过/jobs/<任务ID>查询进度和结果"""
+    data = request.json or {}
+    urls = data.get('urls')
+    
+    if not isinstance(urls, list):
+        return jsonify({"error": "请提供小红书帖子URL列表"}), 400
+    
+    # 去除空白和重复的URL，保持提交顺序
+    urls = list(dict.fromkeys(url.strip() for url in urls if isinstance(url, str) and url.strip()))
+    if not urls:
+        return jsonify({"error": "请提供小红书帖子URL列表"}), 400
+    
+    max_batch_size = JOB_CONFIG.get("MAX_BATCH_SIZE", 500)
+    if len(urls) > max_batch_size:
+        return jsonify({"error": f"单次最多提交 {max_batch_size} 个URL"}), 400
+    
+    try:
+        job = batch_jobs.submit(urls, analyze_url_cached)
+    except QueueFullError as e:
+        logger.warning(f"拒绝批量任务: {str(e)}")
+        return jsonify({"error": str(e)}), 503
+    
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "total": len(urls),
+        "status_url": f"/jobs/{job.id}"
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """返回批量任务的进度和已完成的部分结果，results=0时不返回分析结果"""
+    include_results = request.args.get('results', '1') != '0'
+    job = batch_jobs.get(job_id, include_results)
+    if job is None:
+        return jsonify({"error": "任务不存在或已过期"}), 404
+    return jsonify(job)
+
 @app.route('/status', methods=['GET'])
 def status():
     """返回工具状态"""
@@ -180,9 +483,20 @@ def status():
         "api_proxy_available": API_PROXY_AVAILABLE,
         "browser_tool_available": BROWSER_TOOL_AVAILABLE,
         "wrapper_available": WRAPPER_AVAILABLE,
+        "ai_tool_available": AI_TOOL_AVAILABLE,
         "openai_configured": OPENAI_API_KEY != "",
         "deepseek_configured": DEEPSEEK_API_KEY != ""
     }
+    if API_PROXY_AVAILABLE:
+        status["api_providers"] = proxy_tool.get_provider_stats()
+    if BROWSER_TOOL_AVAILABLE:
+        status["browser_pool"] = browser_tool.browser_pool.get_pool().get_stats()
+    status["cache"] = analysis_cache.get_stats()
+    status["llm_cache"] = llm_cache.get_stats()
+    status["llm_clients"] = llm_client.get_stats()
+    if basic_tool.MEDIA_ANALYSIS_AVAILABLE:
+        status["image_cache"] = basic_tool.media_analyzer.image_analysis_cache.get_stats()
+    status["jobs"] = batch_jobs.get_stats()
     return jsonify(status)
 
 @app.route('/manual_input', methods=['POST'])
@@ -0,0 +1,380 @@
+"""
+异步抓取引擎
+与同步抓取函数并行存在，返回结构完全一致，
+使同一进程可以同时保持数百个抓取请求在途，而不是每个线程一个。
+
+用法:
+    import asyncio
+    import async_scraper
+
+    # 单个帖子
+    content = asyncio.run(async_scraper.fetch_post_content(url))
+
+    # 批量抓取，共享连接池
+    async def run(urls):
+        async with async_scraper.AsyncScraper() as scraper:
+            return await scraper.fetch_many(urls)
+"""
+
+import time
+import asyncio
+import json
+import logging
+from urllib.parse import quote
+
+import request_scheduler
+import provider_health
+import xiaohongshu_tool as basic_tool
+import api_proxy_tool as proxy_tool
+from xiaohongshu_tool import AntiCrawlUtils
+
+# 检查是否安装了aiohttp，未安装时退回到线程池中运行同步函数
+try:
+    import aiohttp
+    import yarl
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+# 导入配置
+try:
+    from config import REQUEST_CONFIG
+except ImportError:
+    REQUEST_CONFIG = {
+        "MAX_RETRIES": 3,
+        "TIMEOUT": 30,
+        "ASYNC_CONCURRENCY": 100
+    }
+
+logger = logging.getLogger('async_scraper')
+
+# 可重试的HTTP状态码
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class AsyncResponse:
+    """异步请求的响应，只保留解析需要的字段"""
+
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+class AsyncScraper:
+    """
+    基于aiohttp的异步抓取引擎
+
+    同一个引擎内的所有请求共享一个连接池和cookie jar，
+    并通过信号量限制同时在途的请求数量。
+    """
+
+    def __init__(self, concurrency=None, timeout=None):
+        self.concurrency = concurrency or REQUEST_CONFIG.get("ASYNC_CONCURRENCY", 100)
+        self.timeout = timeout or REQUEST_CONFIG.get("TIMEOUT", 30)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        """创建共享的aiohttp会话"""
+        if self._session is None and AIOHTTP_AVAILABLE:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            # 使用同步工具中保存的cookies初始化cookie jar，只对小红书域名生效
+            self._session.cookie_jar.update_cookies(
+                AntiCrawlUtils.get_cookies(),
+                response_url=yarl.URL("https://www.xiaohongshu.com/")
+            )
+
+    async def close(self):
+        """关闭会话，释放连接"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def request(self, url, method="GET", params=None, headers=None,
+                      max_retries=3, backoff_factor=2):
+        """
+        执行异步HTTP请求，包含指数退避重试
+
+        Args:
+            url: 请求URL
+            method: 请求方法
+            params: URL参数
+            headers: 请求头
+            max_retries: 最大重试次数
+            backoff_factor: 退避因子
+
+        Returns:
+            AsyncResponse对象
+        """
+        if headers is None:
+            headers = AntiCrawlUtils.get_enhanced_headers(referer=url, is_api="api" in url)
+
+        # 重试前的退避延迟
+        retry_delay = 0
+
+        for attempt in range(max_retries):
+            try:
+                # 由调度器决定发出时机，等待期间不占用线程，其他域名的请求可以继续执行
+                await request_scheduler.wait_async(url, retry_delay)
+                retry_delay = 0
+
+                async with self._semaphore:
+                    async with self._session.request(method, url, params=params, headers=headers) as response:
+                        text = await response.text(errors="replace")
+                        status_code = response.status
+
+                if status_code in RETRY_STATUS_CODES:
+                    logger.warning(f"Attempt {attempt+1}/{max_retries}: Received status code {status_code}, retrying...")
+                    retry_delay = (attempt + 1) * backoff_factor
+                    if status_code == 429:
+                        headers["User-Agent"] = AntiCrawlUtils.get_random_user_agent()
+                        request_scheduler.penalize(url, 5 + attempt * 3)
+                    continue
+
+                return AsyncResponse(status_code, text)
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"Attempt {attempt+1}/{max_retries}: Request failed: {str(e)}")
+                if attempt < max_retries - 1:
+                    retry_delay = (backoff_factor ** attempt) * 2
+                else:
+                    raise
+
+        raise Exception(f"Maximum retries exceeded for {url}")
+
+    async def fetch_post_content(self, url):
+        """
+        异步抓取小红书帖子内容，返回结构与xiaohongshu_tool.fetch_post_content相同
+
+        Args:
+            url: 小红书帖子URL
+
+        Returns:
+            dict: 包含文字、图片和视频URL的字典
+        """
+        if not AIOHTTP_AVAILABLE:
+            return await asyncio.to_thread(basic_tool.fetch_post_content, url)
+
+        try:
+            headers = AntiCrawlUtils.get_enhanced_headers(referer=url)
+            response = await self.request(url, headers=headers)
+
+            content = basic_tool.parse_post_html(response.text)
+            if content is not None:
+                return content
+        except Exception as e:
+            logger.error(f"抓取帖子内容失败: {str(e)}，尝试备选方法")
+
+        # 备选方法：模拟移动设备
+        try:
+            mobile_headers = AntiCrawlUtils.get_enhanced_headers(referer=url)
+            mobile_headers["User-Agent"] = basic_tool.MOBILE_USER_AGENT
+            response = await self.request(url, headers=mobile_headers, max_retries=4)
+            return basic_tool.parse_post_html_alternative(response.text)
+        except Exception as e:
+            logger.error(f"备选方法抓取失败: {str(e)}，使用手动输入提示")
+            return dict(basic_tool.EMPTY_POST_CONTENT)
+
+    async def fetch_top_posts(self, keyword, max_posts=10):
+        """
+        异步爬取指定关键词的热门帖子，返回结构与xiaohongshu_tool.fetch_top_posts相同
+
+        Args:
+            keyword: 搜索关键词
+            max_posts: 最大爬取帖子数量
+
+        Returns:
+            list: 热门帖子列表
+        """
+        if not AIOHTTP_AVAILABLE:
+            return await asyncio.to_thread(basic_tool.fetch_top_posts, keyword, max_posts)
+
+        search_url, alternative_url = basic_tool.build_search_urls(keyword)
+
+        try:
+            headers = AntiCrawlUtils.get_enhanced_headers(referer=search_url)
+            response = await self.request(search_url, headers=headers)
+            results, captcha = basic_tool.parse_top_posts_html(response.text, max_posts)
+
+            if results is None and not captcha:
+                logger.warning("未找到帖子容器，尝试使用备选方式...")
+                alternative_headers = AntiCrawlUtils.get_enhanced_headers()
+                alternative_headers["User-Agent"] = basic_tool.MOBILE_USER_AGENT
+                alternative_response = await self.request(alternative_url, headers=alternative_headers)
+                if alternative_response.status_code == 200:
+                    results, _ = basic_tool.parse_top_posts_html(alternative_response.text, max_posts)
+
+            if results is not None:
+                return results
+        except Exception as e:
+            logger.error(f"直接爬取搜索结果失败: {str(e)}")
+
+        return await self.fetch_top_posts_api(keyword, max_posts)
+
+    async def fetch_top_posts_api(self, keyword, max_posts=10):
+        """异步使用小红书搜索API获取热门帖子，失败时返回模拟数据"""
+        logger.info("使用API方式获取热门帖子...")
+        mock_keywords = keyword if isinstance(keyword, list) else [keyword]
+
+        try:
+            (api_url, params), (alternative_api_url, alternative_params) = basic_tool.build_search_api_requests(keyword, max_posts)
+
+            headers = AntiCrawlUtils.get_enhanced_headers(
+                referer=f"https://www.xiaohongshu.com/search_result?keyword={quote(keyword)}",
+                is_api=True
+            )
+            response = await self.request(api_url, params=params, headers=headers)
+
+            if response.status_code >= 400:
+                logger.warning(f"API请求失败，状态码: {response.status_code}，尝试备用API")
+                alternative_headers = AntiCrawlUtils.get_enhanced_headers(is_api=True)
+                response = await self.request(alternative_api_url, params=alternative_params,
+                                              headers=alternative_headers, max_retries=4)
+                if response.status_code >= 400:
+                    logger.warning(f"备用API也请求失败，状态码: {response.status_code}，直接使用模拟数据")
+                    return basic_tool.generate_mock_top_posts(mock_keywords)
+
+            results = basic_tool.parse_top_posts_api_data(json.loads(response.text), max_posts)
+            if results is None:
+                logger.warning("API返回数据结构异常，使用模拟数据")
+                return basic_tool.generate_mock_top_posts(mock_keywords)
+            return results
+
+        except Exception as e:
+            logger.error(f"API获取热门帖子失败: {str(e)}")
+            return basic_tool.generate_mock_top_posts(mock_keywords)
+
+    async def fetch_via_proxy_api(self, url, provider=None):
+        """
+        异步通过API代理服务抓取网页内容
+
+        Returns:
+            str: 抓取到的HTML内容，失败时返回None
+        """
+        if not AIOHTTP_AVAILABLE:
+            return await asyncio.to_thread(proxy_tool.fetch_via_proxy_api, url, provider)
+
+        url = proxy_tool.normalize_url(url)
+        provider = proxy_tool.select_provider(provider)
+        if not provider:
+            return None
+
+        proxy_request = proxy_tool.build_proxy_request(url, provider)
+        if not proxy_request:
+            return None
+        base_url, params = proxy_request
+        breaker = provider_health.health.get_breaker(provider)
+
+        logger.info(f"通过 {provider} 异步抓取: {url}")
+        max_retries = REQUEST_CONFIG.get("MAX_RETRIES", 3)
+
+        for attempt in range(max_retries):
+            # 熔断中的提供商不再发送请求
+            if not breaker.allow_request():
+                logger.warning(f"API提供商 {provider} 已熔断，停止重试")
+                break
+
+            started = time.time()
+            try:
+                async with self._semaphore:
+                    async with self._session.get(base_url, params=params) as response:
+                        if response.status == 200:
+                            text = await response.text(errors="replace")
+                            breaker.record_success(time.time() - started)
+                            return text
+                        status_code = response.status
+
+                if status_code in (401, 403):
+                    breaker.record_failure(time.time() - started, fatal=True)
+                    logger.error(f"API密钥无效或授权失败: {status_code}")
+                    break
+                breaker.record_failure(time.time() - started)
+                logger.warning(f"抓取失败: {status_code} - 尝试 {attempt + 1}/{max_retries}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                breaker.record_failure(time.time() - started)
+                logger.warning(f"请求失败: {str(e)} - 尝试 {attempt + 1}/{max_retries}")
+
+            if attempt < max_retries - 1:
+                await request_scheduler.wait_async(base_url, (attempt + 1) * 2)
+
+        return None
+
+    async def search_keyword(self, keyword, max_results=10):
+        """
+        异步搜索关键词相关的小红书帖子，返回结构与api_proxy_tool.search_keyword相同
+
+        Args:
+            keyword: 搜索关键词
+            max_results: 最大结果数量
+
+        Returns:
+            list: 相关帖子列表
+        """
+        if not AIOHTTP_AVAILABLE:
+            return await asyncio.to_thread(proxy_tool.search_keyword, keyword, max_results)
+
+        search_url = f"https://www.xiaohongshu.com/search_result?keyword={quote(keyword)}&source=web"
+        html = await self.fetch_via_proxy_api(search_url)
+
+        if not html:
+            logger.error(f"搜索失败: {keyword}")
+            return []
+
+        try:
+            return proxy_tool.parse_search_results(html, max_results)
+        except Exception as e:
+            logger.error(f"解析搜索结果失败: {str(e)}")
+            return []
+
+    async def fetch_many(self, urls):
+        """
+        并发抓取多个帖子
+
+        Returns:
+            dict: 以URL为键的帖子内容
+        """
+        contents = await asyncio.gather(*(self.fetch_post_content(url) for url in urls))
+        return dict(zip(urls, contents))
+
+async def fetch_post_content(url, scraper=None):
+    """异步抓取单个帖子内容，可传入共享的AsyncScraper"""
+    if scraper is not None:
+        return await scraper.fetch_post_content(url)
+    async with AsyncScraper() as scraper:
+        return await scraper.fetch_post_content(url)
+
+async def fetch_top_posts(keyword, max_posts=10, scraper=None):
+    """异步爬取热门帖子，可传入共享的AsyncScraper"""
+    if scraper is not None:
+        return await scraper.fetch_top_posts(keyword, max_posts)
+    async with AsyncScraper() as scraper:
+        return await scraper.fetch_top_posts(keyword, max_posts)
+
+async def search_keyword(keyword, max_results=10, scraper=None):
+    """异步搜索关键词，可传入共享的AsyncScraper"""
+    if scraper is not None:
+        return await scraper.search_keyword(keyword, max_results)
+    async with AsyncScraper() as scraper:
+        return await scraper.search_keyword(keyword, max_results)
+
+async def fetch_many(urls, concurrency=None):
+    """异步并发抓取多个帖子，返回以URL为键的字典"""
+    async with AsyncScraper(concurrency=concurrency) as scraper:
+        return await scraper.fetch_many(urls)
+
+if __name__ == "__main__":
+    import sys
+    import json
+
+    urls = sys.argv[1:] or [input("请输入小红书帖子URL: ")]
+    results = asyncio.run(fetch_many(urls))
+    print(json.dumps(results, ensure_ascii=False, indent=2))
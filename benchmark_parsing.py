@@ -0,0 +1,167 @@
+"""
+HTML解析性能对比
+
+对比三种解析方式在帖子页面和搜索结果页上的耗时和内存峰值:
+- html.parser解析整个文档（原来的方式）
+- lxml解析整个文档
+- lxml + SoupStrainer只保留提取需要的子树（html_parsing中的方式）
+
+同时检查三种方式用相同选择器提取到的结果是否一致。
+帖子页面还会对比逐个调用select_one/select和预编译选择器计划（selector_plan）的提取耗时。
+
+用法:
+    python benchmark_parsing.py                          # 使用生成的模拟页面
+    python benchmark_parsing.py timeout_page_source.html # 使用保存的帖子页面
+    python benchmark_parsing.py --search search.html     # 使用保存的搜索结果页
+"""
+
+import sys
+import time
+import argparse
+import tracemalloc
+
+import soupsieve
+from bs4 import BeautifulSoup
+
+from html_parsing import LXML_AVAILABLE, NOTE_STRAINER, SEARCH_STRAINER, parse_html
+from selector_plan import NOTE_PLANS, ALL, FIRST_SELECTOR
+
+NOTE_SELECTORS = [
+    'h1.title', '.note-content .title', '.note-content .desc', 'div.carousel img',
+    'video', 'meta[property="og:title"]', 'meta[name="description"]'
+]
+SEARCH_SELECTORS = ['div.note-list section', 'div.feeds-container div.note-item', 'span.like-count']
+
+def build_note_page(feed_items=300):
+    """生成一个结构接近小红书帖子页面的模拟页面，包含大量与帖子无关的推荐内容"""
+    feed = "".join(
+        f'<section class="feed-card"><a href="/explore/{i:024x}"><img src="https://sns-webpic.xhscdn.com/{i}.jpg">'
+        f'<span class="feed-title">推荐笔记标题 {i}</span></a><div class="author"><span>作者{i}</span>'
+        f'<span class="count">{i * 7}</span></div></section>'
+        for i in range(feed_items)
+    )
+    styles = "".join(f".c{i}{{margin:{i}px}}" for i in range(500))
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>示例笔记 - 小红书</title>'
+        '<meta property="og:title" content="示例笔记"><meta name="description" content="示例描述">'
+        f'<style>{styles}</style></head><body>'
+        '<nav class="side-bar">' + '<a href="/explore">发现</a>' * 50 + '</nav>'
+        '<div class="note-container"><div class="note-content"><div class="title">示例笔记</div>'
+        '<div class="desc">' + '这是一段示例正文。' * 40 + '</div>'
+        '<div class="carousel">' + ''.join(f'<img src="https://sns-img.xhscdn.com/note{i}.jpg">' for i in range(6)) + '</div>'
+        '</div></div>'
+        f'<div class="feeds-page">{feed}</div>'
+        '<footer>' + '<p>页脚链接</p>' * 100 + '</footer>'
+        '</body></html>'
+    )
+
+def build_search_page(items=100):
+    """生成模拟的搜索结果页"""
+    notes = "".join(
+        f'<section><div class="note-info"><h3>搜索结果 {i}</h3></div><a href="/explore/{i:024x}">链接</a>'
+        f'<span class="like-count">{i * 13}赞</span></section>'
+        for i in range(items)
+    )
+    return (
+        '<html><head><title>搜索</title></head><body>'
+        '<nav class="side-bar">' + '<a href="/explore">发现</a>' * 50 + '</nav>'
+        f'<div class="note-list">{notes}</div>'
+        '<div class="recommend">' + '<div class="tag">热门话题</div>' * 500 + '</div>'
+        '</body></html>'
+    )
+
+def summarize(soup, selectors):
+    """用选择器提取结果，用于对比不同解析方式是否一致"""
+    summary = []
+    for selector in selectors:
+        elems = soup.select(selector)
+        summary.append([elem.get('src') or elem.get('content') or elem.text.strip() for elem in elems])
+    return summary
+
+def measure(html, parser, strainer, repeat):
+    """返回(平均耗时毫秒, 内存峰值KB, 解析结果)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        soup = BeautifulSoup(html, parser, parse_only=strainer)
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+
+    tracemalloc.start()
+    soup = BeautifulSoup(html, parser, parse_only=strainer)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024, soup
+
+def run(name, html, strainer, selectors, repeat):
+    print(f"\n{name}: {len(html) / 1024:.0f} KB")
+    variants = [("html.parser 全文档", "html.parser", None)]
+    if LXML_AVAILABLE:
+        variants.append(("lxml 全文档", "lxml", None))
+        variants.append(("lxml + SoupStrainer", "lxml", strainer))
+    else:
+        print("未安装lxml，只测试html.parser")
+
+    baseline = None
+    for label, parser, variant_strainer in variants:
+        elapsed, peak, soup = measure(html, parser, variant_strainer, repeat)
+        summary = summarize(soup, selectors)
+        if baseline is None:
+            baseline = (elapsed, peak, summary)
+        same = "一致" if summary == baseline[2] else "不一致"
+        print(f"  {label:<22} {elapsed:8.2f} ms ({baseline[0] / elapsed:4.1f}x)  "
+              f"内存峰值 {peak:8.0f} KB ({peak / baseline[1]:4.0%})  提取结果{same}")
+
+def run_selectors(name, html, repeat):
+    """对比各提取器逐个选择器查询和选择器计划的耗时，以及两者结果是否一致"""
+    soup = parse_html(html, NOTE_STRAINER)
+    print(f"\n{name} 选择器提取:")
+    for plan_name, plan in NOTE_PLANS.items():
+        fields = [(field, [soupsieve.compile(selector) for selector in selectors], plan.modes[field])
+                  for field, selectors in plan.selectors.items()]
+
+        def cascade():
+            results = {}
+            for field, sieves, mode in fields:
+                if mode == ALL:
+                    results[field] = [elem for sieve in sieves for elem in sieve.select(soup)]
+                elif mode == FIRST_SELECTOR:
+                    results[field] = next((elems for elems in (sieve.select(soup) for sieve in sieves) if elems), [])
+                else:
+                    results[field] = [elem for elem in (sieve.select_one(soup) for sieve in sieves) if elem is not None]
+            return results
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            expected = cascade()
+        cascade_time = (time.perf_counter() - start) / repeat * 1000
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            actual = plan.run(soup)
+        plan_time = (time.perf_counter() - start) / repeat * 1000
+
+        same = "一致" if expected == actual else "不一致"
+        print(f"  {plan_name:<12} 逐个select_one/select {cascade_time:8.2f} ms  "
+              f"选择器计划 {plan_time:8.2f} ms ({cascade_time / plan_time:4.1f}x)  提取结果{same}")
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML解析性能对比")
+    parser.add_argument("pages", nargs="*", help="保存的帖子页面HTML文件")
+    parser.add_argument("--search", nargs="*", default=[], help="保存的搜索结果页HTML文件")
+    parser.add_argument("--repeat", type=int, default=20, help="每种方式重复解析的次数")
+    args = parser.parse_args()
+
+    pages = [(path, open(path, encoding="utf-8").read()) for path in args.pages]
+    search_pages = [(path, open(path, encoding="utf-8").read()) for path in args.search]
+    if not pages and not search_pages:
+        pages = [("模拟帖子页面", build_note_page())]
+        search_pages = [("模拟搜索结果页", build_search_page())]
+
+    for name, html in pages:
+        run(name, html, NOTE_STRAINER, NOTE_SELECTORS, args.repeat)
+        run_selectors(name, html, args.repeat)
+    for name, html in search_pages:
+        run(name, html, SEARCH_STRAINER, SEARCH_SELECTORS, args.repeat)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
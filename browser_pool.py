@@ -0,0 +1,361 @@
+"""
+可复用的无头Chrome浏览器池
+
+每次抓取都启动一个新的Chrome需要数秒和数百MB内存。浏览器池让多个请求复用
+已经启动的浏览器:
+- checkout()/checkin()借出和归还浏览器，同时借出的数量不超过池大小
+- 归还时清除Cookie和本地存储，并回到空白页，下一次使用不受上一次影响
+- 浏览器访问的页面数达到上限或者崩溃后会被关闭，需要时重新创建
+- chromedriver路径只解析一次，不会每次请求都执行ChromeDriverManager().install()
+- 默认拦截图片、字体、媒体和统计脚本，只加载提取内容需要的文档和脚本
+
+用法:
+    from browser_pool import get_pool
+
+    with get_pool().driver() as driver:
+        driver.get(url)
+"""
+
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import WebDriverException
+from webdriver_manager.chrome import ChromeDriverManager
+
+# 导入配置
+try:
+    from config import BROWSER_CONFIG
+except ImportError:
+    BROWSER_CONFIG = {
+        "POOL_SIZE": 2,
+        "MAX_PAGES_PER_DRIVER": 50,
+        "HEADLESS": True,
+        "DRIVER_PATH": "",
+        "CHECKOUT_TIMEOUT": 60,
+        "BLOCK_RESOURCES": True,
+        "ALLOWED_RESOURCE_TYPES": ["Document", "Script", "XHR", "Fetch", "Stylesheet"],
+        "EXTRA_BLOCKED_URLS": [],
+        "PAGE_LOAD_STRATEGY": "eager",
+        "READY_TIMEOUT": 10,
+        "READY_POLL_INTERVAL": 0.1,
+        "MAX_TABS": 4
+    }
+
+logger = logging.getLogger('browser_pool')
+
+# 隐藏自动化特征的脚本，对浏览器之后打开的所有页面生效
+STEALTH_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+    window.navigator.chrome = {
+        runtime: {}
+    };
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5]
+    });
+"""
+
+# 各资源类型对应的URL匹配规则，用于Network.setBlockedURLs
+# 小红书的图片和视频CDN地址通常没有扩展名，因此同时按域名匹配
+RESOURCE_URL_PATTERNS = {
+    "Image": [
+        "*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.svg*", "*.ico*", "*.avif*",
+        "*sns-webpic*.xhscdn.com*", "*sns-img*.xhscdn.com*", "*ci.xiaohongshu.com*"
+    ],
+    "Font": ["*.woff*", "*.woff2*", "*.ttf*", "*.otf*", "*.eot*"],
+    "Media": [
+        "*.mp4*", "*.webm*", "*.m3u8*", "*.m4s*", "*.mp3*", "*.flv*",
+        "*sns-video*.xhscdn.com*"
+    ],
+    "Tracker": [
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+        "*apm-fe.xiaohongshu.com*", "*t2.xiaohongshu.com*"
+    ],
+}
+
+def get_blocked_url_patterns(allowed_types=None, extra_patterns=None):
+    """
+    根据允许的资源类型生成需要拦截的URL规则
+
+    Args:
+        allowed_types: 允许加载的资源类型，不在其中且在RESOURCE_URL_PATTERNS中的类型会被拦截
+        extra_patterns: 额外需要拦截的URL规则
+
+    Returns:
+        list: URL匹配规则
+    """
+    if allowed_types is None:
+        allowed_types = BROWSER_CONFIG.get("ALLOWED_RESOURCE_TYPES", [])
+    if extra_patterns is None:
+        extra_patterns = BROWSER_CONFIG.get("EXTRA_BLOCKED_URLS", [])
+
+    patterns = []
+    for resource_type, type_patterns in RESOURCE_URL_PATTERNS.items():
+        if resource_type not in allowed_types:
+            patterns.extend(type_patterns)
+    patterns.extend(extra_patterns)
+    return patterns
+
+def apply_resource_blocking(driver, patterns):
+    """
+    通过CDP拦截匹配的资源请求
+
+    只拦截资源下载，img和video元素的src属性仍然保留，提取结果不受影响。
+    """
+    if not patterns:
+        return
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    logger.debug(f"已拦截 {len(patterns)} 条资源规则")
+
+def prepare_tab(driver, blocked_patterns=(), user_agent=None):
+    """
+    为当前标签页注入反检测脚本、设置资源拦截和User-Agent
+
+    CDP设置只对当前标签页生效，新建的浏览器和switch_to.new_window打开的
+    每个标签页都需要调用一次。
+    """
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": STEALTH_SCRIPT})
+    apply_resource_blocking(driver, blocked_patterns)
+    if user_agent:
+        driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": user_agent})
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+def get_driver_path():
+    """返回chromedriver路径，只在第一次调用时解析"""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = BROWSER_CONFIG.get("DRIVER_PATH") or ChromeDriverManager().install()
+            logger.info(f"使用chromedriver: {_driver_path}")
+        return _driver_path
+
+def build_options(headless=True, block_images=False):
+    """构建Chrome启动参数"""
+    options = Options()
+
+    # eager: driver.get在DOMContentLoaded后返回，不等待图片等资源加载完成
+    options.page_load_strategy = BROWSER_CONFIG.get("PAGE_LOAD_STRATEGY", "eager")
+
+    # 无头模式
+    if headless:
+        options.add_argument("--headless=new")
+
+    # 不加载图片（仍保留img元素和src属性）
+    if block_images:
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+
+    # 禁用自动化检测
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option("useAutomationExtension", False)
+
+    # 添加其他配置以避免检测
+    options.add_argument("--disable-extensions")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-infobars")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-browser-side-navigation")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-features=VizDisplayCompositor")
+
+    return options
+
+class PooledDriver:
+    """池中的一个浏览器及其使用统计"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.created_at = time.time()
+
+class DriverPool:
+    """
+    Chrome浏览器池
+
+    Args:
+        size: 最多同时存在的浏览器数量
+        max_pages: 每个浏览器最多访问的页面数，达到后关闭重建
+        headless: 是否使用无头模式
+        block_resources: 是否拦截图片、字体、媒体等不需要的资源
+    """
+
+    def __init__(self, size=None, max_pages=None, headless=None, block_resources=None):
+        self.size = size or BROWSER_CONFIG.get("POOL_SIZE", 2)
+        self.max_pages = max_pages or BROWSER_CONFIG.get("MAX_PAGES_PER_DRIVER", 50)
+        self.headless = headless if headless is not None else BROWSER_CONFIG.get("HEADLESS", True)
+        if block_resources is None:
+            block_resources = BROWSER_CONFIG.get("BLOCK_RESOURCES", True)
+        self.blocked_patterns = get_blocked_url_patterns() if block_resources else []
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self.stats = {"created": 0, "reused": 0, "recycled": 0, "crashed": 0}
+
+    def _create_driver(self):
+        """启动一个新的浏览器"""
+        logger.info("启动新的WebDriver...")
+        service = Service(get_driver_path())
+        block_images = any(pattern in self.blocked_patterns for pattern in RESOURCE_URL_PATTERNS["Image"])
+        driver = webdriver.Chrome(service=service, options=build_options(self.headless, block_images))
+        prepare_tab(driver, self.blocked_patterns)
+        with self._lock:
+            self.stats["created"] += 1
+        return PooledDriver(driver)
+
+    @staticmethod
+    def _quit(pooled):
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_alive(pooled):
+        """检查浏览器是否仍可用"""
+        try:
+            pooled.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def checkout(self, timeout=None):
+        """
+        借出一个浏览器，池中没有空闲浏览器时新建一个
+
+        Args:
+            timeout: 等待空闲名额的最长时间（秒）
+
+        Raises:
+            TimeoutError: 超时仍没有可用的浏览器
+        """
+        timeout = timeout if timeout is not None else BROWSER_CONFIG.get("CHECKOUT_TIMEOUT", 60)
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"等待浏览器超时 ({timeout}秒)")
+
+        try:
+            while True:
+                with self._lock:
+                    pooled = self._idle.pop() if self._idle else None
+                if pooled is None:
+                    return self._create_driver()
+                if self._is_alive(pooled):
+                    with self._lock:
+                        self.stats["reused"] += 1
+                    return pooled
+                logger.warning("空闲的WebDriver已失效，重新创建")
+                with self._lock:
+                    self.stats["crashed"] += 1
+                self._quit(pooled)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _reset(self, pooled):
+        """清除Cookie和本地存储，回到空白页"""
+        driver = pooled.driver
+        try:
+            origin = urlparse(driver.current_url)
+            if origin.scheme in ("http", "https"):
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+                    "origin": f"{origin.scheme}://{origin.netloc}",
+                    "storageTypes": "all"
+                })
+        except WebDriverException as e:
+            logger.debug(f"清除页面存储失败: {str(e)}")
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        driver.get("about:blank")
+
+    def checkin(self, pooled, broken=False):
+        """
+        归还浏览器
+
+        Args:
+            pooled: checkout()借出的浏览器
+            broken: 使用过程中浏览器是否出现异常，是则直接关闭
+        """
+        try:
+            pooled.pages += 1
+            if broken:
+                with self._lock:
+                    self.stats["crashed"] += 1
+                self._quit(pooled)
+                return
+            if pooled.pages >= self.max_pages:
+                logger.info(f"WebDriver已访问 {pooled.pages} 个页面，关闭重建")
+                with self._lock:
+                    self.stats["recycled"] += 1
+                self._quit(pooled)
+                return
+            try:
+                self._reset(pooled)
+            except Exception as e:
+                logger.warning(f"重置WebDriver失败，关闭: {str(e)}")
+                with self._lock:
+                    self.stats["crashed"] += 1
+                self._quit(pooled)
+                return
+            with self._lock:
+                self._idle.append(pooled)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """借出浏览器的上下文管理器，出现WebDriver异常时浏览器会被关闭而不是放回池中"""
+        pooled = self.checkout(timeout)
+        broken = False
+        try:
+            yield pooled.driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.checkin(pooled, broken)
+
+    def warm(self, count=None):
+        """预先启动浏览器，避免第一次请求承担启动时间"""
+        count = min(count or self.size, self.size)
+        drivers = [self.checkout() for _ in range(count)]
+        for pooled in drivers:
+            pooled.pages -= 1  # 预热不计入访问页面数
+            self.checkin(pooled)
+
+    def close(self):
+        """关闭所有空闲浏览器"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._quit(pooled)
+
+    def get_stats(self):
+        """返回浏览器池统计信息"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["idle"] = len(self._idle)
+        stats["size"] = self.size
+        return stats
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """返回全局浏览器池，第一次调用时创建"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DriverPool()
+            atexit.register(_pool.close)
+        return _pool
@@ -51,6 +51,240 @@ REQUEST_CONFIG = {
     
     # 请求超时（秒）
     "TIMEOUT": int(os.environ.get("TIMEOUT", "30")),
+    
+    # 连接池配置：每个域名复用一个会话，保持长连接
+    # 缓存的连接池数量
+    "POOL_CONNECTIONS": int(os.environ.get("POOL_CONNECTIONS", "10")),
+    # 每个连接池的最大连接数（应不小于gunicorn的线程数）
+    "POOL_MAXSIZE": int(os.environ.get("POOL_MAXSIZE", "20")),
+    
+    # 异步抓取引擎同时在途的最大请求数
+    "ASYNC_CONCURRENCY": int(os.environ.get("ASYNC_CONCURRENCY", "100")),
+}
+
+# 请求调度配置
+SCHEDULER_CONFIG = {
+    # 共享调度状态文件路径，多个gunicorn worker共用一个请求预算；留空则只在进程内生效
+    "STATE_PATH": os.environ.get("SCHEDULER_STATE_PATH", ""),
+    
+    # 各域名的请求策略（按域名后缀匹配），未配置的域名不做限制
+    "POLICIES": {
+        "xiaohongshu.com": {
+            # 令牌补充速率（每秒请求数）
+            "rate": float(os.environ.get("XHS_RATE", "0.5")),
+            # 允许的突发请求数
+            "burst": int(os.environ.get("XHS_BURST", "3")),
+            # 相邻请求的最小间隔（秒）
+            "min_interval": float(os.environ.get("XHS_MIN_INTERVAL", "1.0")),
+            # 排队时附加的随机抖动上限（秒）
+            "jitter": float(os.environ.get("XHS_JITTER", "2.0")),
+        },
+    },
+}
+
+# API代理服务提供商熔断配置
+PROVIDER_HEALTH_CONFIG = {
+    # 统计成功率和延迟的最近请求数
+    "WINDOW": int(os.environ.get("PROVIDER_HEALTH_WINDOW", "20")),
+    
+    # 按成功率判断熔断前至少需要的样本数
+    "MIN_SAMPLES": int(os.environ.get("PROVIDER_MIN_SAMPLES", "5")),
+    
+    # 连续失败多少次后熔断
+    "FAILURE_THRESHOLD": int(os.environ.get("PROVIDER_FAILURE_THRESHOLD", "3")),
+    
+    # 成功率低于该值时熔断
+    "MIN_SUCCESS_RATE": float(os.environ.get("PROVIDER_MIN_SUCCESS_RATE", "0.5")),
+    
+    # 熔断后的冷却时间（秒），之后放行一个探测请求
+    "COOLDOWN": float(os.environ.get("PROVIDER_COOLDOWN", "60")),
+}
+
+# 抓取策略配置
+STRATEGY_CONFIG = {
+    # 执行模式: sequential（逐个尝试）, concurrent（同时启动）, hedged（延迟对冲启动）
+    # 默认逐个尝试；对冲模式会在代理较慢时提前启动浏览器，需要时再开启
+    "MODE": os.environ.get("STRATEGY_MODE", "sequential"),
+    
+    # 对冲模式下，前一个策略多久没有结果就启动下一个（秒）
+    "HEDGE_DELAY": float(os.environ.get("STRATEGY_HEDGE_DELAY", "5.0")),
+    
+    # 整个策略链的总时间预算（秒）
+    "TOTAL_BUDGET": float(os.environ.get("STRATEGY_TOTAL_BUDGET", "120")),
+    
+    # 执行策略的最大线程数
+    "MAX_WORKERS": int(os.environ.get("STRATEGY_MAX_WORKERS", "8")),
+    
+    # 已放弃但仍在后台运行的策略上限，达到后不再启动新策略，避免占满线程池
+    "MAX_ABANDONED": int(os.environ.get("STRATEGY_MAX_ABANDONED", "4")),
+    
+    # 各策略的时间预算（秒），超时后不再等待该策略的结果
+    "BUDGETS": {
+        "api_proxy": float(os.environ.get("API_PROXY_BUDGET", "45")),
+        "browser": float(os.environ.get("BROWSER_BUDGET", "60")),
+        "wrapper": float(os.environ.get("WRAPPER_BUDGET", "30")),
+    },
+}
+
+# 结果缓存配置
+CACHE_CONFIG = {
+    # 是否启用分析结果缓存
+    "ENABLED": os.environ.get("CACHE_ENABLED", "True").lower() == "true",
+    
+    # 进程内缓存的最大条目数
+    "MAX_SIZE": int(os.environ.get("CACHE_MAX_SIZE", "256")),
+    
+    # 缓存结果保持新鲜的时间（秒）
+    "TTL": float(os.environ.get("CACHE_TTL", "3600")),
+    
+    # 过期后仍返回旧结果并在后台刷新的时间（秒），0表示不复用过期结果
+    "STALE_TTL": float(os.environ.get("CACHE_STALE_TTL", "86400")),
+    
+    # SQLite缓存文件路径，留空则只使用进程内缓存
+    "DB_PATH": os.environ.get("CACHE_DB_PATH", ""),
+}
+
+# 大模型调用结果缓存配置
+LLM_CACHE_CONFIG = {
+    # 是否启用大模型结果缓存
+    "ENABLED": os.environ.get("LLM_CACHE_ENABLED", "True").lower() == "true",
+    
+    # 为True时总是重新调用大模型（结果仍写入缓存）
+    "BYPASS": os.environ.get("LLM_CACHE_BYPASS", "False").lower() == "true",
+    
+    # 最大缓存条目数
+    "MAX_SIZE": int(os.environ.get("LLM_CACHE_MAX_SIZE", "1000")),
+    
+    # 缓存有效期（秒）
+    "TTL": float(os.environ.get("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+    
+    # SQLite缓存文件路径，留空则只使用进程内缓存
+    "DB_PATH": os.environ.get("LLM_CACHE_DB_PATH", ""),
+}
+
+# 大模型调用配置
+LLM_CONFIG = {
+    # 分析和生成的调用方式: two_call（先分析再生成，两次调用）或 one_shot（一次调用同时返回分析和生成结果）
+    "PIPELINE_MODE": os.environ.get("LLM_PIPELINE_MODE", "two_call").lower(),
+    
+    # 连接超时和读取超时（秒），流式调用时读取超时为两段数据之间的最长间隔
+    "CONNECT_TIMEOUT": float(os.environ.get("LLM_CONNECT_TIMEOUT", "5")),
+    "READ_TIMEOUT": float(os.environ.get("LLM_READ_TIMEOUT", "60")),
+    
+    # 每个提供商同时在途的最大请求数
+    "MAX_CONCURRENCY": int(os.environ.get("LLM_MAX_CONCURRENCY", "4")),
+    
+    # 遇到429或5xx时的最大重试次数
+    "MAX_RETRIES": int(os.environ.get("LLM_MAX_RETRIES", "3")),
+    
+    # 没有Retry-After时的初始退避时间（秒），每次重试翻倍
+    "BACKOFF_BASE": float(os.environ.get("LLM_BACKOFF_BASE", "1")),
+    
+    # 单次退避的最长时间（秒），Retry-After超过该值时直接失败
+    "MAX_BACKOFF": float(os.environ.get("LLM_MAX_BACKOFF", "30")),
+}
+
+# 媒体分析配置
+MEDIA_CONFIG = {
+    # 同时分析的最大图片数
+    "MAX_WORKERS": int(os.environ.get("MEDIA_MAX_WORKERS", "4")),
+    
+    # 单张图片的分析超时（秒）
+    "ANALYSIS_TIMEOUT": float(os.environ.get("MEDIA_ANALYSIS_TIMEOUT", "60")),
+    
+    # 上传给视觉模型前把图片长边缩小到该像素数，0表示不缩小
+    "IMAGE_MAX_EDGE": int(os.environ.get("MEDIA_IMAGE_MAX_EDGE", "1024")),
+    
+    # 重新编码的格式（JPEG或WEBP）和质量
+    "IMAGE_FORMAT": os.environ.get("MEDIA_IMAGE_FORMAT", "JPEG").upper(),
+    "IMAGE_QUALITY": int(os.environ.get("MEDIA_IMAGE_QUALITY", "80")),
+    
+    # 直接读取远程视频时的连接和读取超时（秒），同时用作下载时的单次读取超时
+    "VIDEO_TIMEOUT": float(os.environ.get("MEDIA_VIDEO_TIMEOUT", "15")),
+    
+    # 无法直接读取时下载完整视频的总超时（秒）和大小上限（MB）
+    "VIDEO_DOWNLOAD_TIMEOUT": float(os.environ.get("MEDIA_VIDEO_DOWNLOAD_TIMEOUT", "60")),
+    "VIDEO_MAX_DOWNLOAD_MB": int(os.environ.get("MEDIA_VIDEO_MAX_DOWNLOAD_MB", "200")),
+    
+    # 选取视频关键帧前均匀采样的候选帧数，从中选出画面差异最大的3帧。
+    # 远程视频每个候选帧需要一次跳转和Range请求，6个候选帧即6次请求（只取3帧时为3次）
+    "VIDEO_CANDIDATE_FRAMES": int(os.environ.get("MEDIA_VIDEO_CANDIDATE_FRAMES", "6")),
+}
+
+# 图片分析结果缓存配置（按感知哈希查找近似图片）
+IMAGE_CACHE_CONFIG = {
+    # 是否启用图片分析结果缓存
+    "ENABLED": os.environ.get("IMAGE_CACHE_ENABLED", "True").lower() == "true",
+    
+    # 最多保留的图片数
+    "MAX_SIZE": int(os.environ.get("IMAGE_CACHE_MAX_SIZE", "5000")),
+    
+    # 视为同一张图片的最大汉明距离（64位dHash），0表示只复用完全相同的哈希
+    "MAX_DISTANCE": int(os.environ.get("IMAGE_CACHE_MAX_DISTANCE", "6")),
+    
+    # 分析结果的有效期（秒）
+    "TTL": float(os.environ.get("IMAGE_CACHE_TTL", str(30 * 24 * 3600))),
+    
+    # SQLite缓存文件路径，留空则只使用进程内缓存
+    "DB_PATH": os.environ.get("IMAGE_CACHE_DB_PATH", ""),
+}
+
+# 浏览器池配置
+BROWSER_CONFIG = {
+    # 最多同时存在的Chrome浏览器数量
+    "POOL_SIZE": int(os.environ.get("BROWSER_POOL_SIZE", "2")),
+    
+    # 每个浏览器最多访问的页面数，达到后关闭重建
+    "MAX_PAGES_PER_DRIVER": int(os.environ.get("BROWSER_MAX_PAGES", "50")),
+    
+    # 是否使用无头模式
+    "HEADLESS": os.environ.get("BROWSER_HEADLESS", "True").lower() == "true",
+    
+    # chromedriver路径，留空则由webdriver_manager自动下载（只执行一次）
+    "DRIVER_PATH": os.environ.get("CHROMEDRIVER_PATH", ""),
+    
+    # 等待空闲浏览器的最长时间（秒）
+    "CHECKOUT_TIMEOUT": float(os.environ.get("BROWSER_CHECKOUT_TIMEOUT", "60")),
+    
+    # 是否拦截不需要的资源（图片、字体、媒体、统计脚本），img/video的src属性不受影响
+    "BLOCK_RESOURCES": os.environ.get("BROWSER_BLOCK_RESOURCES", "True").lower() == "true",
+    
+    # 允许加载的资源类型（Image, Font, Media, Tracker之外的类型始终加载）
+    "ALLOWED_RESOURCE_TYPES": [t.strip() for t in os.environ.get(
+        "BROWSER_ALLOWED_RESOURCE_TYPES", "Document,Script,XHR,Fetch,Stylesheet").split(",") if t.strip()],
+    
+    # 额外需要拦截的URL规则，逗号分隔，支持*通配符
+    "EXTRA_BLOCKED_URLS": [u.strip() for u in os.environ.get("BROWSER_EXTRA_BLOCKED_URLS", "").split(",") if u.strip()],
+    
+    # 页面加载策略: normal（等待load事件）, eager（DOMContentLoaded后返回）, none
+    "PAGE_LOAD_STRATEGY": os.environ.get("BROWSER_PAGE_LOAD_STRATEGY", "eager"),
+    
+    # 等待页面内容就绪的最长时间（秒）
+    "READY_TIMEOUT": float(os.environ.get("BROWSER_READY_TIMEOUT", "10")),
+    
+    # 页面就绪检测的轮询间隔（秒）
+    "READY_POLL_INTERVAL": float(os.environ.get("BROWSER_READY_POLL_INTERVAL", "0.1")),
+    
+    # 批量抓取时一个浏览器中同时打开的最大标签页数
+    "MAX_TABS": int(os.environ.get("BROWSER_MAX_TABS", "4")),
+}
+
+# 批量分析任务队列配置
+JOB_CONFIG = {
+    # 同时执行的最大分析数
+    "MAX_WORKERS": int(os.environ.get("JOB_MAX_WORKERS", "4")),
+    
+    # 排队和执行中的URL总数上限，超过时拒绝新的批量任务
+    "MAX_PENDING": int(os.environ.get("JOB_MAX_PENDING", "1000")),
+    
+    # 单个批量任务最多包含的URL数
+    "MAX_BATCH_SIZE": int(os.environ.get("JOB_MAX_BATCH_SIZE", "500")),
+    
+    # 已完成任务的保留时间（秒）
+    "RESULT_TTL": float(os.environ.get("JOB_RESULT_TTL", "3600")),
+    
+    # SQLite文件路径，多个gunicorn worker共享任务状态时填写；留空则只保存在进程内
+    "DB_PATH": os.environ.get("JOB_DB_PATH", ""),
 }
 
 # 其他配置
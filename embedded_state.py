@@ -0,0 +1,265 @@
+"""
+从页面内嵌的初始数据中快速提取帖子内容
+
+小红书帖子页面在<script>中内嵌了window.__INITIAL_STATE__（或__INITIAL_SSR_STATE__）
+数据，部分页面还带有JSON-LD。直接在原始HTML中定位这段数据并只解析这一段JSON，
+比构建整个BeautifulSoup文档树再逐个尝试CSS选择器快得多。
+只有找不到内嵌数据时，调用方才需要回退到DOM解析。
+
+用法:
+    from embedded_state import extract_embedded_content
+
+    content = extract_embedded_content(html)
+    if content is None:
+        content = parse_with_dom(html)
+"""
+
+import re
+import json
+import logging
+
+logger = logging.getLogger('embedded_state')
+
+# 页面内嵌数据使用的全局变量名，按优先级排序
+STATE_VARIABLES = ("__INITIAL_STATE__", "__INITIAL_SSR_STATE__")
+
+JSON_LD_PATTERN = re.compile(
+    r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+
+# JS对象中JSON不支持的undefined值
+UNDEFINED = "undefined"
+
+def find_balanced_json(text, start):
+    """
+    从start处的"{"开始，找到与之匹配的"}"，忽略字符串中的括号
+
+    Returns:
+        str: 完整的JSON对象文本，括号不匹配时返回None
+    """
+    depth = 0
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    return None
+
+def replace_undefined(text):
+    """
+    把字符串之外的undefined替换为null，字符串中的undefined保持不变
+
+    Returns:
+        str: 可以用json.loads解析的文本
+    """
+    parts = []
+    last = 0
+    in_string = False
+    escaped = False
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "u" and text.startswith(UNDEFINED, index):
+            # 字符串之外的标识符只可能是值，确认前后不是其他标识符的一部分
+            end = index + len(UNDEFINED)
+            before, after = text[index - 1:index], text[end:end + 1]
+            if not any(c.isalnum() or c in "_$" for c in before + after):
+                parts.append(text[last:index])
+                parts.append("null")
+                last = index = end
+                continue
+        index += 1
+    parts.append(text[last:])
+    return "".join(parts)
+
+def find_initial_state(html):
+    """
+    在原始HTML中定位并解析页面初始数据
+
+    Returns:
+        dict: 页面初始数据，找不到或解析失败时返回None
+    """
+    for name in STATE_VARIABLES:
+        position = html.find(name)
+        while position != -1:
+            # 跳过变量名后的空白和等号，找到对象开始位置
+            cursor = position + len(name)
+            while cursor < len(html) and html[cursor] in " \t\r\n=":
+                cursor += 1
+            if cursor < len(html) and html[cursor] == "{" and "=" in html[position + len(name):cursor]:
+                raw = find_balanced_json(html, cursor)
+                if raw:
+                    try:
+                        return json.loads(raw)
+                    except ValueError:
+                        pass
+                    # 只有包含undefined等JS值时才需要逐字符替换
+                    try:
+                        return json.loads(replace_undefined(raw))
+                    except ValueError as e:
+                        logger.debug(f"解析{name}失败: {str(e)}")
+            position = html.find(name, position + len(name))
+    return None
+
+def find_json_ld(html):
+    """
+    在原始HTML中查找包含标题和描述的JSON-LD数据
+
+    Returns:
+        dict: JSON-LD数据，找不到时返回None
+    """
+    if "application/ld+json" not in html:
+        return None
+    for match in JSON_LD_PATTERN.finditer(html):
+        try:
+            data = json.loads(match.group(1))
+        except ValueError:
+            continue
+        if isinstance(data, dict) and 'name' in data and 'description' in data:
+            return data
+    return None
+
+def _get_image_url(image):
+    """兼容新旧两种图片数据结构"""
+    if not isinstance(image, dict):
+        return None
+    url = image.get("url") or image.get("urlDefault")
+    if not url:
+        for info in image.get("infoList") or []:
+            if isinstance(info, dict) and info.get("url"):
+                url = info["url"]
+                break
+    return url
+
+def _get_video_url(video):
+    """兼容新旧两种视频数据结构"""
+    if not isinstance(video, dict):
+        return None
+    if video.get("url"):
+        return video["url"]
+    streams = ((video.get("media") or {}).get("stream") or {})
+    for codec in ("h264", "h265", "av1"):
+        for stream in streams.get(codec) or []:
+            if isinstance(stream, dict) and stream.get("masterUrl"):
+                return stream["masterUrl"]
+    return None
+
+def find_note(state, note_id=None, strict=False):
+    """
+    从页面初始数据中找到帖子数据
+
+    兼容旧结构 {"note": {"title", "desc", ...}} 和
+    新结构 {"note": {"noteDetailMap": {笔记ID: {"note": {...}}}}}。
+    strict为True时只返回ID等于note_id的帖子，不回退到页面中的第一个帖子。
+    """
+    note_state = state.get("note") if isinstance(state, dict) else None
+    if not isinstance(note_state, dict):
+        return None
+
+    detail_map = note_state.get("noteDetailMap")
+    if isinstance(detail_map, dict) and detail_map:
+        note_id = note_id or note_state.get("currentNoteId") or note_state.get("firstNoteId")
+        entry = detail_map.get(note_id) if note_id else None
+        if entry is None:
+            if strict and note_id:
+                return None
+            entry = next(iter(detail_map.values()))
+        note = entry.get("note") if isinstance(entry, dict) else None
+        return note if isinstance(note, dict) else None
+
+    if "desc" in note_state or "title" in note_state:
+        if strict and note_id and note_state.get("noteId", note_id) != note_id:
+            return None
+        return note_state
+    return None
+
+def note_to_content(note):
+    """把帖子数据转换为统一的内容字典"""
+    title = note.get("title") or ""
+    user = note.get("user") or {}
+    if not title and user.get("nickname"):
+        # 如果没有标题，使用作者名称
+        title = user["nickname"] + "的笔记"
+
+    images = []
+    for image in note.get("imageList") or []:
+        url = _get_image_url(image)
+        if url and url not in images:
+            images.append(url)
+
+    return {
+        "title": title,
+        "text": note.get("desc") or "",
+        "images": images,
+        "video": _get_video_url(note.get("video"))
+    }
+
+def extract_embedded_content(html, note_id=None, strict=False):
+    """
+    从页面内嵌数据中提取帖子内容
+
+    Args:
+        html: 页面HTML，str或bytes
+        note_id: 笔记ID，新版页面数据中包含多个笔记时用于选择
+        strict: 为True时页面数据中没有该笔记则不使用初始数据
+
+    Returns:
+        dict: 包含title、text、images、video和source的字典；
+              页面中没有内嵌数据或数据中没有帖子内容时返回None
+    """
+    if not html:
+        return None
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="replace")
+
+    state = find_initial_state(html)
+    if state is not None:
+        note = find_note(state, note_id, strict)
+        if note:
+            content = note_to_content(note)
+            if content["title"] or content["text"]:
+                content["source"] = "initial_state"
+                logger.info("从页面初始数据中提取内容")
+                return content
+
+    data = find_json_ld(html)
+    if data:
+        logger.info("从JSON-LD中提取内容")
+        image = data.get('image')
+        if isinstance(image, list):
+            images = [img for img in image if isinstance(img, str)]
+        else:
+            images = [image] if image else []
+        return {
+            "title": data.get('name') or '未找到标题',
+            "text": data.get('description') or '未找到内容',
+            "images": images,
+            "video": data.get('video', None),
+            "source": "json_ld"
+        }
+
+    return None
@@ -0,0 +1,128 @@
+"""
+共享的HTML解析工具
+
+所有抓取器原来都用BeautifulSoup(html, 'html.parser')解析整个页面，这是最慢的解析器，
+而且小红书页面中的大部分节点（导航、推荐列表、样式等）提取时根本用不到。
+这里统一使用lxml解析，并通过SoupStrainer只保留提取需要的子树:
+- 帖子页面: 标题、meta标签、帖子容器、图片和视频，可选保留script标签
+- 搜索结果页: 帖子列表容器
+
+被保留的元素会带上完整的子树，因此原有的CSS选择器不需要修改。
+未安装lxml时回退到html.parser。
+
+用法:
+    from html_parsing import parse_html, NOTE_STRAINER
+
+    soup = parse_html(html, NOTE_STRAINER)
+    title_elem = soup.select_one('h1.title')
+"""
+
+import re
+import logging
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# 检查是否安装了lxml
+try:
+    import lxml  # noqa: F401
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+logger = logging.getLogger('html_parsing')
+
+PARSER = "lxml" if LXML_AVAILABLE else "html.parser"
+
+if not LXML_AVAILABLE:
+    logger.warning("未安装lxml，HTML解析回退到html.parser")
+
+class TagStrainer(SoupStrainer):
+    """
+    按标签名或class保留子树的SoupStrainer
+
+    标签名在tags中，或者class与classes有交集的元素会连同其全部子元素一起保留，
+    其余元素和顶层文本被丢弃。兼容beautifulsoup4 4.13前后两套过滤接口。
+
+    Args:
+        tags: 需要保留的标签名
+        classes: 需要保留的class名
+    """
+
+    def __init__(self, tags=(), classes=()):
+        super().__init__()
+        self.tags = frozenset(tags)
+        self.classes = frozenset(classes)
+
+    def matches_tag(self, name, attrs):
+        """判断开始标签是否需要保留"""
+        if name in self.tags:
+            return True
+        value = attrs.get("class") if attrs else None
+        if not value or not self.classes:
+            return False
+        if isinstance(value, str):
+            value = value.split()
+        return not self.classes.isdisjoint(value)
+
+    # beautifulsoup4 >= 4.13
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        return self.matches_tag(name, attrs)
+
+    def allow_string_creation(self, string):
+        return False
+
+    # beautifulsoup4 < 4.13
+    def search_tag(self, markup_name=None, markup_attrs={}):
+        return self.matches_tag(markup_name, markup_attrs)
+
+# 帖子页面中提取需要的标签，页面源码回退提取会使用title、article、main和全部img
+NOTE_TAGS = ("title", "meta", "h1", "header", "article", "main", "img", "video")
+
+# 帖子页面选择器用到的容器class
+NOTE_CLASSES = (
+    "title", "content", "desc", "note", "note-content", "note-top", "note-container",
+    "content-container", "post-content", "carousel", "swiper-slide", "slide-item",
+    "image-container", "gallery", "video-container", "upload-image"
+)
+
+# 搜索结果页帖子列表的容器class
+SEARCH_CLASSES = ("note-list", "items-wrapper", "feeds-container", "search-container", "content")
+
+NOTE_STRAINER = TagStrainer(NOTE_TAGS, NOTE_CLASSES)
+
+# 需要从script中查找页面数据时使用
+NOTE_SCRIPT_STRAINER = TagStrainer(NOTE_TAGS + ("script",), NOTE_CLASSES)
+
+SEARCH_STRAINER = TagStrainer(classes=SEARCH_CLASSES)
+
+def parse_html(html, strainer=None):
+    """
+    解析HTML
+
+    Args:
+        html: 页面HTML，str或bytes
+        strainer: 只保留匹配的子树，为None时解析整个文档
+
+    Returns:
+        BeautifulSoup: 解析结果
+    """
+    return BeautifulSoup(html or "", PARSER, parse_only=strainer)
+
+_INVISIBLE_PATTERN = re.compile(
+    r'<(script|style|noscript|template)\b[^>]*>.*?</\1\s*>|<!--.*?-->',
+    re.IGNORECASE | re.DOTALL
+)
+_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+def get_page_text(html):
+    """
+    返回页面的可见文本，用于检查反爬验证等整页文本判断
+
+    只保留部分子树解析后soup.text不再包含整页文本，这里直接用正则去掉脚本、样式和标签，
+    不需要构建文档树。
+    """
+    if not html:
+        return ""
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="replace")
+    return _TAG_PATTERN.sub(" ", _INVISIBLE_PATTERN.sub(" ", html))
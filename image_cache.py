@@ -0,0 +1,352 @@
+"""
+基于感知哈希的图片分析结果缓存
+
+同一张产品图经常出现在多篇帖子和轮播图的不同位置，CDN链接还可能各不相同。
+这里为每张分析过的图片计算64位dHash，新图片与已分析图片的汉明距离不超过
+MAX_DISTANCE时直接复用已有的分析结果，不再调用视觉模型。
+
+- 进程内按LRU保留最多MAX_SIZE张图片，超过容量时淘汰最久未使用的条目
+- 分析结果超过TTL秒后失效；条目记录分析所用的提供商和提示词版本，
+  更换提供商或修改提示词后旧的结果不再使用
+- 配置DB_PATH后同时保存在SQLite中，进程重启后仍然有效；命中时只在内存中
+  记录最近使用，累积到一定数量或写入新结果时再批量更新到SQLite
+- 图片URL到哈希的映射也会缓存，同一URL再次出现时不需要重新下载
+- 精确命中、近似命中和未命中计数，供/status接口展示
+
+近似查找是对所有哈希的线性扫描，每次比较只是一次异或和位计数，
+数千条目的扫描耗时在毫秒级，远小于一次视觉模型调用。
+
+用法:
+    from image_cache import ImageAnalysisCache, compute_hash
+
+    cache = ImageAnalysisCache(provider="deepseek", version="1")
+    image_hash = compute_hash(image_data)
+    analysis = cache.find(image_hash)
+"""
+
+import copy
+import time
+import atexit
+import sqlite3
+import logging
+import threading
+from io import BytesIO
+from collections import OrderedDict
+
+from result_cache import SQLiteStore
+
+# 检查是否安装了Pillow图像处理库
+try:
+    from PIL import Image
+    PILLOW_AVAILABLE = True
+except ImportError:
+    PILLOW_AVAILABLE = False
+
+# 导入配置
+try:
+    from config import IMAGE_CACHE_CONFIG
+except ImportError:
+    IMAGE_CACHE_CONFIG = {
+        "ENABLED": True,
+        "MAX_SIZE": 5000,
+        "MAX_DISTANCE": 6,
+        "TTL": 30 * 24 * 3600,
+        "DB_PATH": ""
+    }
+
+logger = logging.getLogger('image_cache')
+
+# dHash边长，得到HASH_SIZE * HASH_SIZE位哈希
+HASH_SIZE = 8
+
+# 命中多少次后把累积的最近使用记录写入SQLite
+TOUCH_BATCH = 64
+
+def dhash(image, hash_size=HASH_SIZE):
+    """
+    计算图片的差异哈希（dHash）
+
+    缩小为(hash_size + 1) x hash_size的灰度图，比较每行相邻像素的亮度，
+    左边更亮记为1。对缩放、重新压缩和轻微调色不敏感。
+
+    Returns:
+        int: hash_size * hash_size位整数
+    """
+    image = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = image.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def compute_hash(image_data):
+    """
+    计算图片二进制数据的dHash
+
+    Returns:
+        int: 哈希值，未安装Pillow或无法解码时返回None
+    """
+    if not PILLOW_AVAILABLE:
+        return None
+    try:
+        image = Image.open(BytesIO(image_data))
+        # JPEG解码时直接按比例缩小，只需要很小的图
+        image.draft("L", (64, 64))
+        return dhash(image)
+    except Exception as e:
+        logger.debug(f"计算图片哈希失败: {str(e)}")
+        return None
+
+def hamming_distance(a, b):
+    """两个哈希值不同的位数"""
+    return bin(a ^ b).count("1")
+
+class ImageAnalysisCache:
+    """
+    按感知哈希查找的图片分析结果缓存
+
+    Args:
+        provider: 分析图片的提供商，不同提供商的结果互不复用
+        version: 提示词版本，修改提示词或模型后需要更新
+        max_size: 最多保留的图片数，URL映射也按此数量保留
+        max_distance: 视为同一张图片的最大汉明距离，0表示只精确匹配
+        ttl: 分析结果的有效期（秒）
+        db_path: SQLite文件路径，为空时只使用进程内缓存
+        enabled: 是否启用缓存
+    """
+
+    def __init__(self, provider="", version="", max_size=None, max_distance=None, ttl=None,
+                 db_path=None, enabled=None):
+        self.provider = provider
+        self.version = version
+        self.max_size = max_size or IMAGE_CACHE_CONFIG.get("MAX_SIZE", 5000)
+        self.max_distance = max_distance if max_distance is not None else IMAGE_CACHE_CONFIG.get("MAX_DISTANCE", 6)
+        self.ttl = ttl if ttl is not None else IMAGE_CACHE_CONFIG.get("TTL", 30 * 24 * 3600)
+        self.enabled = (enabled if enabled is not None else IMAGE_CACHE_CONFIG.get("ENABLED", True)) and PILLOW_AVAILABLE
+        db_path = db_path if db_path is not None else IMAGE_CACHE_CONFIG.get("DB_PATH", "")
+
+        # 哈希 -> (分析结果, 分析时间)，以及URL -> 哈希，均按LRU排列
+        self._entries = OrderedDict()
+        self._urls = OrderedDict()
+        # 命中后尚未写入SQLite的最近使用记录
+        self._touched = set()
+        self._touched_urls = set()
+        self._touch_count = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "near_hits": 0, "url_hits": 0, "misses": 0, "evictions": 0}
+
+        self.store = None
+        self.url_store = None
+        if self.enabled and db_path:
+            try:
+                self.store = SQLiteStore(db_path, "image_analysis")
+                self.url_store = SQLiteStore(db_path, "image_urls")
+                self._load()
+                # 退出前写入尚未保存的最近使用记录
+                atexit.register(self.flush)
+                logger.info(f"图片分析缓存使用磁盘存储: {db_path}，已加载 {len(self._entries)} 张图片")
+            except sqlite3.Error as e:
+                logger.error(f"无法打开图片分析缓存数据库 {db_path}: {str(e)}，只使用进程内缓存")
+                self.store = self.url_store = None
+
+    def _load(self):
+        """从SQLite加载最近使用的有效条目，最旧的排在LRU队首"""
+        for key, value, _ in reversed(self.store.items(self.max_size)):
+            if not isinstance(value, dict) or not self._matches(value):
+                continue
+            if self._is_fresh(value.get("analyzed_at", 0)):
+                self._entries[int(key, 16)] = (value["analysis"], value["analyzed_at"])
+        for url, key, _ in reversed(self.url_store.items(self.max_size)):
+            self._urls[url] = int(key, 16)
+
+    def _matches(self, value):
+        """SQLite中的条目是否由相同的提供商和提示词版本生成"""
+        return value.get("provider") == self.provider and value.get("version") == self.version
+
+    def _is_fresh(self, analyzed_at):
+        return time.time() - analyzed_at < self.ttl
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _persist(self, image_hash, analysis, analyzed_at, url=None):
+        """写入新的分析结果，写入时间同时作为最近使用时间，并写入累积的最近使用记录"""
+        if not self.store:
+            return
+        key = format(image_hash, "016x")
+        entry = {"provider": self.provider, "version": self.version,
+                 "analyzed_at": analyzed_at, "analysis": analysis}
+        try:
+            self.store.set(key, entry, time.time())
+            self.store.prune(self.max_size)
+            if url:
+                self.url_store.set(url, key, time.time())
+                self.url_store.prune(self.max_size)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.error(f"写入图片分析缓存数据库失败: {str(e)}")
+        self.flush()
+
+    def _persist_url(self, url, image_hash):
+        """写入新的URL映射"""
+        if not self.url_store:
+            return
+        try:
+            self.url_store.set(url, format(image_hash, "016x"), time.time())
+            self.url_store.prune(self.max_size)
+        except sqlite3.Error as e:
+            logger.error(f"写入图片分析缓存数据库失败: {str(e)}")
+
+    def _touch(self, image_hash, url=None):
+        """记录命中的条目，每命中TOUCH_BATCH次批量更新一次SQLite中的最近使用时间"""
+        if not self.store:
+            return
+        with self._lock:
+            self._touched.add(image_hash)
+            if url:
+                self._touched_urls.add(url)
+            self._touch_count += 1
+            full = self._touch_count >= TOUCH_BATCH
+        if full:
+            self.flush()
+
+    def flush(self):
+        """把累积的最近使用记录写入SQLite"""
+        if not self.store:
+            return
+        with self._lock:
+            touched, self._touched = self._touched, set()
+            touched_urls, self._touched_urls = self._touched_urls, set()
+            self._touch_count = 0
+        if not touched and not touched_urls:
+            return
+        now = time.time()
+        try:
+            self.store.touch_many((format(image_hash, "016x") for image_hash in touched), now)
+            self.url_store.touch_many(touched_urls, now)
+        except sqlite3.Error as e:
+            logger.error(f"更新图片分析缓存使用时间失败: {str(e)}")
+
+    def _nearest(self, image_hash):
+        """返回(最接近的哈希, 距离)，没有不超过max_distance的有效条目时返回(None, None)"""
+        with self._lock:
+            entry = self._entries.get(image_hash)
+            if entry is not None and self._is_fresh(entry[1]):
+                return image_hash, 0
+            best, best_distance = None, None
+            for candidate, (_, analyzed_at) in self._entries.items():
+                distance = hamming_distance(image_hash, candidate)
+                if distance <= self.max_distance and (best_distance is None or distance < best_distance) \
+                        and self._is_fresh(analyzed_at):
+                    best, best_distance = candidate, distance
+            return best, best_distance
+
+    def _get(self, image_hash):
+        """读取有效的条目并标记为最近使用，过期的条目直接删除"""
+        with self._lock:
+            entry = self._entries.get(image_hash)
+            if entry is None:
+                return None
+            if not self._is_fresh(entry[1]):
+                del self._entries[image_hash]
+                return None
+            self._entries.move_to_end(image_hash)
+        return entry[0]
+
+    def find(self, image_hash, url=None):
+        """
+        查找与图片相同或近似的已分析图片
+
+        Args:
+            image_hash: 图片的dHash
+            url: 图片URL，命中时记录URL到哈希的映射
+
+        Returns:
+            dict: 分析结果的副本，未命中时返回None
+        """
+        if not self.enabled or image_hash is None:
+            return None
+        match, distance = self._nearest(image_hash)
+        analysis = self._get(match) if match is not None else None
+        if analysis is None:
+            self._count("misses")
+            return None
+
+        self._count("hits" if distance == 0 else "near_hits")
+        if distance:
+            logger.info(f"复用近似图片的分析结果，汉明距离 {distance}")
+        if url and self._remember_url(url, match):
+            self._persist_url(url, match)
+        self._touch(match, url)
+        return copy.deepcopy(analysis)
+
+    def find_by_url(self, url):
+        """
+        按图片URL查找已分析的结果，命中时不需要下载图片
+
+        Returns:
+            dict: 分析结果的副本，未命中时返回None（不计入未命中，调用方会继续按哈希查找）
+        """
+        if not self.enabled or not url:
+            return None
+        with self._lock:
+            image_hash = self._urls.get(url)
+            if image_hash is not None:
+                self._urls.move_to_end(url)
+        analysis = self._get(image_hash) if image_hash is not None else None
+        if analysis is None:
+            return None
+        self._count("url_hits")
+        self._touch(image_hash, url)
+        return copy.deepcopy(analysis)
+
+    def _remember_url(self, url, image_hash):
+        """记录URL到哈希的映射，映射是新的或有变化时返回True"""
+        with self._lock:
+            changed = self._urls.get(url) != image_hash
+            self._urls[url] = image_hash
+            self._urls.move_to_end(url)
+            while len(self._urls) > self.max_size:
+                self._urls.popitem(last=False)
+        return changed
+
+    def set(self, image_hash, analysis, url=None):
+        """
+        保存图片的分析结果
+
+        Args:
+            image_hash: 图片的dHash
+            analysis: 分析结果字典，包含error的结果不保存
+            url: 图片URL
+        """
+        if not self.enabled or image_hash is None or not analysis or "error" in analysis:
+            return
+        analyzed_at = time.time()
+        with self._lock:
+            self._entries[image_hash] = (copy.deepcopy(analysis), analyzed_at)
+            self._entries.move_to_end(image_hash)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        if url:
+            self._remember_url(url, image_hash)
+        self._persist(image_hash, analysis, analyzed_at, url)
+
+    def get_stats(self):
+        """返回命中统计"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self._entries)
+            stats["urls"] = len(self._urls)
+        hits = stats["hits"] + stats["near_hits"] + stats["url_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / lookups, 3) if lookups else None
+        stats["max_size"] = self.max_size
+        stats["max_distance"] = self.max_distance
+        stats["ttl"] = self.ttl
+        stats["provider"] = self.provider
+        stats["version"] = self.version
+        stats["enabled"] = self.enabled
+        return stats
@@ -0,0 +1,289 @@
+"""
+批量分析任务队列
+
+批量提交的URL进入有界的线程池排队执行，提交后立即返回任务ID，
+调用方通过任务ID查询进度和已完成的部分结果，不需要一直占用HTTP连接。
+
+- 同时执行的分析数不超过MAX_WORKERS
+- 排队中的URL总数不超过MAX_PENDING，超过时拒绝新的批量任务
+- 已完成的任务保留RESULT_TTL秒后清除
+- 配置DB_PATH后任务状态同时写入SQLite，多个gunicorn worker都能查询；
+  任务概要和每个URL的状态分别保存，一个URL完成时只写入这一条
+
+用法:
+    from job_queue import JobQueue
+
+    jobs = JobQueue()
+    job = jobs.submit(urls, analyze)
+    status = jobs.get(job.id)
+"""
+
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from result_cache import SQLiteStore
+
+# 导入配置
+try:
+    from config import JOB_CONFIG
+except ImportError:
+    JOB_CONFIG = {
+        "MAX_WORKERS": 4,
+        "MAX_PENDING": 1000,
+        "MAX_BATCH_SIZE": 500,
+        "RESULT_TTL": 3600,
+        "DB_PATH": ""
+    }
+
+logger = logging.getLogger('job_queue')
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+class QueueFullError(Exception):
+    """排队中的URL数量超过上限"""
+
+class Job:
+    """一个批量分析任务及其中每个URL的状态"""
+
+    def __init__(self, urls):
+        self.id = uuid.uuid4().hex
+        self.created_at = time.time()
+        self.finished_at = None
+        # 所有键在创建时就存在，执行线程只修改值，查询时复制字典不会与之冲突
+        self.items = [
+            {"url": url, "status": QUEUED, "result": None, "error": None,
+             "started_at": None, "finished_at": None}
+            for url in urls
+        ]
+
+    @property
+    def status(self):
+        statuses = [item["status"] for item in self.items]
+        if all(status in (COMPLETED, FAILED) for status in statuses):
+            return COMPLETED
+        if all(status == QUEUED for status in statuses):
+            return QUEUED
+        return RUNNING
+
+    def header(self):
+        """返回不包含各URL状态的任务概要，用于持久化"""
+        return {
+            "job_id": self.id,
+            "total": len(self.items),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+    def to_dict(self, include_results=True):
+        """返回任务状态，include_results为False时不包含各URL的分析结果"""
+        return build_status(self.header(), self.items, include_results)
+
+def item_key(job_id, index):
+    """任务中一个URL在SQLite中的键"""
+    return f"{job_id}:{index}"
+
+def build_status(header, items, include_results=True):
+    """由任务概要和各URL的状态生成任务状态"""
+    statuses = [item["status"] for item in items]
+    completed = statuses.count(COMPLETED)
+    failed = statuses.count(FAILED)
+    total = header["total"]
+    if completed + failed == total:
+        status = COMPLETED
+    elif statuses.count(QUEUED) == total:
+        status = QUEUED
+    else:
+        status = RUNNING
+    if include_results:
+        items = [dict(item) for item in items]
+    else:
+        items = [{key: value for key, value in item.items() if key != "result"} for item in items]
+    return {
+        "job_id": header["job_id"],
+        "status": status,
+        "total": total,
+        "completed": completed,
+        "failed": failed,
+        "progress": round((completed + failed) / total, 3) if total else 1.0,
+        "created_at": header["created_at"],
+        "finished_at": header["finished_at"],
+        "items": items
+    }
+
+class JobQueue:
+    """
+    有界的批量分析任务队列
+
+    Args:
+        max_workers: 同时执行的最大分析数
+        max_pending: 排队和执行中的URL总数上限
+        result_ttl: 已完成任务的保留时间（秒）
+        db_path: SQLite文件路径，为空时任务状态只保存在进程内
+    """
+
+    def __init__(self, max_workers=None, max_pending=None, result_ttl=None, db_path=None):
+        self.max_workers = max_workers or JOB_CONFIG.get("MAX_WORKERS", 4)
+        self.max_pending = max_pending or JOB_CONFIG.get("MAX_PENDING", 1000)
+        self.result_ttl = result_ttl if result_ttl is not None else JOB_CONFIG.get("RESULT_TTL", 3600)
+        db_path = db_path if db_path is not None else JOB_CONFIG.get("DB_PATH", "")
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        # 串行化SQLite写入，保证后取得的快照最后写入
+        self._save_lock = threading.Lock()
+        self.stats = {"submitted_jobs": 0, "submitted_urls": 0, "completed_urls": 0,
+                      "failed_urls": 0, "rejected_jobs": 0}
+
+        self.store = None
+        self.item_store = None
+        if db_path:
+            try:
+                self.store = SQLiteStore(db_path, "jobs")
+                self.item_store = SQLiteStore(db_path, "job_items")
+                logger.info(f"任务状态使用磁盘存储: {db_path}")
+            except sqlite3.Error as e:
+                logger.error(f"无法打开任务数据库 {db_path}: {str(e)}，只在进程内保存任务状态")
+                self.store = self.item_store = None
+
+    def submit(self, urls, func):
+        """
+        提交批量任务
+
+        Args:
+            urls: URL列表
+            func: 分析单个URL的函数，参数为URL，返回分析结果
+
+        Returns:
+            Job: 新建的任务
+
+        Raises:
+            QueueFullError: 排队中的URL数量将超过上限
+        """
+        job = Job(urls)
+        with self._lock:
+            if self._pending + len(urls) > self.max_pending:
+                self.stats["rejected_jobs"] += 1
+                raise QueueFullError(f"排队中的URL过多 ({self._pending}/{self.max_pending})，请稍后再试")
+            self._pending += len(urls)
+            self._jobs[job.id] = job
+            self.stats["submitted_jobs"] += 1
+            self.stats["submitted_urls"] += len(urls)
+        self._prune()
+        self._save(job, range(len(job.items)))
+
+        for index in range(len(job.items)):
+            self._executor.submit(self._run_item, job, index, func)
+        logger.info(f"已提交批量任务 {job.id}: {len(urls)} 个URL")
+        return job
+
+    def _run_item(self, job, index, func):
+        """执行任务中的一个URL"""
+        item = job.items[index]
+        # 条目只在持有锁时修改，查询和保存时复制的快照是一致的
+        with self._lock:
+            item["status"] = RUNNING
+            item["started_at"] = time.time()
+        self._save(job, [index])
+
+        update = {}
+        try:
+            update["result"] = func(item["url"])
+            update["status"] = COMPLETED
+            stat = "completed_urls"
+        except Exception as e:
+            logger.error(f"任务 {job.id} 分析 {item['url']} 失败: {str(e)}")
+            update["error"] = str(e)
+            update["status"] = FAILED
+            stat = "failed_urls"
+        update["finished_at"] = time.time()
+
+        with self._lock:
+            item.update(update)
+            self._pending -= 1
+            self.stats[stat] += 1
+            if job.status == COMPLETED and job.finished_at is None:
+                job.finished_at = time.time()
+                logger.info(f"批量任务 {job.id} 已完成")
+        self._save(job, [index])
+
+    def _save(self, job, indexes):
+        """
+        把任务概要和指定URL的状态写入SQLite
+
+        快照在持有锁时复制，写入按取得快照的顺序串行执行，
+        较早的快照不会覆盖较新的状态；已完成URL的结果不会被重复写入。
+        """
+        if not self.store:
+            return
+        with self._save_lock:
+            with self._lock:
+                header = job.header()
+                items = [(index, dict(job.items[index])) for index in indexes]
+            try:
+                self.item_store.set_many(
+                    (item_key(job.id, index), item, job.created_at) for index, item in items
+                )
+                self.store.set(job.id, header, job.created_at)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                logger.error(f"保存任务 {job.id} 状态失败: {str(e)}")
+
+    def _prune(self):
+        """清除超过保留时间的已完成任务"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished_at is not None and now - job.finished_at > self.result_ttl
+            ]
+            expired = [self._jobs.pop(job_id) for job_id in expired]
+        if self.store:
+            for job in expired:
+                self.store.delete(job.id)
+                self.item_store.delete_many(item_key(job.id, index) for index in range(len(job.items)))
+
+    def get(self, job_id, include_results=True):
+        """
+        查询任务状态
+
+        Returns:
+            dict: 任务状态，任务不存在或已过期时返回None
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job.to_dict(include_results)
+
+        # 任务可能由其他worker进程提交
+        if self.store:
+            entry = self.store.get(job_id)
+            if entry is not None:
+                header, _ = entry
+                finished_at = header.get("finished_at")
+                if finished_at is None or time.time() - finished_at <= self.result_ttl:
+                    items = []
+                    for index in range(header["total"]):
+                        item_entry = self.item_store.get(item_key(job_id, index))
+                        if item_entry is None:
+                            return None
+                        items.append(item_entry[0])
+                    return build_status(header, items, include_results)
+        return None
+
+    def get_stats(self):
+        """返回队列统计信息"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["pending_urls"] = self._pending
+            stats["jobs"] = len(self._jobs)
+        stats["max_workers"] = self.max_workers
+        stats["max_pending"] = self.max_pending
+        return stats
@@ -0,0 +1,135 @@
+"""
+大模型调用结果缓存
+
+相同模型、相同提示词模板版本和相同输入（去除多余空白后）的请求直接返回缓存结果，
+不再重复调用大模型API。配置DB_PATH后缓存同时保存在SQLite文件中，进程重启后仍然有效。
+
+用法:
+    import llm_cache
+
+    keywords, analysis = llm_cache.cached_call(
+        "deepseek-chat", "analyze", PROMPT_TEMPLATE_VERSION, (title, text),
+        lambda: call_api(prompt)
+    )
+"""
+
+import re
+import json
+import hashlib
+import logging
+
+from result_cache import ResultCache
+
+# 导入配置
+try:
+    from config import LLM_CACHE_CONFIG
+except ImportError:
+    LLM_CACHE_CONFIG = {
+        "ENABLED": True,
+        "BYPASS": False,
+        "MAX_SIZE": 1000,
+        "TTL": 7 * 24 * 3600,
+        "DB_PATH": ""
+    }
+
+logger = logging.getLogger('llm_cache')
+
+# 大模型结果不做后台刷新，过期即重新调用
+cache = ResultCache(
+    "llm",
+    max_size=LLM_CACHE_CONFIG.get("MAX_SIZE", 1000),
+    ttl=LLM_CACHE_CONFIG.get("TTL", 7 * 24 * 3600),
+    stale_ttl=0,
+    db_path=LLM_CACHE_CONFIG.get("DB_PATH", ""),
+    enabled=LLM_CACHE_CONFIG.get("ENABLED", True)
+)
+
+def normalize_input(value):
+    """规范化提示词输入：去除首尾空白并合并连续空白，递归处理列表和字典"""
+    if isinstance(value, str):
+        return re.sub(r'\s+', ' ', value).strip()
+    if isinstance(value, (list, tuple)):
+        return [normalize_input(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): normalize_input(item) for key, item in value.items()}
+    return value
+
+def make_key(model, task, template_version, inputs):
+    """
+    生成缓存键
+
+    Args:
+        model: 模型名称
+        task: 任务名称，如"analyze"、"generate"
+        template_version: 提示词模板版本
+        inputs: 填入提示词的输入
+
+    Returns:
+        str: sha256摘要
+    """
+    payload = json.dumps(
+        [model, task, template_version, normalize_input(inputs)],
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def is_cacheable(result):
+    """只缓存所有字段都非空的结果，调用失败时的空结果不缓存"""
+    if isinstance(result, (list, tuple)):
+        return all(result)
+    return bool(result)
+
+def cached_call(model, task, template_version, inputs, compute, bypass=False):
+    """
+    带缓存地调用大模型
+
+    Args:
+        model: 模型名称
+        task: 任务名称
+        template_version: 提示词模板版本
+        inputs: 填入提示词的输入
+        compute: 无参数的可调用对象，实际调用大模型并返回结果
+        bypass: 为True时跳过缓存直接调用，结果仍会写入缓存
+
+    Returns:
+        大模型调用结果，从缓存读取的列表会转换为元组
+    """
+    key = make_key(model, task, template_version, inputs)
+
+    if bypass or LLM_CACHE_CONFIG.get("BYPASS", False):
+        result = compute()
+        if cache.enabled and is_cacheable(result):
+            cache.set(key, result)
+        return result
+
+    result = cache.get_or_compute(key, compute, validate=is_cacheable)
+    if isinstance(result, list):
+        # SQLite中以JSON保存，元组会变成列表
+        result = tuple(result)
+    return result
+
+def lookup(model, task, template_version, inputs):
+    """
+    只查询缓存，不调用大模型，用于流式生成等无法通过cached_call包装的调用
+
+    Returns:
+        缓存的结果，未命中或配置为跳过缓存时返回None
+    """
+    if not cache.enabled or LLM_CACHE_CONFIG.get("BYPASS", False):
+        return None
+    result, state = cache.get(make_key(model, task, template_version, inputs))
+    if state != "fresh":
+        return None
+    if isinstance(result, list):
+        result = tuple(result)
+    return result
+
+def store(model, task, template_version, inputs, result):
+    """把调用结果写入缓存，空结果不写入"""
+    if cache.enabled and is_cacheable(result):
+        cache.set(make_key(model, task, template_version, inputs), result)
+
+def get_stats():
+    """返回缓存命中统计"""
+    return cache.get_stats()
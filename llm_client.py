@@ -0,0 +1,276 @@
+"""
+大模型API调用客户端
+
+DeepSeek和OpenAI的文本、图片分析调用都通过这里发送:
+- 每个提供商复用一个requests.Session连接池，保持TLS长连接
+- 明确的连接超时和读取超时，避免单个请求无限等待
+- 每个提供商一个信号量，限制同时在途的请求数
+- 遇到429或5xx时退避重试，优先遵守响应中的Retry-After；
+  收到Retry-After后同一提供商的其他请求也会等到该时间再发送
+
+用法:
+    import llm_client
+
+    content = llm_client.chat("deepseek", "deepseek-chat", messages,
+                              response_format={"type": "json_object"})
+    for delta in llm_client.chat_stream("openai", "gpt-3.5-turbo", messages):
+        print(delta, end="")
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 导入配置
+try:
+    from config import LLM_CONFIG
+except ImportError:
+    LLM_CONFIG = {
+        "CONNECT_TIMEOUT": 5,
+        "READ_TIMEOUT": 60,
+        "MAX_CONCURRENCY": 4,
+        "MAX_RETRIES": 3,
+        "BACKOFF_BASE": 1,
+        "MAX_BACKOFF": 30
+    }
+
+logger = logging.getLogger('llm_client')
+
+# 提供商的接口地址和密钥环境变量
+PROVIDERS = {
+    "deepseek": {"base_url": "https://api.deepseek.com/v1", "api_key_env": "DEEPSEEK_API_KEY"},
+    "openai": {"base_url": "https://api.openai.com/v1", "api_key_env": "OPENAI_API_KEY"},
+}
+
+# 需要退避重试的状态码
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+def parse_retry_after(value):
+    """
+    解析Retry-After响应头
+
+    Returns:
+        float: 需要等待的秒数，无法解析时返回None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class LLMClient:
+    """
+    单个提供商的调用客户端
+
+    Args:
+        name: 提供商名称
+        base_url: 接口地址
+        api_key: API密钥
+        max_concurrency: 同时在途的最大请求数
+        connect_timeout: 连接超时（秒）
+        read_timeout: 读取超时（秒），流式调用时为两段数据之间的最长间隔
+        max_retries: 429或5xx时的最大重试次数
+        backoff_base: 没有Retry-After时的初始退避时间（秒），每次重试翻倍
+        max_backoff: 单次退避的最长时间（秒），Retry-After超过该值时不再重试
+    """
+
+    def __init__(self, name, base_url, api_key, max_concurrency=None, connect_timeout=None,
+                 read_timeout=None, max_retries=None, backoff_base=None, max_backoff=None):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency or LLM_CONFIG.get("MAX_CONCURRENCY", 4)
+        self.timeout = (
+            connect_timeout or LLM_CONFIG.get("CONNECT_TIMEOUT", 5),
+            read_timeout or LLM_CONFIG.get("READ_TIMEOUT", 60)
+        )
+        self.max_retries = max_retries if max_retries is not None else LLM_CONFIG.get("MAX_RETRIES", 3)
+        self.backoff_base = backoff_base if backoff_base is not None else LLM_CONFIG.get("BACKOFF_BASE", 1)
+        self.max_backoff = max_backoff if max_backoff is not None else LLM_CONFIG.get("MAX_BACKOFF", 30)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.max_concurrency,
+            max_retries=0  # 重试由post自行处理
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        # 收到Retry-After后，在此时间之前不再发送新请求
+        self._blocked_until = 0.0
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "errors": 0, "in_flight": 0}
+
+    def _count(self, stat, delta=1):
+        with self._lock:
+            self.stats[stat] += delta
+
+    def _wait_if_blocked(self):
+        """等待提供商要求的限流时间结束"""
+        delay = self._blocked_until - time.time()
+        if delay > 0:
+            logger.info(f"{self.name} 限流中，等待 {delay:.1f} 秒")
+            time.sleep(delay)
+
+    def _backoff(self, response, attempt):
+        """
+        计算重试前的等待时间，并在429时暂停整个提供商
+
+        Returns:
+            float: 等待秒数，超过上限时返回None表示不再重试
+        """
+        retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+        if retry_after is None:
+            delay = min(self.max_backoff, self.backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+        elif retry_after > self.max_backoff:
+            return None
+        else:
+            delay = retry_after
+        if response is not None and response.status_code == 429:
+            with self._lock:
+                self._blocked_until = max(self._blocked_until, time.time() + delay)
+        return delay
+
+    def _post(self, path, payload, stream=False):
+        """发送请求，429、5xx和连接失败时退避重试，返回状态码正常的响应"""
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        attempt = 0
+        while True:
+            self._wait_if_blocked()
+            self._count("requests")
+            response = None
+            try:
+                response = self.session.post(url, headers=headers, json=payload,
+                                             timeout=self.timeout, stream=stream)
+                if response.status_code not in RETRY_STATUS:
+                    response.raise_for_status()
+                    return response
+                if response.status_code == 429:
+                    self._count("rate_limited")
+                error = requests.HTTPError(f"{response.status_code} {response.reason}", response=response)
+            except requests.ConnectionError as e:
+                # 读取超时不重试，避免尾部延迟成倍增加
+                error = e
+            except requests.RequestException:
+                self._count("errors")
+                raise
+
+            delay = self._backoff(response, attempt) if attempt < self.max_retries else None
+            if response is not None:
+                response.close()
+            if delay is None:
+                self._count("errors")
+                raise error
+            attempt += 1
+            self._count("retries")
+            logger.warning(f"{self.name} 请求失败: {str(error)}，{delay:.1f} 秒后第 {attempt} 次重试")
+            time.sleep(delay)
+
+    def chat(self, model, messages, **params):
+        """
+        调用chat/completions接口
+
+        Args:
+            model: 模型名称
+            messages: 消息列表
+            **params: 其他请求参数，如response_format、max_tokens
+
+        Returns:
+            str: 第一个回复的文本内容
+        """
+        payload = dict(params, model=model, messages=messages)
+        with self._slots:
+            self._count("in_flight")
+            try:
+                response = self._post("chat/completions", payload)
+                result = response.json()
+            finally:
+                self._count("in_flight", -1)
+        choices = result.get("choices") or []
+        if not choices:
+            raise ValueError(f"{self.name} 返回空结果")
+        return choices[0]["message"]["content"]
+
+    def chat_stream(self, model, messages, **params):
+        """
+        流式调用chat/completions接口，逐段返回生成的文本
+
+        流式响应以server-sent events返回，每行"data: {...}"包含一段增量文本。
+        生成期间一直占用并发名额。
+        """
+        payload = dict(params, model=model, messages=messages, stream=True)
+        with self._slots:
+            self._count("in_flight")
+            try:
+                with self._post("chat/completions", payload, stream=True) as response:
+                    response.encoding = "utf-8"
+                    for line in response.iter_lines(decode_unicode=True):
+                        if not line or not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        choices = json.loads(data).get("choices") or []
+                        if choices:
+                            delta = (choices[0].get("delta") or {}).get("content")
+                            if delta:
+                                yield delta
+            finally:
+                self._count("in_flight", -1)
+
+    def get_stats(self):
+        """返回调用统计"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["max_concurrency"] = self.max_concurrency
+        stats["blocked_for"] = round(max(0.0, self._blocked_until - time.time()), 1)
+        return stats
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(provider):
+    """获取提供商的共享客户端，首次使用时创建"""
+    client = _clients.get(provider)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        # 双重检查，避免并发时重复创建
+        client = _clients.get(provider)
+        if client is None:
+            config = PROVIDERS[provider]
+            client = LLMClient(provider, config["base_url"], os.environ.get(config["api_key_env"], ""))
+            _clients[provider] = client
+            logger.info(f"创建大模型客户端: {provider}")
+    return client
+
+def chat(provider, model, messages, **params):
+    """使用提供商的共享客户端调用chat/completions接口，返回回复文本"""
+    return get_client(provider).chat(model, messages, **params)
+
+def chat_stream(provider, model, messages, **params):
+    """使用提供商的共享客户端流式调用chat/completions接口，逐段返回生成的文本"""
+    return get_client(provider).chat_stream(model, messages, **params)
+
+def get_stats():
+    """返回已创建客户端的调用统计"""
+    return {name: client.get_stats() for name, client in list(_clients.items())}
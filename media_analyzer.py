@@ -1,4 +1,5 @@
 import os
+import time
 import requests
 import tempfile
 import json
@@ -6,17 +7,14 @@ import base64
 from io import BytesIO
 from urllib.parse import urlparse, unquote
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
-# 检查是否安装了OpenAI和DeepSeek库
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+import llm_client
+from image_cache import ImageAnalysisCache, compute_hash
 
 # 检查是否安装了Pillow图像处理库
 try:
-    from PIL import Image
+    from PIL import Image, ImageOps
     PILLOW_AVAILABLE = True
 except ImportError:
     PILLOW_AVAILABLE = False
@@ -29,17 +27,58 @@ try:
 except ImportError:
     VIDEO_PROCESSING_AVAILABLE = False
 
+# 导入配置
+try:
+    from config import MEDIA_CONFIG
+except ImportError:
+    MEDIA_CONFIG = {
+        "MAX_WORKERS": 4,
+        "ANALYSIS_TIMEOUT": 60,
+        "IMAGE_MAX_EDGE": 1024,
+        "IMAGE_FORMAT": "JPEG",
+        "IMAGE_QUALITY": 80,
+        "VIDEO_TIMEOUT": 15,
+        "VIDEO_DOWNLOAD_TIMEOUT": 60,
+        "VIDEO_MAX_DOWNLOAD_MB": 200,
+        "VIDEO_CANDIDATE_FRAMES": 6
+    }
+
 # 定义API密钥和默认配置
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
 DEEPSEEK_API_KEY = os.environ.get("DEEPSEEK_API_KEY", "")
 
-# 如果有OpenAI API密钥，则配置客户端
-if OPENAI_API_KEY and OPENAI_AVAILABLE:
-    openai.api_key = OPENAI_API_KEY
-
 # 使用哪个AI服务，优先DeepSeek，其次OpenAI
 USE_DEEPSEEK = DEEPSEEK_API_KEY != ""
-USE_OPENAI = not USE_DEEPSEEK and OPENAI_API_KEY != "" and OPENAI_AVAILABLE
+USE_OPENAI = not USE_DEEPSEEK and OPENAI_API_KEY != ""
+
+# 图片分析提示词版本，修改提示词或视觉模型后更新，旧的缓存结果不再使用
+IMAGE_PROMPT_VERSION = "1"
+
+# 图片分析结果缓存，近似图片复用同一提供商、同一提示词版本的分析结果
+image_analysis_cache = ImageAnalysisCache(
+    provider="deepseek" if USE_DEEPSEEK else "openai" if USE_OPENAI else "",
+    version=IMAGE_PROMPT_VERSION
+)
+
+VIDEO_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0"
+
+# 下载视频的请求头
+VIDEO_HEADERS = {
+    "User-Agent": VIDEO_USER_AGENT,
+    "Accept": "video/webm,video/ogg,video/*;q=0.9,application/ogg;q=0.7,audio/*;q=0.6,*/*;q=0.5",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6",
+    "Referer": "https://www.xiaohongshu.com/",
+    "Sec-Fetch-Dest": "video",
+    "Sec-Fetch-Mode": "no-cors",
+    "Sec-Fetch-Site": "cross-site"
+}
+
+if VIDEO_PROCESSING_AVAILABLE:
+    # OpenCV的FFmpeg后端打开网络视频时从这个环境变量读取HTTP选项，CDN需要Referer
+    os.environ.setdefault(
+        "OPENCV_FFMPEG_CAPTURE_OPTIONS",
+        f"user_agent;{VIDEO_USER_AGENT}|headers;Referer: https://www.xiaohongshu.com/\r\n"
+    )
 
 def analyze_image(image_url):
     """
@@ -58,6 +97,11 @@ def analyze_image(image_url):
     if not PILLOW_AVAILABLE:
         return {"error": "未安装Pillow库，无法处理图片"}
     
+    # 同一URL已经分析过时不需要重新下载
+    cached = image_analysis_cache.find_by_url(image_url)
+    if cached is not None:
+        return cached
+    
     try:
         # 下载图片
         headers = {
@@ -73,6 +117,12 @@ def analyze_image(image_url):
         response = requests.get(image_url, headers=headers, stream=True, timeout=10)
         response.raise_for_status()
         
+        # 相同或近似的图片已经分析过时直接复用结果
+        image_hash = compute_hash(response.content)
+        cached = image_analysis_cache.find(image_hash, image_url)
+        if cached is not None:
+            return cached
+        
         # 使用DeepSeek或OpenAI进行图片分析
         if USE_DEEPSEEK:
             result = analyze_image_with_deepseek(response.content)
@@ -80,6 +130,7 @@ def analyze_image(image_url):
             if "error" in result:
                 print(f"DeepSeek图片分析失败: {result['error']}，使用模拟分析结果")
                 return generate_mock_image_analysis()
+            image_analysis_cache.set(image_hash, result, image_url)
             return result
         elif USE_OPENAI:
             result = analyze_image_with_openai(response.content)
@@ -87,6 +138,7 @@ def analyze_image(image_url):
             if "error" in result:
                 print(f"OpenAI图片分析失败: {result['error']}，使用模拟分析结果")
                 return generate_mock_image_analysis()
+            image_analysis_cache.set(image_hash, result, image_url)
             return result
         else:
             return {"error": "无法使用AI服务分析图片"}
@@ -95,16 +147,74 @@ def analyze_image(image_url):
         print(f"图片分析失败: {str(e)}，使用模拟分析结果")
         return generate_mock_image_analysis()
 
-def analyze_image_with_openai(image_data):
-    """使用OpenAI Vision API分析图片"""
+def prepare_image(image_data):
+    """
+    上传给视觉模型前预处理图片
+    
+    按EXIF方向旋转后把长边缩小到IMAGE_MAX_EDGE，去掉EXIF等元数据，
+    重新编码为JPEG或WEBP。CDN原图常有数MB，预处理后通常只有几十到一两百KB。
+    未安装Pillow或无法解码时返回原始数据。
+    
+    Args:
+        image_data: 图片二进制数据
+        
+    Returns:
+        tuple: (图片数据, MIME类型)
+    """
+    if not PILLOW_AVAILABLE:
+        return image_data, "image/jpeg"
+    
+    max_edge = MEDIA_CONFIG.get("IMAGE_MAX_EDGE", 1024)
+    image_format = "WEBP" if MEDIA_CONFIG.get("IMAGE_FORMAT", "JPEG") == "WEBP" else "JPEG"
     try:
-        # 将图片编码为base64
-        base64_image = base64.b64encode(image_data).decode('utf-8')
+        image = Image.open(BytesIO(image_data))
+        if max_edge:
+            # JPEG解码时直接按比例缩小，避免先解码完整分辨率
+            image.draft("RGB", (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+        
+        # 透明背景填充为白色，JPEG不支持透明通道
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        
+        if max_edge:
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        
+        # 只保存像素数据，不写入EXIF和ICC等元数据
+        output = BytesIO()
+        image.save(output, format=image_format, quality=MEDIA_CONFIG.get("IMAGE_QUALITY", 80), optimize=True)
+        return output.getvalue(), f"image/{image_format.lower()}"
+    except Exception as e:
+        print(f"图片预处理失败: {str(e)}，使用原图")
+        return image_data, "image/jpeg"
+
+def image_data_url(image_data, mime_type=None):
+    """
+    返回base64编码的data URL
+
+    Args:
+        image_data: 图片二进制数据
+        mime_type: 已经缩小并编码好的图片的MIME类型，为None时先预处理图片
+    """
+    if mime_type is None:
+        image_data, mime_type = prepare_image(image_data)
+    return f"data:{mime_type};base64,{base64.b64encode(image_data).decode('utf-8')}"
+
+def analyze_image_with_openai(image_data, mime_type=None):
+    """使用OpenAI Vision API分析图片，mime_type不为None时图片已经编码好，不再预处理"""
+    try:
+        # 缩小并重新编码后转换为base64
+        data_url = image_data_url(image_data, mime_type)
         
         # 发送请求到OpenAI
-        response = openai.chat.completions.create(
-            model="gpt-4-vision-preview",
-            messages=[
+        content = llm_client.chat(
+            "openai", "gpt-4-vision-preview",
+            [
                 {
                     "role": "user",
                     "content": [
@@ -112,7 +222,7 @@ def analyze_image_with_openai(image_data):
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
+                                "url": data_url
                             }
                         }
                     ]
@@ -123,7 +233,7 @@ def analyze_image_with_openai(image_data):
         )
         
         # 解析结果
-        result = json.loads(response.choices[0].message.content)
+        result = json.loads(content)
         return {
             "content": result.get("content", "未识别到内容"),
             "objects": result.get("objects", []),
@@ -136,21 +246,16 @@ def analyze_image_with_openai(image_data):
     except Exception as e:
         return {"error": f"OpenAI图片分析失败: {str(e)}"}
 
-def analyze_image_with_deepseek(image_data):
-    """使用DeepSeek API分析图片"""
+def analyze_image_with_deepseek(image_data, mime_type=None):
+    """使用DeepSeek API分析图片，mime_type不为None时图片已经编码好，不再预处理"""
     try:
-        # 将图片编码为base64
-        base64_image = base64.b64encode(image_data).decode('utf-8')
+        # 缩小并重新编码后转换为base64
+        data_url = image_data_url(image_data, mime_type)
         
-        # 构建API请求
-        url = "https://api.deepseek.com/v1/chat/completions"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {DEEPSEEK_API_KEY}"
-        }
-        data = {
-            "model": "deepseek-vision",
-            "messages": [
+        # 发送请求到DeepSeek，返回空结果时抛出异常
+        content = llm_client.chat(
+            "deepseek", "deepseek-vision",
+            [
                 {
                     "role": "user",
                     "content": [
@@ -158,34 +263,26 @@ def analyze_image_with_deepseek(image_data):
                         {
                             "type": "image",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
+                                "url": data_url
                             }
                         }
                     ]
                 }
             ],
-            "response_format": {"type": "json_object"}
-        }
-        
-        # 发送请求
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        response_data = response.json()
+            response_format={"type": "json_object"}
+        )
         
         # 解析结果
-        if "choices" in response_data and len(response_data["choices"]) > 0:
-            result = json.loads(response_data["choices"][0]["message"]["content"])
-            return {
-                "content": result.get("content", "未识别到内容"),
-                "objects": result.get("objects", []),
-                "style": result.get("style", "未识别到风格"),
-                "quality": result.get("quality", 0),
-                "appeal": result.get("appeal", 0),
-                "keywords": result.get("keywords", []),
-                "ai_service": "DeepSeek"
-            }
-        else:
-            return {"error": "DeepSeek返回空结果"}
+        result = json.loads(content)
+        return {
+            "content": result.get("content", "未识别到内容"),
+            "objects": result.get("objects", []),
+            "style": result.get("style", "未识别到风格"),
+            "quality": result.get("quality", 0),
+            "appeal": result.get("appeal", 0),
+            "keywords": result.get("keywords", []),
+            "ai_service": "DeepSeek"
+        }
     except Exception as e:
         return {"error": f"DeepSeek图片分析失败: {str(e)}"}
 
@@ -211,69 +308,36 @@ def analyze_video(video_url):
     try:
         # 创建临时目录
         with tempfile.TemporaryDirectory() as temp_dir:
-            # 下载视频
             yt = None
-            video_path = None
+            video_source = video_url
             
-            # 判断是否为YouTube视频
+            # YouTube视频使用视频流的直接地址，同样不需要下载
             if "youtube.com" in video_url or "youtu.be" in video_url:
                 yt = pytube.YouTube(video_url)
                 stream = yt.streams.filter(progressive=True, file_extension='mp4').first()
-                video_path = stream.download(output_path=temp_dir)
-            else:
-                # 非YouTube视频，直接下载
-                local_filename = unquote(os.path.basename(urlparse(video_url).path))
-                if not local_filename.endswith('.mp4'):
-                    local_filename += '.mp4'
-                
-                video_path = os.path.join(temp_dir, local_filename)
-                headers = {
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0",
-                    "Accept": "video/webm,video/ogg,video/*;q=0.9,application/ogg;q=0.7,audio/*;q=0.6,*/*;q=0.5",
-                    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6",
-                    "Accept-Encoding": "gzip, deflate, br",
-                    "Referer": "https://www.xiaohongshu.com/",
-                    "Range": "bytes=0-",
-                    "Sec-Fetch-Dest": "video",
-                    "Sec-Fetch-Mode": "no-cors",
-                    "Sec-Fetch-Site": "cross-site"
-                }
-                response = requests.get(video_url, headers=headers, stream=True)
-                response.raise_for_status()
-                with open(video_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
+                video_source = stream.url
             
-            # 提取视频关键帧
-            frames = extract_keyframes(video_path)
+            # 直接读取远程视频，只请求元数据和关键帧附近的数据
+            frames = []
+            cap = open_video_stream(video_source)
+            if cap is not None:
+                frames = extract_keyframes(cap)
+            
+            # 服务器不支持Range请求等情况下，回退到下载完整视频
+            if not frames:
+                print("无法直接读取远程视频，下载后提取关键帧")
+                frames = extract_keyframes(download_video(video_source, temp_dir))
             
             # 如果无法提取帧，使用模拟数据
             if not frames:
                 print("未能提取视频帧，使用模拟分析结果")
                 return generate_mock_video_analysis()
             
-            # 分析关键帧
-            frame_analyses = []
-            for i, frame in enumerate(frames[:3]):  # 只分析前3个关键帧
-                # 将帧保存为临时文件
-                frame_path = os.path.join(temp_dir, f"frame_{i}.jpg")
-                cv2.imwrite(frame_path, frame)
-                
-                # 读取帧数据
-                with open(frame_path, 'rb') as f:
-                    frame_data = f.read()
-                
-                # 分析帧
-                if USE_DEEPSEEK:
-                    frame_analysis = analyze_image_with_deepseek(frame_data)
-                else:
-                    frame_analysis = analyze_image_with_openai(frame_data)
-                
-                # 如果单帧分析失败，使用模拟数据
-                if "error" in frame_analysis:
-                    frame_analysis = generate_mock_image_analysis()
-                    
-                frame_analyses.append(frame_analysis)
+            # 同时分析关键帧（最多3帧），结果顺序与帧的时间顺序一致
+            frames = frames[:3]
+            workers = min(MEDIA_CONFIG.get("MAX_WORKERS", 4), len(frames))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frame") as executor:
+                frame_analyses = list(executor.map(analyze_frame, frames))
             
             # 合并分析结果
             return consolidate_video_analysis(frame_analyses, yt)
@@ -282,26 +346,174 @@ def analyze_video(video_url):
         print(f"视频分析失败: {str(e)}，使用模拟分析结果")
         return generate_mock_video_analysis()
 
-def extract_keyframes(video_path, max_frames=3):
-    """提取视频关键帧"""
+def encode_frame(frame):
+    """
+    在内存中把OpenCV帧编码为JPEG，不经过临时文件
+    
+    先按IMAGE_MAX_EDGE缩小，返回指向编码缓冲区的memoryview，不再复制数据。
+    """
+    max_edge = MEDIA_CONFIG.get("IMAGE_MAX_EDGE", 1024)
+    height, width = frame.shape[:2]
+    if max_edge and max(height, width) > max_edge:
+        scale = max_edge / max(height, width)
+        frame = cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, MEDIA_CONFIG.get("IMAGE_QUALITY", 80)])
+    if not ok:
+        raise ValueError("视频帧编码失败")
+    return memoryview(buffer)
+
+def analyze_frame(frame):
+    """分析一个视频帧，失败时使用模拟分析结果"""
+    try:
+        # 帧已经缩小并编码为JPEG，直接上传，不再经过prepare_image重新编码
+        frame_data = encode_frame(frame)
+        if USE_DEEPSEEK:
+            frame_analysis = analyze_image_with_deepseek(frame_data, "image/jpeg")
+        else:
+            frame_analysis = analyze_image_with_openai(frame_data, "image/jpeg")
+    except Exception as e:
+        frame_analysis = {"error": str(e)}
+    
+    # 如果单帧分析失败，使用模拟数据
+    if "error" in frame_analysis:
+        frame_analysis = generate_mock_image_analysis()
+    return frame_analysis
+
+def open_video_stream(video_url):
+    """
+    用OpenCV的FFmpeg后端直接打开远程视频
+    
+    打开时只读取容器元数据，之后每次跳转到关键帧位置都通过HTTP Range请求
+    读取附近的数据，读取量与采样帧数相关，与视频长度无关。
+    
+    Returns:
+        cv2.VideoCapture: 打开失败时返回None
+    """
+    timeout_ms = int(MEDIA_CONFIG.get("VIDEO_TIMEOUT", 15) * 1000)
+    cap = cv2.VideoCapture(video_url, cv2.CAP_FFMPEG, [
+        cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms,
+        cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms
+    ])
+    if not cap.isOpened():
+        cap.release()
+        return None
+    return cap
+
+def download_video(video_url, temp_dir):
+    """
+    下载完整视频到临时目录，用于无法直接读取远程视频的情况
+    
+    单次读取和总耗时都有超时，超过VIDEO_MAX_DOWNLOAD_MB时放弃下载。
+    
+    Returns:
+        str: 本地文件路径
+    """
+    local_filename = unquote(os.path.basename(urlparse(video_url).path)) or "video"
+    if not local_filename.endswith('.mp4'):
+        local_filename += '.mp4'
+    video_path = os.path.join(temp_dir, local_filename)
+    
+    timeout = MEDIA_CONFIG.get("VIDEO_TIMEOUT", 15)
+    deadline = time.monotonic() + MEDIA_CONFIG.get("VIDEO_DOWNLOAD_TIMEOUT", 60)
+    max_bytes = MEDIA_CONFIG.get("VIDEO_MAX_DOWNLOAD_MB", 200) * 1024 * 1024
+    
+    with requests.get(video_url, headers=VIDEO_HEADERS, stream=True, timeout=(timeout, timeout)) as response:
+        response.raise_for_status()
+        size = 0
+        with open(video_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"视频超过 {max_bytes // (1024 * 1024)} MB，放弃下载")
+                if time.monotonic() > deadline:
+                    raise TimeoutError("视频下载超时")
+                f.write(chunk)
+    return video_path
+
+def frame_signature(frame):
+    """帧的HSV颜色直方图，用于比较两帧是否属于同一场景"""
+    small = cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [16, 8], [0, 180, 0, 256])
+    return cv2.normalize(hist, hist).flatten()
+
+def frame_detail(frame):
+    """帧的细节程度（拉普拉斯方差），纯色、黑屏和模糊的帧数值很低"""
+    gray = cv2.cvtColor(cv2.resize(frame, (160, 90), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    return cv2.Laplacian(gray, cv2.CV_64F).var()
+
+def select_scene_frames(frames, max_frames=3):
+    """
+    从候选帧中选出画面差异最大的几帧
+    
+    先选细节最丰富的一帧，之后每次选与已选帧颜色直方图差异（巴氏距离）最小值最大的一帧，
+    使选出的帧尽量来自不同场景，同时避开黑屏和转场。
+    
+    Args:
+        frames: 按时间排列的候选帧
+        max_frames: 最多选出的帧数
+        
+    Returns:
+        list: 选中的帧，保持时间顺序
+    """
+    if len(frames) <= max_frames:
+        return frames
+    
+    signatures = [frame_signature(frame) for frame in frames]
+    details = [frame_detail(frame) for frame in frames]
+    
+    # 排除几乎没有细节的帧（黑屏、纯色转场），剩余帧不够时仍然保留
+    threshold = max(details) * 0.1
+    usable = [i for i in range(len(frames)) if details[i] >= threshold]
+    if len(usable) < max_frames:
+        usable = list(range(len(frames)))
+    
+    chosen = [max(usable, key=lambda i: details[i])]
+    while len(chosen) < max_frames:
+        best, best_distance = None, -1.0
+        for i in usable:
+            if i in chosen:
+                continue
+            distance = min(cv2.compareHist(signatures[i], signatures[c], cv2.HISTCMP_BHATTACHARYYA) for c in chosen)
+            # 差异相同时优先细节更丰富的帧
+            if distance > best_distance or (distance == best_distance and details[i] > details[best]):
+                best, best_distance = i, distance
+        chosen.append(best)
+    
+    return [frames[i] for i in sorted(chosen)]
+
+def extract_keyframes(video, max_frames=3, candidates=None):
+    """
+    提取视频关键帧
+    
+    在视频5%-95%范围内均匀采样候选帧，再按场景差异选出max_frames帧。
+    远程视频每个候选帧需要一次跳转和Range请求，候选帧数就是跳转次数。
+    
+    Args:
+        video: 本地文件路径、视频URL或已打开的cv2.VideoCapture，提取后会被释放
+        max_frames: 最多提取的帧数
+        candidates: 候选帧数，默认使用MEDIA_CONFIG中的VIDEO_CANDIDATE_FRAMES
+    """
+    candidates = max(candidates or MEDIA_CONFIG.get("VIDEO_CANDIDATE_FRAMES", 6), max_frames)
+    
     # 打开视频
-    cap = cv2.VideoCapture(video_path)
+    cap = video if isinstance(video, cv2.VideoCapture) else cv2.VideoCapture(video)
     
-    # 获取视频信息
+    # 获取视频信息，直播流等没有时长信息时只取第一帧
     frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     fps = cap.get(cv2.CAP_PROP_FPS)
-    duration = frame_count / fps
+    if frame_count <= 0 or fps <= 0:
+        ret, frame = cap.read()
+        cap.release()
+        return [frame] if ret else []
     
     # 计算采样点
-    keyframe_positions = [
-        int(duration * 0.1 * fps),  # 视频开始10%处
-        int(duration * 0.5 * fps),  # 视频中间处
-        int(duration * 0.8 * fps)   # 视频80%处
-    ]
+    step = 0.9 / max(candidates - 1, 1)
+    positions = sorted({int(frame_count * (0.05 + step * i)) for i in range(candidates)})
     
-    # 提取关键帧
+    # 提取候选帧
     frames = []
-    for position in keyframe_positions:
+    for position in positions:
         cap.set(cv2.CAP_PROP_POS_FRAMES, position)
         ret, frame = cap.read()
         if ret:
@@ -310,7 +522,7 @@ def extract_keyframes(video_path, max_frames=3):
     # 释放资源
     cap.release()
     
-    return frames
+    return select_scene_frames(frames, max_frames)
 
 def consolidate_video_analysis(frame_analyses, yt_info=None):
     """合并多个帧分析结果"""
@@ -372,27 +584,52 @@ def consolidate_video_analysis(frame_analyses, yt_info=None):
     
     return result
 
-def batch_analyze_images(image_urls, max_images=3):
+def batch_analyze_images(image_urls, max_images=3, max_workers=None, timeout=None):
     """
-    批量分析多张图片
+    并发分析多张图片
+    
+    图片下载和大模型调用在线程池中同时进行，结果顺序与输入顺序一致。
     
     Args:
         image_urls: 图片URL列表
         max_images: 最大分析图片数量
+        max_workers: 最大并发数，默认使用MEDIA_CONFIG中的配置
+        timeout: 单张图片的分析超时（秒），超时的图片返回error结果
         
     Returns:
         list: 图片分析结果列表
     """
-    results = []
-    
     # 限制处理图片数量
     urls_to_analyze = image_urls[:max_images]
+    if not urls_to_analyze:
+        return []
     
-    for url in urls_to_analyze:
-        result = analyze_image(url)
-        results.append(result)
+    max_workers = max_workers or MEDIA_CONFIG.get("MAX_WORKERS", 4)
+    timeout = timeout or MEDIA_CONFIG.get("ANALYSIS_TIMEOUT", 60)
+    workers = min(max_workers, len(urls_to_analyze))
     
-    return results
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="media")
+    try:
+        futures = [executor.submit(analyze_image, url) for url in urls_to_analyze]
+        start = time.monotonic()
+        
+        results = []
+        for index, future in enumerate(futures):
+            # 超出并发数的图片需要排队，按所在批次顺延截止时间
+            deadline = start + timeout * (index // workers + 1)
+            try:
+                results.append(future.result(timeout=max(0, deadline - time.monotonic())))
+            except FutureTimeoutError:
+                print(f"图片分析超时: {urls_to_analyze[index]}")
+                results.append({"error": "图片分析超时"})
+            except Exception as e:
+                print(f"图片分析失败: {str(e)}")
+                results.append({"error": str(e)})
+        
+        return results
+    finally:
+        # 不等待超时的任务结束
+        executor.shutdown(wait=False, cancel_futures=True)
 
 def get_media_improvements(image_analyses, video_analysis):
     """
@@ -0,0 +1,248 @@
+"""
+API代理服务提供商的健康状态与熔断器
+
+为每个提供商维护一个熔断器:
+- 记录最近若干次请求的成功率和延迟
+- 连续失败或成功率过低时熔断（open），冷却期内不再向该提供商发送请求
+- 冷却期结束后进入半开（half_open）状态，只放行一个探测请求，成功则恢复，失败则继续熔断
+- 没有配置密钥的提供商直接跳过，不发送任何请求
+
+choose_provider()在健康的提供商中选择平均延迟最低的一个。
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+
+# 导入配置
+try:
+    from config import PROVIDER_HEALTH_CONFIG
+except ImportError:
+    PROVIDER_HEALTH_CONFIG = {
+        "WINDOW": 20,
+        "MIN_SAMPLES": 5,
+        "FAILURE_THRESHOLD": 3,
+        "MIN_SUCCESS_RATE": 0.5,
+        "COOLDOWN": 60
+    }
+
+logger = logging.getLogger('provider_health')
+
+# 提供商参数中表示密钥的字段
+CREDENTIAL_PARAMS = ("api_key", "apikey", "access_key", "token")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+def has_credentials(provider_config):
+    """
+    检查提供商是否配置了有效的密钥
+
+    Args:
+        provider_config: API_PROVIDERS中的提供商配置
+
+    Returns:
+        bool: 密钥字段存在且不是空值或占位符
+    """
+    if not provider_config:
+        return False
+    params = provider_config.get("params", {})
+    for name in CREDENTIAL_PARAMS:
+        if name in params:
+            value = params[name]
+            return bool(value) and not str(value).startswith("YOUR_")
+    return True
+
+class CircuitBreaker:
+    """单个提供商的熔断器"""
+
+    def __init__(self, name, window=20, min_samples=5, failure_threshold=3,
+                 min_success_rate=0.5, cooldown=60):
+        self.name = name
+        self.min_samples = min_samples
+        self.failure_threshold = failure_threshold
+        self.min_success_rate = min_success_rate
+        self.cooldown = cooldown
+
+        self.state = CLOSED
+        self.samples = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def success_rate(self):
+        """最近请求的成功率，没有样本时返回None"""
+        if not self.samples:
+            return None
+        return sum(1 for ok, _ in self.samples if ok) / len(self.samples)
+
+    @property
+    def avg_latency(self):
+        """最近成功请求的平均延迟（秒），没有样本时返回None"""
+        latencies = [latency for ok, latency in self.samples if ok]
+        if not latencies:
+            return None
+        return sum(latencies) / len(latencies)
+
+    @property
+    def avg_failure_latency(self):
+        """最近失败请求的平均耗时（秒），没有失败样本时返回None"""
+        latencies = [latency for ok, latency in self.samples if not ok]
+        if not latencies:
+            return None
+        return sum(latencies) / len(latencies)
+
+    def _current_state(self):
+        """返回当前状态，冷却期结束的熔断器转为半开"""
+        if self.state == OPEN and time.time() - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+            logger.info(f"提供商 {self.name} 冷却结束，进入半开状态")
+        return self.state
+
+    def is_available(self):
+        """是否可以被选中（不占用半开探测名额）"""
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (state == HALF_OPEN and not self.probe_in_flight)
+
+    def allow_request(self):
+        """是否允许发送请求，半开状态下只放行一个探测请求"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                logger.info(f"向提供商 {self.name} 发送探测请求")
+                return True
+            return False
+
+    def _open(self, reason):
+        self.state = OPEN
+        self.opened_at = time.time()
+        self.probe_in_flight = False
+        logger.warning(f"提供商 {self.name} 熔断 {self.cooldown} 秒: {reason}")
+
+    def record_success(self, latency):
+        """记录一次成功请求"""
+        with self._lock:
+            self.samples.append((True, latency))
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                logger.info(f"提供商 {self.name} 探测成功，恢复使用")
+            self.state = CLOSED
+            self.probe_in_flight = False
+
+    def record_failure(self, latency=0.0, fatal=False):
+        """
+        记录一次失败请求
+
+        Args:
+            latency: 请求耗时（秒）
+            fatal: 是否为不可恢复的错误（如授权失败），是则立即熔断
+        """
+        with self._lock:
+            self.samples.append((False, latency))
+            self.consecutive_failures += 1
+
+            if fatal:
+                self._open("授权失败")
+            elif self.state == HALF_OPEN:
+                self._open("探测请求失败")
+            elif self.consecutive_failures >= self.failure_threshold:
+                self._open(f"连续失败 {self.consecutive_failures} 次")
+            elif len(self.samples) >= self.min_samples and self.success_rate < self.min_success_rate:
+                self._open(f"成功率 {self.success_rate:.0%} 过低")
+
+    def get_stats(self):
+        """返回熔断器统计信息"""
+        with self._lock:
+            state = self._current_state()
+            success_rate = self.success_rate
+            avg_latency = self.avg_latency
+            return {
+                "state": state,
+                "samples": len(self.samples),
+                "success_rate": round(success_rate, 3) if success_rate is not None else None,
+                "avg_latency": round(avg_latency, 3) if avg_latency is not None else None,
+                "consecutive_failures": self.consecutive_failures
+            }
+
+class ProviderHealth:
+    """管理所有提供商的熔断器"""
+
+    def __init__(self, config=None):
+        self.config = config or PROVIDER_HEALTH_CONFIG
+        self.breakers = {}
+        self._lock = threading.Lock()
+
+    def get_breaker(self, name):
+        """获取提供商的熔断器，不存在时创建"""
+        with self._lock:
+            breaker = self.breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    name,
+                    window=self.config.get("WINDOW", 20),
+                    min_samples=self.config.get("MIN_SAMPLES", 5),
+                    failure_threshold=self.config.get("FAILURE_THRESHOLD", 3),
+                    min_success_rate=self.config.get("MIN_SUCCESS_RATE", 0.5),
+                    cooldown=self.config.get("COOLDOWN", 60)
+                )
+                self.breakers[name] = breaker
+            return breaker
+
+    def choose_provider(self, providers, preferred=None, exclude=()):
+        """
+        选择最快的健康提供商
+
+        Args:
+            providers: {名称: 提供商配置}
+            preferred: 优先的提供商，延迟相同（如都没有样本）时排在前面
+            exclude: 需要排除的提供商名称
+
+        Returns:
+            str: 提供商名称，没有可用的提供商时返回None
+        """
+        available = []
+        for index, (name, provider_config) in enumerate(providers.items()):
+            if name in exclude or not has_credentials(provider_config):
+                continue
+            breaker = self.get_breaker(name)
+            if breaker.is_available():
+                available.append((index, name, breaker))
+        if not available:
+            return None
+
+        latencies = [breaker.avg_latency for _, _, breaker in available]
+        worst = max((latency for latency in latencies if latency is not None), default=0.0)
+        candidates = []
+        for (index, name, breaker), latency in zip(available, latencies):
+            failed_only = latency is None and bool(breaker.samples)
+            if failed_only:
+                # 只有失败样本的提供商排在所有成功过的提供商之后
+                latency = max(worst, breaker.avg_failure_latency or 0.0)
+            elif latency is None:
+                # 从未尝试过的提供商视为0，保证新提供商有机会被尝试
+                latency = 0.0
+            candidates.append((latency, failed_only, name != preferred, index, name))
+        return min(candidates)[4]
+
+    def get_stats(self, providers=None):
+        """返回各提供商的健康状态"""
+        stats = {}
+        names = list(providers.keys()) if providers else list(self.breakers.keys())
+        for name in names:
+            entry = self.get_breaker(name).get_stats()
+            if providers:
+                entry["configured"] = has_credentials(providers[name])
+            stats[name] = entry
+        return stats
+
+# 全局健康状态实例
+health = ProviderHealth()
@@ -0,0 +1,252 @@
+"""
+按域名调度请求的礼貌性调度器
+
+由调度器统一决定每个请求*何时*可以发出，取代请求路径中固定的time.sleep:
+- 对小红书等需要控制频率的域名，使用令牌桶 + 最小间隔 + 随机抖动限制请求节奏
+- 没有配置策略的域名（API代理服务、图片CDN、大模型API等）不受影响，可以并发执行
+- 空闲的域名第一次请求立即放行，只有请求过密时才需要等待
+
+调度状态默认保存在进程内存中；配置SCHEDULER_STATE_PATH后使用文件锁
+在多个gunicorn worker进程之间共享，保证整体请求预算不被突破。
+
+用法:
+    import request_scheduler
+
+    request_scheduler.wait("https://www.xiaohongshu.com/explore/xxx")
+    await request_scheduler.wait_async(url)
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# 文件锁仅在类Unix系统上可用
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# 导入配置
+try:
+    from config import SCHEDULER_CONFIG
+except ImportError:
+    SCHEDULER_CONFIG = {
+        "STATE_PATH": "",
+        "POLICIES": {
+            "xiaohongshu.com": {
+                "rate": 0.5,
+                "burst": 3,
+                "min_interval": 1.0,
+                "jitter": 2.0
+            }
+        }
+    }
+
+logger = logging.getLogger('request_scheduler')
+
+class HostPolicy:
+    """
+    单个域名的请求策略
+
+    Args:
+        rate: 令牌补充速率（每秒请求数）
+        burst: 令牌桶容量，允许的突发请求数
+        min_interval: 相邻两次请求的最小间隔（秒）
+        jitter: 需要排队时额外添加的随机抖动上限（秒），避免固定节奏
+    """
+
+    def __init__(self, rate=0.5, burst=3, min_interval=1.0, jitter=2.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_interval = min_interval
+        self.jitter = jitter
+
+class LocalStateBackend:
+    """进程内的调度状态存储"""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self, key):
+        """在锁内读取并更新某个域名的状态"""
+        with self._lock:
+            state = self._states.setdefault(key, {})
+            yield state
+
+class FileStateBackend:
+    """
+    基于文件锁的共享调度状态存储
+
+    所有worker进程对同一个JSON文件加排他锁后读-改-写，
+    每次事务只持锁几微秒，不会成为瓶颈。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def transaction(self, key):
+        """在文件锁内读取并更新某个域名的状态"""
+        with self._lock:
+            with open(self.path, "a+", encoding="utf-8") as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    raw = f.read()
+                    try:
+                        states = json.loads(raw) if raw else {}
+                    except ValueError:
+                        logger.warning(f"调度状态文件损坏，已重置: {self.path}")
+                        states = {}
+
+                    state = states.setdefault(key, {})
+                    yield state
+
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(states, f)
+                    f.flush()
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class RequestScheduler:
+    """按域名决定请求发出时间的调度器"""
+
+    def __init__(self, policies=None, state_path=None):
+        self.policies = {}
+        for host, policy in (policies or {}).items():
+            self.policies[host] = policy if isinstance(policy, HostPolicy) else HostPolicy(**policy)
+
+        if state_path and FCNTL_AVAILABLE:
+            self.backend = FileStateBackend(state_path)
+            logger.info(f"请求调度器使用共享状态: {state_path}")
+        else:
+            if state_path:
+                logger.warning("当前系统不支持文件锁，请求调度器退回到进程内状态")
+            self.backend = LocalStateBackend()
+
+    def get_policy(self, host):
+        """
+        查找域名对应的策略，支持后缀匹配
+
+        例如为"xiaohongshu.com"配置的策略同样作用于"www.xiaohongshu.com"。
+
+        Returns:
+            tuple: (策略键, HostPolicy)，没有策略时返回(None, None)
+        """
+        host = host.split(":")[0].lower()
+        for key, policy in self.policies.items():
+            if host == key or host.endswith("." + key):
+                return key, policy
+        return None, None
+
+    def reserve(self, url_or_host, extra_delay=0.0):
+        """
+        为一次请求预约发出时间，不阻塞
+
+        Args:
+            url_or_host: 请求URL或域名
+            extra_delay: 额外延迟（秒），用于重试退避
+
+        Returns:
+            float: 距离允许发出请求还需等待的秒数
+        """
+        host = _get_host(url_or_host)
+        key, policy = self.get_policy(host)
+        if policy is None:
+            return max(0.0, extra_delay)
+
+        with self.backend.transaction(key) as state:
+            now = time.time()
+            tokens = state.get("tokens", policy.burst)
+            updated = state.get("updated", now)
+            next_allowed = state.get("next_allowed", 0.0)
+
+            # tokens是updated时刻（上一次预约的发出时间）剩余的令牌，
+            # 令牌不足1个时等到补满1个为止
+            start = max(now, next_allowed)
+            if tokens < 1:
+                start = max(start, updated + (1 - tokens) / policy.rate)
+
+            # 只有需要排队时才添加抖动，空闲域名的请求立即放行
+            if start > now and policy.jitter > 0:
+                start += random.uniform(0, policy.jitter)
+
+            # 从updated补充到start只计算一次，再扣除本次请求的令牌
+            tokens = min(policy.burst, tokens + max(0.0, start - updated) * policy.rate) - 1
+            state["tokens"] = tokens
+            state["updated"] = max(updated, start)
+            state["next_allowed"] = start + policy.min_interval
+
+        # 重试退避只推迟本次请求，不影响同一域名的其他请求
+        return start - now + max(0.0, extra_delay)
+
+    def penalize(self, url_or_host, seconds):
+        """
+        推迟某个域名的下一次请求时间，例如收到429响应后
+
+        对共享状态生效时，所有worker都会一起退让。
+        """
+        host = _get_host(url_or_host)
+        key, policy = self.get_policy(host)
+        if policy is None:
+            return
+
+        with self.backend.transaction(key) as state:
+            state["next_allowed"] = max(state.get("next_allowed", 0.0), time.time() + seconds)
+        logger.warning(f"{host} 的请求推迟 {seconds:.1f} 秒")
+
+    def wait(self, url_or_host, extra_delay=0.0):
+        """同步等待直到允许发出请求，返回实际等待的秒数"""
+        delay = self.reserve(url_or_host, extra_delay)
+        if delay > 0:
+            logger.debug(f"等待 {delay:.2f} 秒后请求 {_get_host(url_or_host)}")
+            time.sleep(delay)
+        return delay
+
+    async def wait_async(self, url_or_host, extra_delay=0.0):
+        """异步等待直到允许发出请求，等待期间不占用线程"""
+        delay = self.reserve(url_or_host, extra_delay)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+def _get_host(url_or_host):
+    """从URL或域名中取得域名"""
+    if "://" in url_or_host:
+        return urlparse(url_or_host).netloc
+    return url_or_host
+
+# 全局调度器实例
+scheduler = RequestScheduler(
+    policies=SCHEDULER_CONFIG.get("POLICIES"),
+    state_path=SCHEDULER_CONFIG.get("STATE_PATH")
+)
+
+def reserve(url_or_host, extra_delay=0.0):
+    """为一次请求预约发出时间，返回需要等待的秒数"""
+    return scheduler.reserve(url_or_host, extra_delay)
+
+def penalize(url_or_host, seconds):
+    """推迟某个域名的下一次请求时间"""
+    return scheduler.penalize(url_or_host, seconds)
+
+def wait(url_or_host, extra_delay=0.0):
+    """同步等待直到允许发出请求"""
+    return scheduler.wait(url_or_host, extra_delay)
+
+async def wait_async(url_or_host, extra_delay=0.0):
+    """异步等待直到允许发出请求"""
+    return await scheduler.wait_async(url_or_host, extra_delay)
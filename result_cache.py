@@ -0,0 +1,301 @@
+"""
+带TTL和LRU淘汰的结果缓存
+
+- 进程内缓存: OrderedDict实现的LRU，超过容量时淘汰最久未使用的条目
+- 磁盘缓存（可选）: 配置db_path后使用SQLite保存，进程重启或多个worker之间可以共享
+- 过期后仍可复用（stale-while-revalidate）: 在stale_ttl内直接返回旧结果，同时在后台刷新
+- 命中/未命中计数，供/status接口展示
+
+用法:
+    from result_cache import ResultCache
+
+    cache = ResultCache("analysis", max_size=256, ttl=3600)
+    result = cache.get_or_compute(key, lambda: analyze(url))
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# 导入配置
+try:
+    from config import CACHE_CONFIG
+except ImportError:
+    CACHE_CONFIG = {
+        "ENABLED": True,
+        "MAX_SIZE": 256,
+        "TTL": 3600,
+        "STALE_TTL": 86400,
+        "DB_PATH": ""
+    }
+
+logger = logging.getLogger('result_cache')
+
+FRESH = "fresh"
+STALE = "stale"
+
+# 后台刷新过期条目的线程池，所有缓存实例共用
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+
+class SQLiteStore:
+    """基于SQLite的磁盘缓存"""
+
+    def __init__(self, path, table):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key):
+        """返回(值, 写入时间)，不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0]), row[1]
+        except ValueError:
+            return None
+
+    def set(self, key, value, stored_at):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), stored_at)
+            )
+            self._conn.commit()
+
+    def set_many(self, entries):
+        """在一个事务中写入多条(键, 值, 写入时间)"""
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at) VALUES (?, ?, ?)",
+                [(key, json.dumps(value, ensure_ascii=False), stored_at) for key, value, stored_at in entries]
+            )
+            self._conn.commit()
+
+    def touch_many(self, keys, stored_at):
+        """在一个事务中更新多条的写入时间，不重写值"""
+        with self._lock:
+            self._conn.executemany(
+                f"UPDATE {self.table} SET stored_at = ? WHERE key = ?",
+                [(stored_at, key) for key in keys]
+            )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def delete_many(self, keys):
+        """在一个事务中删除多条"""
+        with self._lock:
+            self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", [(key,) for key in keys])
+            self._conn.commit()
+
+    def prune(self, max_size):
+        """只保留最近写入的max_size条"""
+        with self._lock:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key NOT IN "
+                f"(SELECT key FROM {self.table} ORDER BY stored_at DESC LIMIT ?)",
+                (max_size,)
+            )
+            self._conn.commit()
+
+    def items(self, limit=None):
+        """返回(键, 值, 写入时间)列表，按写入时间从新到旧排列"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, value, stored_at FROM {self.table} ORDER BY stored_at DESC LIMIT ?",
+                (limit if limit is not None else -1,)
+            ).fetchall()
+        items = []
+        for key, value, stored_at in rows:
+            try:
+                items.append((key, json.loads(value), stored_at))
+            except ValueError:
+                continue
+        return items
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+class ResultCache:
+    """
+    两级结果缓存
+
+    Args:
+        name: 缓存名称，同时作为SQLite表名
+        max_size: 最大条目数
+        ttl: 条目保持新鲜的时间（秒）
+        stale_ttl: 过期后仍可返回旧结果并在后台刷新的时间（秒），0表示不复用过期结果
+        db_path: SQLite文件路径，为空时只使用进程内缓存
+        enabled: 是否启用缓存，关闭时get_or_compute直接计算
+    """
+
+    def __init__(self, name, max_size=None, ttl=None, stale_ttl=None, db_path=None, enabled=None):
+        self.name = name
+        self.max_size = max_size or CACHE_CONFIG.get("MAX_SIZE", 256)
+        self.ttl = ttl if ttl is not None else CACHE_CONFIG.get("TTL", 3600)
+        self.stale_ttl = stale_ttl if stale_ttl is not None else CACHE_CONFIG.get("STALE_TTL", 86400)
+        self.enabled = enabled if enabled is not None else CACHE_CONFIG.get("ENABLED", True)
+        db_path = db_path if db_path is not None else CACHE_CONFIG.get("DB_PATH", "")
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "evictions": 0}
+
+        self.store = None
+        if db_path:
+            try:
+                self.store = SQLiteStore(db_path, name)
+                logger.info(f"缓存 {name} 使用磁盘存储: {db_path}")
+            except sqlite3.Error as e:
+                logger.error(f"无法打开缓存数据库 {db_path}: {str(e)}，只使用进程内缓存")
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _state(self, stored_at):
+        """根据写入时间判断条目状态，完全过期时返回None"""
+        age = time.time() - stored_at
+        if age < self.ttl:
+            return FRESH
+        if age < self.ttl + self.stale_ttl:
+            return STALE
+        return None
+
+    def _set_memory(self, key, value, stored_at):
+        with self._lock:
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def get(self, key):
+        """
+        查找缓存条目
+
+        Returns:
+            tuple: (值, 状态)，状态为"fresh"或"stale"；未命中时返回(None, None)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None and self.store:
+            entry = self.store.get(key)
+            if entry is not None:
+                self._set_memory(key, *entry)
+
+        if entry is None:
+            return None, None
+
+        value, stored_at = entry
+        state = self._state(stored_at)
+        if state is None:
+            self.delete(key)
+            return None, None
+        return value, state
+
+    def set(self, key, value):
+        """写入缓存条目"""
+        stored_at = time.time()
+        self._set_memory(key, value, stored_at)
+        if self.store:
+            try:
+                self.store.set(key, value, stored_at)
+                self.store.prune(self.max_size)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                logger.error(f"写入缓存数据库失败: {str(e)}")
+
+    def delete(self, key):
+        """删除缓存条目"""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.store:
+            self.store.delete(key)
+
+    def _refresh(self, key, compute, validate):
+        """后台重新计算过期条目"""
+        try:
+            value = compute()
+            if validate is None or validate(value):
+                self.set(key, value)
+                self._count("refreshes")
+        except Exception as e:
+            logger.error(f"后台刷新缓存 {key} 失败: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_compute(self, key, compute, validate=None):
+        """
+        从缓存获取结果，未命中时计算并写入缓存
+
+        Args:
+            key: 缓存键
+            compute: 无参数的可调用对象，返回要缓存的结果
+            validate: 结果校验函数，只缓存通过校验的结果
+
+        Returns:
+            缓存的或新计算的结果
+        """
+        if not self.enabled:
+            return compute()
+
+        value, state = self.get(key)
+        if state == FRESH:
+            self._count("hits")
+            logger.info(f"缓存命中: {key}")
+            return value
+
+        if state == STALE:
+            self._count("stale_hits")
+            logger.info(f"缓存已过期，返回旧结果并在后台刷新: {key}")
+            with self._lock:
+                start_refresh = key not in self._refreshing
+                self._refreshing.add(key)
+            if start_refresh:
+                _refresh_executor.submit(self._refresh, key, compute, validate)
+            return value
+
+        self._count("misses")
+        value = compute()
+        if validate is None or validate(value):
+            self.set(key, value)
+        return value
+
+    def get_stats(self):
+        """返回命中统计"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 3) if lookups else None
+        if self.store:
+            try:
+                stats["disk_size"] = self.store.count()
+            except sqlite3.Error:
+                stats["disk_size"] = None
+        stats["enabled"] = self.enabled
+        return stats
@@ -0,0 +1,260 @@
+"""
+预编译的选择器提取计划
+
+原来的提取代码对标题、正文、图片、视频的每个候选选择器分别调用select_one/select，
+每次调用都要重新解析选择器字符串并遍历整个文档树，一个页面最多要遍历约20次。
+SelectorPlan在导入时一次性编译所有选择器，提取时只遍历文档树一次，
+同时为所有字段收集匹配元素，并保持原有的选择器优先级和取值方式。
+
+代理、基础和Selenium提取器的候选选择器和取值方式各不相同，各自使用自己的计划，
+结果与原来逐个调用select_one/select完全一致。相同的选择器字符串由soupsieve的
+编译缓存共享同一个编译结果。
+
+用法:
+    from selector_plan import PROXY_NOTE_PLAN, first_match_text
+
+    fields = PROXY_NOTE_PLAN.run(soup)
+    title = first_match_text(fields["title"])
+"""
+
+import re
+import logging
+from urllib.parse import urljoin
+
+import soupsieve
+from bs4 import Tag
+
+logger = logging.getLogger('selector_plan')
+
+# 字段的取值方式
+# 每个选择器匹配的第一个元素，按选择器优先级排列（select_one(a) or select_one(b) or ...）
+FIRST = "first"
+# 每个选择器匹配的全部元素，按选择器优先级拼接（select(a) + select(b) + ...）
+ALL = "all"
+# 第一个有匹配的选择器的全部元素（select(a) or select(b) or ...）
+FIRST_SELECTOR = "first_selector"
+
+# 复合选择器开头的标签名和第一个class
+COMPOUND_PATTERN = re.compile(r'^([a-zA-Z][\w-]*)?(?:[^.]*?\.([\w-]+))?')
+
+def compound_key(compound):
+    """
+    返回复合选择器匹配的元素必须具有的class或标签名，class更有区分度因此优先
+
+    Returns:
+        tuple: ("class", class名)或("tag", 标签名)，无法确定时返回None
+    """
+    match = COMPOUND_PATTERN.match(compound)
+    if match.group(2):
+        return ("class", match.group(2))
+    if match.group(1):
+        return ("tag", match.group(1).lower())
+    return None
+
+def selector_keys(selector):
+    """
+    返回(目标元素的key, 祖先元素的key)，只支持后代组合符
+
+    用于遍历时快速排除不可能匹配的选择器，最终是否匹配仍由soupsieve判断。
+    """
+    compounds = selector.split()
+    target = compound_key(compounds[-1])
+    ancestor = compound_key(compounds[0]) if len(compounds) > 1 else None
+    return target, ancestor
+
+def element_keys(element):
+    """返回元素的标签名和class对应的key"""
+    keys = [("tag", element.name)]
+    classes = element.get("class")
+    if classes:
+        keys.extend(("class", cls) for cls in dict.fromkeys(classes))
+    return keys
+
+class SelectorPlan:
+    """
+    一次遍历文档树提取多个字段
+
+    Args:
+        fields: {字段名: (按优先级排序的选择器列表, 取值方式)}
+
+    run()返回{字段名: 元素列表}:
+    - FIRST: 每个选择器匹配的第一个元素，按选择器优先级排列，
+      列表第一个元素等价于select_one(a) or select_one(b) or ...，
+      当前元素的文本或属性为空时可以继续使用下一个
+    - ALL: 每个选择器匹配的全部元素，按选择器优先级、再按文档顺序排列，
+      等价于依次调用select()后拼接
+    - FIRST_SELECTOR: 第一个有匹配的选择器匹配的全部元素，按文档顺序排列，
+      等价于select(a) or select(b) or ...
+    """
+
+    def __init__(self, fields):
+        self.fields = {}
+        self.modes = {}
+        self.multiple = {}
+        self.selectors = {name: list(selectors) for name, (selectors, _) in fields.items()}
+        # 按目标元素的key索引选择器，遍历时每个元素只匹配可能命中的选择器
+        self.index = {}
+        self.unindexed = []
+        for name, (selectors, mode) in fields.items():
+            self.fields[name] = len(selectors)
+            self.modes[name] = mode
+            # 除FIRST外都需要收集每个选择器的全部匹配
+            self.multiple[name] = mode != FIRST
+            for position, selector in enumerate(selectors):
+                target, ancestor = selector_keys(selector)
+                entry = (name, position, ancestor, soupsieve.compile(selector))
+                if target is None:
+                    self.unindexed.append(entry)
+                else:
+                    self.index.setdefault(target, []).append(entry)
+
+    def run(self, soup):
+        """遍历文档树一次，返回各字段匹配的元素"""
+        matches = {name: [[] for _ in range(count)] for name, count in self.fields.items()}
+        # 只取第一个匹配的选择器数量，全部找到且没有需要收集全部匹配的字段时提前结束
+        remaining = sum(count for name, count in self.fields.items() if not self.multiple[name])
+        has_multiple = any(self.multiple.values())
+        # 当前元素所有祖先的key计数
+        ancestors = {}
+
+        # 深度优先遍历，None标记一个元素的子元素已经处理完
+        stack = list(reversed(soup.contents))
+        exits = []
+        while stack:
+            element = stack.pop()
+            if element is None:
+                for key in exits.pop():
+                    ancestors[key] -= 1
+                continue
+            if not isinstance(element, Tag):
+                continue
+
+            keys = element_keys(element)
+            for key in keys:
+                for name, position, ancestor, selector in self.index.get(key, ()):
+                    selector_matches = matches[name][position]
+                    multiple = self.multiple[name]
+                    if selector_matches and not multiple:
+                        continue
+                    if ancestor is not None and not ancestors.get(ancestor):
+                        continue
+                    if selector.match(element):
+                        selector_matches.append(element)
+                        if not multiple:
+                            remaining -= 1
+            for name, position, ancestor, selector in self.unindexed:
+                selector_matches = matches[name][position]
+                if (not selector_matches or self.multiple[name]) and selector.match(element):
+                    selector_matches.append(element)
+                    if not self.multiple[name]:
+                        remaining -= 1
+            if not has_multiple and not remaining:
+                break
+
+            if element.contents:
+                for key in keys:
+                    ancestors[key] = ancestors.get(key, 0) + 1
+                exits.append(keys)
+                stack.append(None)
+                stack.extend(reversed(element.contents))
+
+        results = {}
+        for name, field_matches in matches.items():
+            if self.modes[name] == FIRST_SELECTOR:
+                results[name] = next((selector_matches for selector_matches in field_matches if selector_matches), [])
+            else:
+                results[name] = [element for selector_matches in field_matches for element in selector_matches]
+        return results
+
+def first_match_text(elements):
+    """返回第一个元素的文本（可能为空），没有元素时返回None"""
+    return elements[0].get_text().strip() if elements else None
+
+def first_text(elements):
+    """返回第一个文本非空的元素的文本"""
+    for element in elements:
+        text = element.get_text().strip()
+        if text:
+            return text
+    return None
+
+def first_attr(elements, *attrs):
+    """返回第一个非空的属性值，每个元素依次尝试attrs中的属性"""
+    for element in elements:
+        for attr in attrs:
+            value = element.get(attr)
+            if value:
+                return value
+    return None
+
+def collect_urls(elements, base_url=None, attrs=("src", "data-src")):
+    """
+    收集元素中的http链接并去重，保持顺序
+
+    Args:
+        elements: 元素列表
+        base_url: 页面URL，用于把相对链接转换为完整链接
+        attrs: 依次尝试的链接属性
+    """
+    urls = []
+    for element in elements:
+        url = first_attr([element], *attrs)
+        if url and base_url:
+            url = urljoin(base_url, url)
+        if url and url.startswith("http") and url not in urls:
+            urls.append(url)
+    return urls
+
+# 代理提取器（api_proxy_tool.extract_content_from_html）的提取计划
+PROXY_NOTE_PLAN = SelectorPlan({
+    "title": ([
+        'h1.title', '.note-content .title', '.content .title',
+        '.note-top .title', 'header h1', '.note-container h1'
+    ], FIRST),
+    "text": ([
+        '.note-content .content', '.content .desc', '.note-content .desc',
+        '.note-content', 'article .content', '.post-content'
+    ], FIRST),
+    "images": ([
+        '.note-content img', '.slide-item img', '.image-container img',
+        '.carousel img', '.gallery img', '.note img'
+    ], ALL),
+    "video": (['video source', 'video', '.video-container video'], FIRST),
+    "meta_title": (['meta[property="og:title"]', 'meta[name="title"]'], FIRST),
+    "meta_description": (['meta[property="og:description"]', 'meta[name="description"]'], FIRST),
+})
+
+# 基础提取器（xiaohongshu_tool.parse_post_html）的提取计划，
+# 图片先找轮播图，都没有时再找正文图片和上传图片
+BASIC_NOTE_PLAN = SelectorPlan({
+    "title": (['h1.title', 'div.content-container div.title'], FIRST),
+    "text": (['div.content', 'div.desc'], FIRST),
+    "images": (['div.carousel img', 'div.swiper-slide img'], FIRST_SELECTOR),
+    "fallback_images": (['div.note-content img', 'img.upload-image'], FIRST_SELECTOR),
+    "video": (['video'], FIRST),
+    "meta_title": (['meta[property="og:title"]'], FIRST),
+})
+
+# 基础提取器备选方法（xiaohongshu_tool.parse_post_html_alternative）的提取计划
+ALTERNATIVE_NOTE_PLAN = SelectorPlan({
+    "title": (['h1.title', 'div.content-container div.title'], FIRST),
+    "text": (['div.content', 'div.desc'], FIRST),
+    "images": (['div.carousel img', 'div.swiper-slide img', 'div.note-content img'], FIRST_SELECTOR),
+    "video": (['video'], FIRST),
+})
+
+# Selenium提取器（xiaohongshu_browser_tool.extract_content_from_driver）的提取计划
+BROWSER_NOTE_PLAN = SelectorPlan({
+    "title": (['h1.title', '.note-content .title', '.content .title', '.note-top .title'], FIRST),
+    "text": (['.note-content .content', '.content .desc', '.note-content .desc', '.note-content'], FIRST),
+    "images": (['.note-content img', '.slide-item img', '.image-container img', '.carousel img'], ALL),
+    "video": (['video source', 'video'], FIRST),
+})
+
+# 所有帖子页面的提取计划，供benchmark_parsing对比
+NOTE_PLANS = {
+    "proxy": PROXY_NOTE_PLAN,
+    "basic": BASIC_NOTE_PLAN,
+    "alternative": ALTERNATIVE_NOTE_PLAN,
+    "browser": BROWSER_NOTE_PLAN,
+}
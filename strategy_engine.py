@@ -0,0 +1,218 @@
+"""
+抓取策略执行引擎
+
+按配置的模式执行一组抓取策略，返回第一个通过校验的结果:
+- sequential: 逐个尝试，前一个失败或超出预算后才启动下一个
+- concurrent: 同时启动所有策略
+- hedged: 先启动第一个策略，若在HEDGE_DELAY内没有有效结果（或已经失败）再启动下一个
+
+默认使用sequential，与原来逐个尝试的行为一致；hedged和concurrent需要通过
+STRATEGY_MODE显式开启，它们可能在代理较慢时提前启动浏览器等开销较大的策略。
+
+每个策略都有独立的时间预算，超出预算后不再等待它的结果。得到有效结果后，
+尚未开始的策略会被取消；已经在运行的线程无法被强制中断，会在后台结束，
+其结果直接丢弃。被放弃但仍在运行的策略最多MAX_ABANDONED个，达到上限后
+不再对冲启动新策略，也不再启动下一个策略，避免它们占满共享的线程池。
+
+用法:
+    from strategy_engine import Strategy, run_strategies
+
+    strategies = [
+        Strategy("api_proxy", lambda: proxy_tool.main(url)),
+        Strategy("browser", lambda: fetch_with_browser(url)),
+    ]
+    name, result = run_strategies(strategies)
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# 导入配置
+try:
+    from config import STRATEGY_CONFIG
+except ImportError:
+    STRATEGY_CONFIG = {
+        "MODE": "sequential",
+        "HEDGE_DELAY": 5.0,
+        "TOTAL_BUDGET": 120,
+        "MAX_WORKERS": 8,
+        "MAX_ABANDONED": 4,
+        "BUDGETS": {}
+    }
+
+logger = logging.getLogger('strategy_engine')
+
+MODES = ("sequential", "concurrent", "hedged")
+
+def is_valid_result(result):
+    """
+    检查分析结果是否有效（不是默认的空内容）
+
+    Args:
+        result: 包含original和analysis的分析结果
+
+    Returns:
+        bool: 结果是否有效
+    """
+    return bool(
+        isinstance(result, dict) and
+        result.get('original') and
+        result['original'].get('title') != '未找到标题' and
+        result['original'].get('text') != '未找到内容'
+    )
+
+class Strategy:
+    """
+    一个抓取策略
+
+    Args:
+        name: 策略名称，同时用于在STRATEGY_CONFIG["BUDGETS"]中查找时间预算
+        func: 无参数的可调用对象，返回分析结果
+        budget: 时间预算（秒），None时使用配置中的值，配置中也没有则不限制
+        validate: 结果校验函数，默认使用is_valid_result
+    """
+
+    def __init__(self, name, func, budget=None, validate=None):
+        self.name = name
+        self.func = func
+        if budget is None:
+            budget = STRATEGY_CONFIG.get("BUDGETS", {}).get(name)
+        self.budget = budget
+        self.validate = validate or is_valid_result
+
+class StrategyEngine:
+    """按模式并发或对冲执行抓取策略"""
+
+    def __init__(self, mode=None, hedge_delay=None, total_budget=None, max_workers=None, max_abandoned=None):
+        self.mode = mode or STRATEGY_CONFIG.get("MODE", "sequential")
+        self.hedge_delay = hedge_delay if hedge_delay is not None else STRATEGY_CONFIG.get("HEDGE_DELAY", 5.0)
+        self.total_budget = total_budget if total_budget is not None else STRATEGY_CONFIG.get("TOTAL_BUDGET", 120)
+        self.max_workers = max_workers or STRATEGY_CONFIG.get("MAX_WORKERS", 8)
+        self.max_abandoned = max_abandoned or STRATEGY_CONFIG.get("MAX_ABANDONED", max(1, self.max_workers // 2))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="strategy")
+        # 已放弃但仍在后台运行的策略
+        self._abandoned = set()
+        self._lock = threading.Lock()
+
+    def _abandon(self, future, strategy):
+        """放弃一个策略，尚未开始的直接取消，正在运行的计入后台占用"""
+        if future.cancel():
+            return
+        with self._lock:
+            self._abandoned.add(future)
+        future.add_done_callback(self._release)
+        logger.info(f"策略 {strategy.name} 在后台结束，当前后台策略 {self.abandoned_count} 个")
+
+    def _release(self, future):
+        with self._lock:
+            self._abandoned.discard(future)
+
+    @property
+    def abandoned_count(self):
+        """已放弃但仍在运行的策略数"""
+        with self._lock:
+            return len(self._abandoned)
+
+    def _get_launch_delay(self, mode):
+        """返回启动下一个策略前需要等待的时间"""
+        if mode == "concurrent":
+            return 0.0
+        if mode == "hedged":
+            return self.hedge_delay
+        # sequential: 只有没有策略在运行时才启动下一个
+        return float("inf")
+
+    def run(self, strategies, mode=None):
+        """
+        执行策略并返回第一个有效结果
+
+        Args:
+            strategies: Strategy列表，按优先级排序
+            mode: 执行模式，默认使用配置中的值
+
+        Returns:
+            tuple: (策略名称, 结果)，全部失败时返回(None, None)
+        """
+        mode = mode or self.mode
+        if mode not in MODES:
+            logger.warning(f"未知的策略执行模式 {mode}，改用sequential")
+            mode = "sequential"
+
+        launch_delay = self._get_launch_delay(mode)
+        pending = list(strategies)
+        running = {}
+        start = time.monotonic()
+        total_deadline = start + self.total_budget
+        next_launch = start
+
+        try:
+            while pending or running:
+                now = time.monotonic()
+                if now >= total_deadline:
+                    logger.warning(f"策略链超出总时间预算 {self.total_budget} 秒")
+                    break
+
+                # 后台策略达到上限时不再对冲，也不再启动新策略
+                saturated = self.abandoned_count >= self.max_abandoned
+                if pending and not running and saturated:
+                    logger.warning(f"后台仍有 {self.abandoned_count} 个已放弃的策略在运行，不再启动新策略")
+                    break
+
+                # 启动下一个策略
+                if pending and (not running or (now >= next_launch and not saturated)):
+                    strategy = pending.pop(0)
+                    logger.info(f"启动策略 {strategy.name} ({mode})")
+                    future = self.executor.submit(strategy.func)
+                    deadline = now + strategy.budget if strategy.budget else float("inf")
+                    running[future] = (strategy, now, deadline)
+                    next_launch = now + launch_delay
+                    continue
+
+                # 放弃超出预算的策略
+                for future, (strategy, started, deadline) in list(running.items()):
+                    if now >= deadline:
+                        logger.warning(f"策略 {strategy.name} 超出时间预算 {strategy.budget} 秒，不再等待")
+                        self._abandon(future, strategy)
+                        del running[future]
+                        next_launch = now
+
+                if not running:
+                    continue
+
+                # 等待任意策略完成，或到达下一个时间点
+                wake_at = min([deadline for _, _, deadline in running.values()] + [total_deadline])
+                if pending and not saturated:
+                    wake_at = min(wake_at, next_launch)
+                done, _ = wait(list(running), timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    strategy, started, _ = running.pop(future)
+                    elapsed = time.monotonic() - started
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"策略 {strategy.name} 失败 ({elapsed:.1f}秒): {str(e)}")
+                        next_launch = time.monotonic()
+                        continue
+
+                    if strategy.validate(result):
+                        logger.info(f"策略 {strategy.name} 成功 ({elapsed:.1f}秒)")
+                        return strategy.name, result
+
+                    logger.warning(f"策略 {strategy.name} 返回空结果或默认内容 ({elapsed:.1f}秒)")
+                    next_launch = time.monotonic()
+        finally:
+            # 取消尚未开始的策略，正在运行的在后台结束
+            for future, (strategy, _, _) in running.items():
+                self._abandon(future, strategy)
+
+        return None, None
+
+# 全局策略引擎实例
+engine = StrategyEngine()
+
+def run_strategies(strategies, mode=None):
+    """使用全局策略引擎执行策略，返回(策略名称, 结果)"""
+    return engine.run(strategies, mode)
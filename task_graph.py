@@ -0,0 +1,98 @@
+"""
+按依赖关系并发执行任务的简单任务图
+
+没有依赖关系的任务同时执行，任务在其依赖全部完成后立即启动，
+总耗时约等于最长的依赖链，而不是所有任务耗时之和。
+
+用法:
+    from task_graph import TaskGraph
+
+    graph = TaskGraph()
+    graph.add("keywords", lambda: extract_keywords(text))
+    graph.add("top_posts", lambda keywords: fetch_top_posts(keywords[0]), deps=("keywords",))
+    graph.add("images", lambda: analyze_images(images))
+    results = graph.run()
+"""
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger('task_graph')
+
+class TaskGraph:
+    """
+    依赖感知的任务图
+
+    Args:
+        max_workers: 最大并发任务数，默认与任务数相同
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self.tasks = {}
+
+    def add(self, name, func, deps=()):
+        """
+        添加任务
+
+        Args:
+            name: 任务名称
+            func: 可调用对象，依赖任务的结果以同名关键字参数传入
+            deps: 依赖的任务名称，必须是已经添加的任务，保证任务图没有环
+        """
+        if name in self.tasks:
+            raise ValueError(f"任务 {name} 已存在")
+        for dep in deps:
+            if dep not in self.tasks:
+                raise ValueError(f"任务 {name} 依赖的任务 {dep} 不存在")
+        self.tasks[name] = (func, tuple(deps))
+        return self
+
+    def run(self, on_complete=None):
+        """
+        执行所有任务
+
+        Args:
+            on_complete: 每个任务完成后立即以(任务名称, 结果)调用，在调用run的线程中执行，
+                         可用于逐步返回各阶段的结果
+
+        Returns:
+            dict: {任务名称: 结果}
+
+        Raises:
+            任一任务抛出的异常，此时尚未启动的任务不再执行
+        """
+        if not self.tasks:
+            return {}
+
+        results = {}
+        pending = dict(self.tasks)
+        running = {}
+        start = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers or len(self.tasks),
+                                thread_name_prefix="task") as executor:
+            while pending or running:
+                # 启动依赖已全部完成的任务
+                for name, (func, deps) in list(pending.items()):
+                    if all(dep in results for dep in deps):
+                        kwargs = {dep: results[dep] for dep in deps}
+                        running[executor.submit(func, **kwargs)] = name
+                        del pending[name]
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        logger.error(f"任务 {name} 失败: {str(e)}")
+                        for other in running:
+                            other.cancel()
+                        raise
+                    logger.debug(f"任务 {name} 完成 ({time.monotonic() - start:.2f}秒)")
+                    if on_complete is not None:
+                        on_complete(name, results[name])
+
+        return results
@@ -0,0 +1,73 @@
+import json
+import threading
+
+import pytest
+
+app_module = pytest.importorskip("app")
+
+RESULT = {
+    "original": {"title": "标题", "text": "正文", "images": [], "video": None},
+    "analysis": {"keywords": ["美妆"], "top_posts": []}
+}
+
+def read_events(response):
+    events = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "event" in lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module, "analysis_cache", app_module.ResultCache("test_stream", db_path=""))
+    return app_module.app.test_client()
+
+def test_stream_replays_analyze_result(client, monkeypatch):
+    url = "https://www.xiaohongshu.com/explore/64a1b2c3d4e5f6a7b8c9d0e1"
+    app_module.analysis_cache.set(app_module.get_cache_key(url), RESULT)
+    monkeypatch.setattr(app_module, "analyze_url_staged", lambda *args: pytest.fail("不应重新分析"))
+
+    events = read_events(client.get("/analyze/stream", query_string={"url": url}))
+    assert [name for name, _ in events] == ["content", "keywords", "top_posts", "done"]
+    assert events[-1][1] == RESULT
+
+def test_stream_result_does_not_fill_analyze_cache(client, monkeypatch):
+    url = "https://www.xiaohongshu.com/explore/64a1b2c3d4e5f6a7b8c9d0e2"
+    calls = []
+
+    def staged(url, emit):
+        calls.append(url)
+        emit("content", RESULT["original"])
+        return RESULT
+
+    monkeypatch.setattr(app_module, "analyze_url_staged", staged)
+    for _ in range(2):
+        events = read_events(client.get("/analyze/stream", query_string={"url": url}))
+        assert events[-1] == ("done", RESULT)
+
+    # 流式结果只保存在stream缓存键下，第二次请求直接重放
+    assert calls == [url]
+    assert app_module.analysis_cache.get(app_module.get_cache_key(url))[0] is None
+    assert app_module.analysis_cache.get(app_module.get_cache_key(url, "stream"))[0] == RESULT
+
+def test_concurrent_streams_share_one_analysis(client, monkeypatch):
+    url = "https://www.xiaohongshu.com/explore/64a1b2c3d4e5f6a7b8c9d0e3"
+    release = threading.Event()
+    calls = []
+
+    def staged(url, emit):
+        calls.append(url)
+        emit("content", RESULT["original"])
+        release.wait(5)
+        return RESULT
+
+    monkeypatch.setattr(app_module, "analyze_url_staged", staged)
+    first = app_module.start_stream_analysis(url)
+    second = app_module.start_stream_analysis(url)
+    assert first is second
+    release.set()
+
+    events = [event for event in second.listen(1) if event is not None]
+    assert [name for name, _ in events] == ["content", "done"]
+    assert calls == [url]
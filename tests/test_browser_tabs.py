@@ -0,0 +1,120 @@
+import json
+
+import browser_pool
+import request_scheduler
+import xiaohongshu_browser_tool
+from xiaohongshu_browser_tool import READINESS_SCRIPT
+
+def note_page(note_id):
+    """带有页面初始数据的帖子页面"""
+    state = {"note": {"noteDetailMap": {note_id: {"note": {
+        "noteId": note_id, "title": f"标题{note_id}", "desc": f"正文{note_id}", "imageList": []
+    }}}}}
+    return f"<html><script>window.__INITIAL_STATE__={json.dumps(state)}</script></html>"
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def new_window(self, kind):
+        handle = f"tab{len(self.driver.handles)}"
+        self.driver.handles.append(handle)
+        self.driver.documents[handle] = {"href": "about:blank", "pending": None}
+        self.driver.current_window_handle = handle
+
+    def window(self, handle):
+        self.driver.current_window_handle = handle
+
+class FakeDriver:
+    """
+    记录每个标签页收到的CDP命令，并模拟异步导航
+
+    location.href赋值后，下一次检查时仍是上一个页面，之后新页面才加载完成。
+    """
+
+    def __init__(self):
+        self.handles = ["tab0"]
+        self.current_window_handle = "tab0"
+        self.switch_to = FakeSwitchTo(self)
+        self.cdp = {}
+        self.documents = {"tab0": {"href": "about:blank", "pending": None}}
+
+    @property
+    def window_handles(self):
+        return list(self.handles)
+
+    @property
+    def document(self):
+        return self.documents[self.current_window_handle]
+
+    @property
+    def page_source(self):
+        href = self.document["href"]
+        return note_page(xiaohongshu_browser_tool.extract_note_id(href)) if "item/" in href else "<html></html>"
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.cdp.setdefault(self.current_window_handle, []).append(cmd)
+
+    def execute_script(self, script, *args):
+        document = self.document
+        if script == READINESS_SCRIPT:
+            if document["pending"] is not None:
+                # 第一次检查时新页面还没有开始加载，之后才切换
+                if document["pending"][1]:
+                    document["href"], document["pending"] = document["pending"][0], None
+                else:
+                    document["pending"][1] = True
+            return {"ready": "state", "modalClosed": False, "href": document["href"], "readyState": "complete"}
+        if "location.href = arguments[0]" in script:
+            document["pending"] = [args[0], False]
+            return document["href"]
+        return None
+
+    def close(self):
+        self.handles.remove(self.current_window_handle)
+
+class FakePool:
+    blocked_patterns = ["*.jpg"]
+
+    def __init__(self, driver):
+        self.pooled = browser_pool.PooledDriver(driver)
+
+    def checkout(self):
+        return self.pooled
+
+    def checkin(self, pooled, broken=False):
+        self.broken = broken
+
+def run_multi_tab(monkeypatch, driver, urls, max_tabs):
+    pool = FakePool(driver)
+    monkeypatch.setattr(browser_pool, "get_pool", lambda: pool)
+    monkeypatch.setattr(request_scheduler, "reserve", lambda url, extra_delay=0.0: 0.0)
+    results = xiaohongshu_browser_tool.fetch_posts_multi_tab(urls, max_tabs=max_tabs, timeout=2)
+    assert not pool.broken
+    assert driver.handles == ["tab0"]
+    return results
+
+def test_every_tab_is_prepared(monkeypatch):
+    driver = FakeDriver()
+    # 第一个标签页由浏览器池创建时准备
+    browser_pool.prepare_tab(driver, FakePool.blocked_patterns)
+    driver.cdp.clear()
+
+    urls = [f"https://www.xiaohongshu.com/explore/{i}" for i in range(3)]
+    run_multi_tab(monkeypatch, driver, urls, max_tabs=3)
+
+    assert driver.cdp["tab0"] == ["Network.setUserAgentOverride"]
+    for handle in ("tab1", "tab2"):
+        assert driver.cdp[handle] == [
+            "Page.addScriptToEvaluateOnNewDocument", "Network.enable",
+            "Network.setBlockedURLs", "Network.setUserAgentOverride"
+        ]
+
+def test_reused_tabs_extract_their_own_note(monkeypatch):
+    ids = [f"64a1b2c3d4e5f6a7b8c9d0e{i}" for i in range(5)]
+    urls = [f"https://www.xiaohongshu.com/explore/{note_id}" for note_id in ids]
+    results = run_multi_tab(monkeypatch, FakeDriver(), urls, max_tabs=2)
+
+    for note_id, url in zip(ids, urls):
+        assert results[url]["title"] == f"标题{note_id}"
+        assert results[url]["text"] == f"正文{note_id}"
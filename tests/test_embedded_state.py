@@ -0,0 +1,23 @@
+from embedded_state import extract_embedded_content, find_initial_state, replace_undefined
+
+def test_undefined_values_become_null():
+    assert replace_undefined('{"a":undefined,"b":[1, undefined ],"c":{"d":undefined}}') == \
+        '{"a":null,"b":[1, null ],"c":{"d":null}}'
+
+def test_undefined_inside_strings_is_kept():
+    html = ('<script>window.__INITIAL_STATE__={"note":{"title":"undefined, 还是null?",'
+            '"desc":"say \\"undefined\\"]","video":undefined}}</script>')
+    state = find_initial_state(html)
+    assert state["note"]["title"] == "undefined, 还是null?"
+    assert state["note"]["desc"] == 'say "undefined"]'
+    assert state["note"]["video"] is None
+
+def test_identifiers_containing_undefined_are_untouched():
+    assert replace_undefined('{"a":undefinedValue,"b":$undefined}') == '{"a":undefinedValue,"b":$undefined}'
+
+def test_strict_lookup_does_not_fall_back_to_other_notes():
+    html = ('<script>window.__INITIAL_STATE__={"note":{"noteDetailMap":'
+            '{"aaa":{"note":{"title":"别的帖子","desc":"正文"}}}}}</script>')
+    assert extract_embedded_content(html, "bbb")["title"] == "别的帖子"
+    assert extract_embedded_content(html, "bbb", strict=True) is None
+    assert extract_embedded_content(html, "aaa", strict=True)["title"] == "别的帖子"
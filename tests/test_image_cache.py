@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+import image_cache
+from image_cache import ImageAnalysisCache
+
+pytestmark = pytest.mark.skipif(not image_cache.PILLOW_AVAILABLE, reason="需要Pillow")
+
+ANALYSIS = {"content": "口红", "keywords": ["美妆"]}
+IMAGE_HASH = 0x0F0F0F0F0F0F0F0F
+
+def make_cache(db_path, provider="deepseek", version="1", **kwargs):
+    return ImageAnalysisCache(provider=provider, version=version, db_path=db_path, **kwargs)
+
+def test_entries_are_scoped_to_provider_and_version(tmp_path):
+    db_path = str(tmp_path / "images.db")
+    make_cache(db_path).set(IMAGE_HASH, ANALYSIS, "http://a/1.jpg")
+
+    assert make_cache(db_path).find(IMAGE_HASH) == ANALYSIS
+    assert make_cache(db_path, provider="openai").find(IMAGE_HASH) is None
+    assert make_cache(db_path, version="2").find(IMAGE_HASH) is None
+
+def test_expired_entries_are_not_reused(tmp_path, monkeypatch):
+    cache = make_cache(str(tmp_path / "images.db"), ttl=60)
+    cache.set(IMAGE_HASH, ANALYSIS, "http://a/1.jpg")
+    assert cache.find(IMAGE_HASH ^ 1) == ANALYSIS
+
+    now = time.time() + 61
+    monkeypatch.setattr(image_cache.time, "time", lambda: now)
+    assert cache.find(IMAGE_HASH) is None
+    assert cache.find_by_url("http://a/1.jpg") is None
+
+def test_hits_batch_recency_updates(tmp_path, monkeypatch):
+    cache = make_cache(str(tmp_path / "images.db"))
+    cache.set(IMAGE_HASH, ANALYSIS, "http://a/1.jpg")
+
+    writes = []
+    monkeypatch.setattr(cache.store, "set", lambda *args: writes.append(args))
+    monkeypatch.setattr(cache.store, "prune", lambda *args: writes.append(args))
+    touches = []
+    touch_many = cache.store.touch_many
+    monkeypatch.setattr(cache.store, "touch_many", lambda keys, at: touches.append(list(keys)) or touch_many([], at))
+
+    for _ in range(image_cache.TOUCH_BATCH - 1):
+        assert cache.find(IMAGE_HASH) == ANALYSIS
+    # 命中不重写分析结果，只在累积足够多记录后批量更新使用时间
+    assert writes == [] and touches == []
+    cache.find_by_url("http://a/1.jpg")
+    assert touches == [[format(IMAGE_HASH, "016x")]]
@@ -0,0 +1,60 @@
+import time
+import threading
+
+from job_queue import JobQueue, COMPLETED, FAILED
+
+def wait_for(queue, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = queue.get(job_id)
+        if status["status"] == COMPLETED:
+            return status
+        time.sleep(0.01)
+    raise AssertionError("任务未在超时前完成")
+
+def analyze(url):
+    if url.endswith("bad"):
+        raise ValueError("分析失败")
+    time.sleep(0.001)
+    return {"url": url}
+
+def test_other_worker_sees_final_state(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    queue = JobQueue(max_workers=8, db_path=db_path)
+    urls = [f"http://a/{i}" for i in range(50)] + ["http://a/bad"]
+    job = queue.submit(urls, analyze)
+    local = wait_for(queue, job.id)
+    # 等待最后一次写入完成
+    queue._executor.shutdown(wait=True)
+
+    # 模拟另一个gunicorn worker只能读取SQLite
+    other = JobQueue(max_workers=1, db_path=db_path)
+    stored = other.get(job.id)
+    assert stored == local
+    assert stored["completed"] == 50 and stored["failed"] == 1
+    assert [item["status"] for item in stored["items"]][-1] == FAILED
+    assert all(item["status"] != "running" for item in stored["items"])
+
+    summary = other.get(job.id, include_results=False)
+    assert all("result" not in item for item in summary["items"])
+
+def test_completion_writes_only_its_item(tmp_path):
+    queue = JobQueue(max_workers=2, db_path=str(tmp_path / "jobs.db"))
+    written = []
+    set_many = queue.item_store.set_many
+
+    def record(entries):
+        entries = list(entries)
+        written.append([key for key, _, _ in entries])
+        set_many(entries)
+
+    queue.item_store.set_many = record
+    release = threading.Event()
+    job = queue.submit(["http://a/0", "http://a/1"], lambda url: release.wait(5) and url)
+    release.set()
+    wait_for(queue, job.id)
+    queue._executor.shutdown(wait=True)
+
+    # 提交时写入全部条目，之后每次开始和完成只写入对应的一条
+    assert len(written[0]) == 2
+    assert all(len(keys) == 1 for keys in written[1:])
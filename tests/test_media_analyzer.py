@@ -0,0 +1,29 @@
+import base64
+
+import pytest
+
+import media_analyzer
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+def test_frames_are_uploaded_without_reencoding(monkeypatch):
+    uploads = []
+
+    def chat(provider, model, messages, **params):
+        uploads.append(messages[0]["content"][1]["image_url"]["url"])
+        return '{"content": "画面"}'
+
+    monkeypatch.setattr(media_analyzer, "USE_DEEPSEEK", True)
+    monkeypatch.setattr(media_analyzer.llm_client, "chat", chat)
+    monkeypatch.setattr(media_analyzer, "prepare_image", lambda data: pytest.fail("视频帧不应重新编码"))
+
+    frame = np.zeros((2000, 1000, 3), dtype=np.uint8)
+    frame[500:1500, 250:750] = 255
+    expected = bytes(media_analyzer.encode_frame(frame))
+
+    analysis = media_analyzer.analyze_frame(frame)
+    assert analysis["content"] == "画面"
+    prefix = "data:image/jpeg;base64,"
+    assert uploads[0].startswith(prefix)
+    assert base64.b64decode(uploads[0][len(prefix):]) == expected
@@ -0,0 +1,33 @@
+from provider_health import ProviderHealth
+
+PROVIDERS = {
+    "a": {"params": {"api_key": "key-a"}},
+    "b": {"params": {"api_key": "key-b"}},
+    "c": {"params": {"api_key": "key-c"}},
+}
+
+def make_health():
+    return ProviderHealth({"WINDOW": 20, "MIN_SAMPLES": 5, "FAILURE_THRESHOLD": 3,
+                           "MIN_SUCCESS_RATE": 0.5, "COOLDOWN": 60})
+
+def test_provider_with_only_failures_ranks_after_successful_one():
+    health = make_health()
+    health.get_breaker("a").record_success(0.8)
+    health.get_breaker("b").record_failure(30.0)
+    health.get_breaker("b").record_failure(30.0)
+
+    assert health.choose_provider({"a": PROVIDERS["a"], "b": PROVIDERS["b"]}) == "a"
+
+def test_fast_failures_do_not_beat_successful_provider():
+    health = make_health()
+    health.get_breaker("a").record_success(2.0)
+    health.get_breaker("b").record_failure(0.1)
+
+    assert health.choose_provider({"b": PROVIDERS["b"], "a": PROVIDERS["a"]}, preferred="b") == "a"
+
+def test_untried_provider_gets_a_chance():
+    health = make_health()
+    health.get_breaker("a").record_success(0.8)
+    health.get_breaker("b").record_failure(30.0)
+
+    assert health.choose_provider(PROVIDERS) == "c"
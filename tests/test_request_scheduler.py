@@ -0,0 +1,35 @@
+import pytest
+
+import request_scheduler
+from request_scheduler import HostPolicy, RequestScheduler
+
+@pytest.fixture
+def clock(monkeypatch):
+    """固定的时钟，预约不会真正等待，时间保持不变"""
+    now = [1000.0]
+    monkeypatch.setattr(request_scheduler.time, "time", lambda: now[0])
+    return now
+
+def make_scheduler():
+    policy = HostPolicy(rate=0.5, burst=3, min_interval=1.0, jitter=0.0)
+    return RequestScheduler(policies={"example.com": policy})
+
+def test_back_to_back_reservations_follow_rate_after_burst(clock):
+    scheduler = make_scheduler()
+    starts = [scheduler.reserve("https://example.com/a") for _ in range(12)]
+
+    # 桶内令牌用完之前只受最小间隔限制
+    assert starts[:5] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    # 之后按令牌补充速率，每2秒一个请求
+    gaps = [b - a for a, b in zip(starts[5:], starts[6:])]
+    assert gaps == pytest.approx([1 / 0.5] * len(gaps))
+
+def test_extra_delay_only_delays_the_caller(clock):
+    scheduler = make_scheduler()
+    assert scheduler.reserve("example.com", extra_delay=30.0) == pytest.approx(30.0)
+    # 其他请求不受上一次重试退避的影响
+    assert scheduler.reserve("example.com") == pytest.approx(1.0)
+
+def test_hosts_without_policy_are_not_delayed(clock):
+    scheduler = make_scheduler()
+    assert [scheduler.reserve("other.com") for _ in range(5)] == [0.0] * 5
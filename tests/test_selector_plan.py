@@ -0,0 +1,51 @@
+import pytest
+
+from html_parsing import parse_html, NOTE_STRAINER
+from selector_plan import NOTE_PLANS, ALL, FIRST_SELECTOR
+from xiaohongshu_tool import parse_post_html, parse_post_html_alternative
+
+NOTE_PAGE = """
+<html><head><meta property="og:title" content="og标题"></head><body>
+<div class="note">
+  <img class="avatar" src="http://a/avatar.jpg">
+  <div class="note-content">
+    <div class="title"></div>
+    <div class="desc">这是一篇足够长的帖子正文内容</div>
+    <div class="carousel"><img src="http://a/1.jpg"><img data-src="http://a/2.jpg"></div>
+  </div>
+  <div class="content"><div class="desc">第二段</div></div>
+  <div class="swiper-slide"><img src="http://a/3.jpg"></div>
+  <img class="upload-image" src="http://a/4.jpg">
+  <video><source src="http://a/v.mp4"></video>
+</div>
+</body></html>
+"""
+
+def cascade(soup, plan):
+    """逐个调用select_one/select得到的结果"""
+    results = {}
+    for field, selectors in plan.selectors.items():
+        mode = plan.modes[field]
+        if mode == ALL:
+            results[field] = [elem for selector in selectors for elem in soup.select(selector)]
+        elif mode == FIRST_SELECTOR:
+            results[field] = next((elems for elems in map(soup.select, selectors) if elems), [])
+        else:
+            results[field] = [elem for elem in map(soup.select_one, selectors) if elem is not None]
+    return results
+
+@pytest.mark.parametrize("name", sorted(NOTE_PLANS))
+def test_plan_matches_select_cascade(name):
+    soup = parse_html(NOTE_PAGE, NOTE_STRAINER)
+    assert NOTE_PLANS[name].run(soup) == cascade(soup, NOTE_PLANS[name])
+
+def test_basic_parser_keeps_first_matching_image_selector():
+    post = parse_post_html(NOTE_PAGE)
+    assert post["images"] == ["http://a/1.jpg", "http://a/2.jpg"]
+    assert post["title"] == "og标题"
+    assert post["text"] == "第二段"
+    assert post["video"] is None
+
+def test_alternative_parser_keeps_first_matching_image_selector():
+    post = parse_post_html_alternative(NOTE_PAGE)
+    assert post["images"] == ["http://a/1.jpg", "http://a/2.jpg"]
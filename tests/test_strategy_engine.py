@@ -0,0 +1,46 @@
+import time
+import threading
+
+from strategy_engine import Strategy, StrategyEngine
+
+VALID = {"original": {"title": "标题", "text": "正文"}}
+
+def test_sequential_waits_for_slow_strategy():
+    engine = StrategyEngine(mode="sequential", total_budget=5, max_workers=4)
+    started = []
+
+    def slow():
+        started.append("slow")
+        time.sleep(0.2)
+        return VALID
+
+    def fallback():
+        started.append("fallback")
+        return VALID
+
+    name, _ = engine.run([Strategy("slow", slow, budget=5), Strategy("fallback", fallback, budget=5)])
+    assert name == "slow"
+    assert started == ["slow"]
+
+def test_abandoned_strategies_are_bounded():
+    engine = StrategyEngine(mode="sequential", total_budget=5, max_workers=4, max_abandoned=2)
+    release = threading.Event()
+
+    def stuck():
+        release.wait(5)
+        return None
+
+    fast = Strategy("fast", lambda: VALID, budget=5)
+    assert engine.run([Strategy("stuck", stuck, budget=0.05), fast])[0] == "fast"
+    assert engine.abandoned_count == 1
+
+    # 后台策略达到上限后不再启动新策略，线程池不会被占满
+    assert engine.run([Strategy("stuck", stuck, budget=0.05), fast]) == (None, None)
+    assert engine.abandoned_count == 2
+    assert engine.run([fast]) == (None, None)
+
+    release.set()
+    deadline = time.time() + 5
+    while engine.abandoned_count and time.time() < deadline:
+        time.sleep(0.01)
+    assert engine.run([fast])[0] == "fast"
@@ -1,5 +1,4 @@
 import requests
-from bs4 import BeautifulSoup
 import json
 import re
 import os
@@ -27,13 +26,6 @@ except ImportError:
     # 重新定义AntiCrawlUtils类(这里依赖原始工具类)
     raise ImportError("必须能够导入xiaohongshu_tool模块中的AntiCrawlUtils")
 
-# 检查是否安装了OpenAI
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
-
 # 检查是否安装了DeepSeek库
 try:
     # DeepSeek不需要专门的库，但我们可以检查requests是否可用
@@ -42,6 +34,12 @@ try:
 except ImportError:
     DEEPSEEK_AVAILABLE = False
 
+import llm_cache
+import llm_client
+from embedded_state import extract_embedded_content
+from html_parsing import parse_html, get_page_text, NOTE_SCRIPT_STRAINER, SEARCH_STRAINER
+from task_graph import TaskGraph
+
 # 尝试导入媒体分析模块
 try:
     import media_analyzer
@@ -53,13 +51,23 @@ except ImportError:
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
 DEEPSEEK_API_KEY = os.environ.get("DEEPSEEK_API_KEY", "")
 
-# 如果有OpenAI API密钥，则配置客户端
-if OPENAI_API_KEY and OPENAI_AVAILABLE:
-    openai.api_key = OPENAI_API_KEY
-
 # 使用哪个AI服务，优先DeepSeek，其次OpenAI
 USE_DEEPSEEK = DEEPSEEK_API_KEY != ""
-USE_OPENAI = not USE_DEEPSEEK and OPENAI_API_KEY != "" and OPENAI_AVAILABLE
+USE_OPENAI = not USE_DEEPSEEK and OPENAI_API_KEY != ""
+
+# 导入配置
+try:
+    from config import LLM_CONFIG
+except ImportError:
+    LLM_CONFIG = {
+        "PIPELINE_MODE": "two_call"
+    }
+
+# 一次调用同时完成分析和生成
+ONE_SHOT = LLM_CONFIG.get("PIPELINE_MODE", "two_call") == "one_shot"
+
+# 提示词模板版本，修改分析或生成提示词后需要递增，使旧的缓存结果失效
+PROMPT_TEMPLATE_VERSION = "1"
 
 # 尝试导入反爬机制工具类
 try:
@@ -99,6 +107,11 @@ except ImportError:
         
     def get_cookies(custom_cookies_str=None):
         return {}
+    
+    _session = requests.Session()
+    
+    def get_session(domain="www.xiaohongshu.com"):
+        return _session
         
     # 简化版的请求函数
     class AntiCrawlUtils:
@@ -135,6 +148,9 @@ else:
         
     def get_cookies(custom_cookies_str=None):
         return AntiCrawlUtils.get_cookies(custom_cookies_str=custom_cookies_str)
+    
+    def get_session(domain="www.xiaohongshu.com"):
+        return AntiCrawlUtils.get_session(domain)
 
 def fetch_post_content(url):
     """
@@ -155,13 +171,19 @@ def fetch_post_content(url):
             timeout=15
         )
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        # 优先从页面内嵌数据中提取，不需要解析整个文档
+        content = extract_embedded_content(response.text)
+        if content:
+            return content
         
         # 检查是否有反爬验证
-        if "验证" in soup.text or "校验" in soup.text or "captcha" in soup.text.lower():
+        page_text = get_page_text(response.text)
+        if "验证" in page_text or "校验" in page_text or "captcha" in page_text.lower():
             logger.warning(f"检测到反爬验证码，尝试备选方法...")
             return fetch_post_content_alternative(url)
         
+        soup = parse_html(response.text, NOTE_SCRIPT_STRAINER)
+        
         # 提取标题
         title_elem = soup.select_one('h1.title') or soup.select_one('div.content-container div.title')
         if not title_elem:
@@ -276,10 +298,10 @@ def fetch_post_content_alternative(url):
     add_random_delay(2, 4)
     
     try:
-        response = requests.get(url, headers=mobile_headers, cookies=cookies, timeout=15)
+        response = get_session().get(url, headers=mobile_headers, cookies=cookies, timeout=15)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = parse_html(response.text, NOTE_SCRIPT_STRAINER)
         
         # 尝试提取JSON数据
         json_data = None
@@ -386,18 +408,25 @@ def manual_input():
         "video": video if video else None
     }
 
-def analyze_content(content):
+def analyze_text(title, text):
     """
-    分析帖子内容
+    提取帖子关键词并进行AI内容分析
+    
+    one_shot模式下同一次调用还会生成优化标题、正文和建议，调用或校验失败时回退到单独分析。
     
-    Args:
-        content: 帖子内容字典
-        
     Returns:
-        dict: 包含关键词和相关热门帖子的字典
+        tuple: (关键词列表, AI分析结果, 生成结果)，生成结果只在one_shot模式成功时不为None
     """
-    text = content["text"]
-    title = content["title"]
+    if ONE_SHOT:
+        if USE_DEEPSEEK:
+            result = one_shot_with_deepseek(title, text)
+        elif USE_OPENAI:
+            result = one_shot_with_openai(title, text)
+        else:
+            result = None
+        if result:
+            generated = {key: result[key] for key in ("title", "body", "suggestions")}
+            return list(result["keywords"]), result["analysis"], generated
     
     # 使用AI分析内容或使用规则分析
     if USE_DEEPSEEK:
@@ -413,77 +442,107 @@ def analyze_content(content):
     if not keywords:
         keywords = extract_simple_keywords(title + " " + text)
     
-    # 尝试爬取相关热门帖子
+    return list(keywords), ai_analysis, None
+
+def find_top_posts(keywords):
+    """根据关键词爬取相关热门帖子，失败时使用模拟数据"""
     try:
-        top_posts = fetch_top_posts(keywords[0] if keywords else "好物推荐")
+        return fetch_top_posts(keywords[0] if keywords else "好物推荐")
     except Exception as e:
         print(f"爬取热门帖子失败: {str(e)}")
         # 爬取失败时使用模拟数据
-        top_posts = generate_mock_top_posts(keywords)
+        return generate_mock_top_posts(keywords)
+
+def analyze_images(images):
+    """分析帖子图片，失败时使用模拟分析结果"""
+    try:
+        return media_analyzer.batch_analyze_images(images, max_images=3)
+    except Exception as e:
+        print(f"图片分析失败: {str(e)}，使用模拟分析结果")
+        # 使用模拟分析数据
+        return [media_analyzer.generate_mock_image_analysis() for _ in range(min(3, len(images)))]
+
+def analyze_video(video):
+    """分析帖子视频，失败时使用模拟分析结果"""
+    try:
+        return media_analyzer.analyze_video(video)
+    except Exception as e:
+        print(f"视频分析失败: {str(e)}，使用模拟分析结果")
+        # 使用模拟分析数据
+        return media_analyzer.generate_mock_video_analysis()
+
+def merge_keywords(keywords, extra_keywords, limit=8):
+    """合并额外关键词，去重并限制总数"""
+    keywords.extend([k for k in extra_keywords if k not in keywords])
+    return keywords[:limit]
+
+def analyze_content(content):
+    """
+    分析帖子内容
+    
+    文本分析、图片分析和视频分析同时进行，热门帖子搜索在文本关键词得到后立即开始，
+    最后再把图片和视频中的关键词合并进来。
     
-    # 分析图片和视频内容(如果可用)
+    Args:
+        content: 帖子内容字典
+        
+    Returns:
+        dict: 包含关键词和相关热门帖子的字典
+    """
+    text = content["text"]
+    title = content["title"]
+    analyze_media = MEDIA_ANALYSIS_AVAILABLE and (USE_DEEPSEEK or USE_OPENAI)
+    
+    graph = TaskGraph()
+    graph.add("text", lambda: analyze_text(title, text))
+    # 热门帖子只依赖文本关键词
+    graph.add("top_posts", lambda text: find_top_posts(text[0]), deps=("text",))
+    if analyze_media and content.get("images"):
+        graph.add("images", lambda: analyze_images(content["images"]))
+    if analyze_media and content.get("video"):
+        graph.add("video", lambda: analyze_video(content["video"]))
+    
+    results = graph.run()
+    keywords, ai_analysis, generated = results["text"]
+    top_posts = results["top_posts"]
+    
+    # 合并图片和视频分析结果
     media_analysis = {}
-    if MEDIA_ANALYSIS_AVAILABLE and (USE_DEEPSEEK or USE_OPENAI):
-        try:
-            # 分析图片
-            if content.get("images"):
-                try:
-                    image_analyses = media_analyzer.batch_analyze_images(content["images"], max_images=3)
-                    media_analysis["image_analyses"] = image_analyses
-                    
-                    # 从图片分析中提取额外关键词
-                    for img_analysis in image_analyses:
-                        if "keywords" in img_analysis and img_analysis["keywords"]:
-                            # 添加来自图片的关键词（最多3个）
-                            img_keywords = img_analysis["keywords"][:3]
-                            keywords.extend([k for k in img_keywords if k not in keywords])
-                            # 确保关键词总数不超过8个
-                            if len(keywords) > 8:
-                                keywords = keywords[:8]
-                except Exception as e:
-                    print(f"图片分析失败: {str(e)}，使用模拟分析结果")
-                    # 使用模拟分析数据
-                    image_analyses = [media_analyzer.generate_mock_image_analysis() for _ in range(min(3, len(content.get("images", []))))]
-                    media_analysis["image_analyses"] = image_analyses
+    try:
+        if "images" in results:
+            image_analyses = results["images"]
+            media_analysis["image_analyses"] = image_analyses
             
-            # 分析视频
-            if content.get("video"):
-                try:
-                    video_analysis = media_analyzer.analyze_video(content["video"])
-                    media_analysis["video_analysis"] = video_analysis
-                    
-                    # 从视频分析中提取额外关键词
-                    if "keywords" in video_analysis and video_analysis["keywords"]:
-                        # 添加来自视频的关键词（最多2个）
-                        video_keywords = video_analysis["keywords"][:2]
-                        keywords.extend([k for k in video_keywords if k not in keywords])
-                        # 确保关键词总数不超过8个
-                        if len(keywords) > 8:
-                            keywords = keywords[:8]
-                except Exception as e:
-                    print(f"视频分析失败: {str(e)}，使用模拟分析结果")
-                    # 使用模拟分析数据
-                    video_analysis = media_analyzer.generate_mock_video_analysis()
-                    media_analysis["video_analysis"] = video_analysis
+            # 从图片分析中提取额外关键词（每张最多3个）
+            for img_analysis in image_analyses:
+                if "keywords" in img_analysis and img_analysis["keywords"]:
+                    keywords = merge_keywords(keywords, img_analysis["keywords"][:3])
+        
+        if "video" in results:
+            video_analysis = results["video"]
+            media_analysis["video_analysis"] = video_analysis
             
-            # 生成媒体改进建议
-            if "image_analyses" in media_analysis or "video_analysis" in media_analysis:
-                try:
-                    image_analyses = media_analysis.get("image_analyses", [])
-                    video_analysis = media_analysis.get("video_analysis", {})
-                    media_suggestions = media_analyzer.get_media_improvements(image_analyses, video_analysis)
-                    media_analysis["suggestions"] = media_suggestions
-                except Exception as e:
-                    print(f"媒体改进建议生成失败: {str(e)}，使用基本建议")
-                    # 提供基本建议
-                    media_analysis["suggestions"] = [
-                        "建议添加更多高质量图片，展示产品多角度细节",
-                        "建议添加产品使用视频，展示实际效果",
-                        "图片推荐使用自然光拍摄，增加清晰度"
-                    ]
-                
-        except Exception as e:
-            print(f"媒体分析整体失败: {str(e)}")
+            # 从视频分析中提取额外关键词（最多2个）
+            if "keywords" in video_analysis and video_analysis["keywords"]:
+                keywords = merge_keywords(keywords, video_analysis["keywords"][:2])
+        
+        # 生成媒体改进建议
+        if "image_analyses" in media_analysis or "video_analysis" in media_analysis:
+            try:
+                image_analyses = media_analysis.get("image_analyses", [])
+                video_analysis = media_analysis.get("video_analysis", {})
+                media_suggestions = media_analyzer.get_media_improvements(image_analyses, video_analysis)
+                media_analysis["suggestions"] = media_suggestions
+            except Exception as e:
+                print(f"媒体改进建议生成失败: {str(e)}，使用基本建议")
+                # 提供基本建议
+                media_analysis["suggestions"] = [
+                    "建议添加更多高质量图片，展示产品多角度细节",
+                    "建议添加产品使用视频，展示实际效果",
+                    "图片推荐使用自然光拍摄，增加清晰度"
+                ]
+    except Exception as e:
+        print(f"媒体分析整体失败: {str(e)}")
     
     result = {
         "keywords": keywords, 
@@ -494,14 +553,18 @@ def analyze_content(content):
     if ai_analysis:
         result["ai_analysis"] = ai_analysis
     
+    # one_shot模式下已生成的优化内容
+    if generated:
+        result["generated"] = generated
+    
     # 如果有媒体分析，添加到结果中
     if media_analysis:
         result["media_analysis"] = media_analysis
     
     return result
 
-def analyze_with_openai(title, text):
-    """使用OpenAI API进行内容分析"""
+def analyze_with_openai(title, text, bypass_cache=False):
+    """使用OpenAI API进行内容分析，相同输入的结果从缓存获取"""
     if not USE_OPENAI:
         return [], {}
     
@@ -534,24 +597,30 @@ def analyze_with_openai(title, text):
     }}
     """
     
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
+    def request_analysis():
+        content = llm_client.chat(
+            "openai", "gpt-3.5-turbo",
+            [
                 {"role": "system", "content": "你是一个专业的内容分析专家，擅长分析小红书等社交平台的内容。"},
                 {"role": "user", "content": prompt}
             ],
             response_format={"type": "json_object"}
         )
         
-        result = json.loads(response.choices[0].message.content)
+        result = json.loads(content)
         return result["keywords"], result["analysis"]
+    
+    try:
+        return llm_cache.cached_call(
+            "gpt-3.5-turbo", "analyze", PROMPT_TEMPLATE_VERSION, (title, text),
+            request_analysis, bypass=bypass_cache
+        )
     except Exception as e:
         print(f"OpenAI API调用失败: {str(e)}")
         return [], {}
 
-def analyze_with_deepseek(title, text):
-    """使用DeepSeek API进行内容分析"""
+def analyze_with_deepseek(title, text, bypass_cache=False):
+    """使用DeepSeek API进行内容分析，相同输入的结果从缓存获取"""
     if not USE_DEEPSEEK:
         return [], {}
     
@@ -584,34 +653,167 @@ def analyze_with_deepseek(title, text):
     }}
     """
     
-    try:
-        # DeepSeek API调用（需要根据DeepSeek的具体API调整）
-        url = "https://api.deepseek.com/v1/chat/completions"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {DEEPSEEK_API_KEY}"
-        }
-        data = {
-            "model": "deepseek-chat",
-            "messages": [
+    def request_analysis():
+        content = llm_client.chat(
+            "deepseek", "deepseek-chat",
+            [
                 {"role": "system", "content": "你是一个专业的内容分析专家，擅长分析小红书等社交平台的内容。"},
                 {"role": "user", "content": prompt}
             ],
-            "response_format": {"type": "json_object"}
-        }
-        
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        result = response.json()
+            response_format={"type": "json_object"}
+        )
         
-        # 解析结果
-        content = result["choices"][0]["message"]["content"]
         result_json = json.loads(content)
         return result_json["keywords"], result_json["analysis"]
+    
+    try:
+        return llm_cache.cached_call(
+            "deepseek-chat", "analyze", PROMPT_TEMPLATE_VERSION, (title, text),
+            request_analysis, bypass=bypass_cache
+        )
     except Exception as e:
         print(f"DeepSeek API调用失败: {str(e)}")
         return [], {}
 
+# one_shot结果中analysis需要包含的字段
+ONE_SHOT_ANALYSIS_FIELDS = ("topic", "category", "style", "audience", "tone")
+
+def build_one_shot_prompt(title, text):
+    """构建同时完成分析和生成的提示词"""
+    return f"""
+    分析以下小红书帖子内容，并生成一个SEO优化、更有吸引力的标题和正文：
+    
+    标题: {title}
+    
+    内容: {text}
+    
+    请提供:
+    1. 5个与内容最相关的关键词（单词或短语）
+    2. 内容分析结果，包括：
+       - 帖子主题
+       - 产品或服务类别
+       - 写作风格
+       - 目标受众
+       - 情感基调
+    3. 一个吸引人的标题（不超过30个字）
+    4. 一个完整的正文（保留原文的核心信息，但使其更具吸引力、更易阅读、更符合小红书平台风格）
+    5. 3-5条内容改进建议
+    
+    以JSON格式返回，格式如下:
+    {{
+        "keywords": ["关键词1", "关键词2", ...],
+        "analysis": {{
+            "topic": "帖子主题",
+            "category": "产品或服务类别",
+            "style": "写作风格",
+            "audience": "目标受众",
+            "tone": "情感基调"
+        }},
+        "title": "优化标题",
+        "body": "优化正文",
+        "suggestions": ["建议1", "建议2", ...]
+    }}
+    """
+
+def validate_one_shot_result(result):
+    """
+    校验one_shot调用返回的JSON
+    
+    Returns:
+        dict: 去除空白后的结果
+        
+    Raises:
+        ValueError: 缺少字段或字段类型不符
+    """
+    if not isinstance(result, dict):
+        raise ValueError("返回结果不是JSON对象")
+    
+    keywords = result.get("keywords")
+    if not isinstance(keywords, list):
+        raise ValueError("keywords不是列表")
+    keywords = [k.strip() for k in keywords if isinstance(k, str) and k.strip()]
+    if not keywords:
+        raise ValueError("keywords为空")
+    
+    analysis = result.get("analysis")
+    if not isinstance(analysis, dict):
+        raise ValueError("analysis不是JSON对象")
+    missing = [field for field in ONE_SHOT_ANALYSIS_FIELDS if not isinstance(analysis.get(field), str)]
+    if missing:
+        raise ValueError(f"analysis缺少字段: {', '.join(missing)}")
+    
+    for field in ("title", "body"):
+        if not isinstance(result.get(field), str) or not result[field].strip():
+            raise ValueError(f"{field}为空")
+    
+    suggestions = result.get("suggestions", [])
+    if not isinstance(suggestions, list):
+        raise ValueError("suggestions不是列表")
+    
+    return {
+        "keywords": keywords,
+        "analysis": {field: analysis[field].strip() for field in ONE_SHOT_ANALYSIS_FIELDS},
+        "title": result["title"].strip(),
+        "body": result["body"].strip(),
+        "suggestions": [s.strip() for s in suggestions if isinstance(s, str) and s.strip()]
+    }
+
+def one_shot_with_openai(title, text, bypass_cache=False):
+    """使用OpenAI API一次完成分析和生成，解析或校验失败时返回None"""
+    if not USE_OPENAI:
+        return None
+    
+    prompt = build_one_shot_prompt(title, text)
+    
+    def request_one_shot():
+        content = llm_client.chat(
+            "openai", "gpt-3.5-turbo",
+            [
+                {"role": "system", "content": "你是一个专业的内容分析和创作专家，擅长分析并优化小红书等社交平台的内容。"},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"}
+        )
+        
+        return validate_one_shot_result(json.loads(content))
+    
+    try:
+        return llm_cache.cached_call(
+            "gpt-3.5-turbo", "one_shot", PROMPT_TEMPLATE_VERSION, (title, text),
+            request_one_shot, bypass=bypass_cache
+        )
+    except Exception as e:
+        print(f"OpenAI one_shot调用失败: {str(e)}，改为分别分析和生成")
+        return None
+
+def one_shot_with_deepseek(title, text, bypass_cache=False):
+    """使用DeepSeek API一次完成分析和生成，解析或校验失败时返回None"""
+    if not USE_DEEPSEEK:
+        return None
+    
+    prompt = build_one_shot_prompt(title, text)
+    
+    def request_one_shot():
+        content = llm_client.chat(
+            "deepseek", "deepseek-chat",
+            [
+                {"role": "system", "content": "你是一个专业的内容分析和创作专家，擅长分析并优化小红书等社交平台的内容。"},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"}
+        )
+        
+        return validate_one_shot_result(json.loads(content))
+    
+    try:
+        return llm_cache.cached_call(
+            "deepseek-chat", "one_shot", PROMPT_TEMPLATE_VERSION, (title, text),
+            request_one_shot, bypass=bypass_cache
+        )
+    except Exception as e:
+        print(f"DeepSeek one_shot调用失败: {str(e)}，改为分别分析和生成")
+        return None
+
 def extract_simple_keywords(text):
     """简单的关键词提取"""
     # 预定义可能的产品类别
@@ -654,9 +856,12 @@ def generate_optimized_content(content, analysis):
     keywords = analysis["keywords"]
     top_posts = analysis["top_posts"]
     ai_analysis = analysis.get("ai_analysis", {})
+    generated = analysis.get("generated")
     
-    # 使用AI生成优化内容或使用规则生成
-    if USE_DEEPSEEK:
+    # 使用AI生成优化内容或使用规则生成，one_shot模式下分析时已经生成
+    if generated:
+        optimized_title, optimized_body = generated["title"], generated["body"]
+    elif USE_DEEPSEEK:
         optimized_title, optimized_body = generate_with_deepseek(original_title, original_text, keywords, ai_analysis)
     elif USE_OPENAI:
         optimized_title, optimized_body = generate_with_openai(original_title, original_text, keywords, ai_analysis)
@@ -674,6 +879,8 @@ def generate_optimized_content(content, analysis):
     
     # 生成内容改进建议
     suggestions = generate_suggestions(content, ai_analysis)
+    if generated:
+        suggestions.extend(s for s in generated["suggestions"] if s not in suggestions)
     
     # 如果有媒体分析建议，添加到改进建议中
     if "media_analysis" in analysis and "suggestions" in analysis["media_analysis"]:
@@ -686,8 +893,8 @@ def generate_optimized_content(content, analysis):
         "suggestions": suggestions
     }
 
-def generate_with_openai(original_title, original_text, keywords, ai_analysis):
-    """使用OpenAI API生成优化内容"""
+def generate_with_openai(original_title, original_text, keywords, ai_analysis, bypass_cache=False):
+    """使用OpenAI API生成优化内容，相同输入的结果从缓存获取"""
     if not USE_OPENAI:
         return "", ""
     
@@ -726,24 +933,31 @@ def generate_with_openai(original_title, original_text, keywords, ai_analysis):
     }}
     """
     
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
+    def request_generation():
+        content = llm_client.chat(
+            "openai", "gpt-3.5-turbo",
+            [
                 {"role": "system", "content": "你是一个专业的社交媒体内容创作专家，擅长为小红书等平台创作吸引人的内容。"},
                 {"role": "user", "content": prompt}
             ],
             response_format={"type": "json_object"}
         )
         
-        result = json.loads(response.choices[0].message.content)
+        result = json.loads(content)
         return result["title"], result["body"]
+    
+    try:
+        return llm_cache.cached_call(
+            "gpt-3.5-turbo", "generate", PROMPT_TEMPLATE_VERSION,
+            (original_title, original_text, keywords, ai_analysis),
+            request_generation, bypass=bypass_cache
+        )
     except Exception as e:
         print(f"OpenAI API调用失败: {str(e)}")
         return "", ""
 
-def generate_with_deepseek(original_title, original_text, keywords, ai_analysis):
-    """使用DeepSeek API生成优化内容"""
+def generate_with_deepseek(original_title, original_text, keywords, ai_analysis, bypass_cache=False):
+    """使用DeepSeek API生成优化内容，相同输入的结果从缓存获取"""
     if not USE_DEEPSEEK:
         return "", ""
     
@@ -782,34 +996,167 @@ def generate_with_deepseek(original_title, original_text, keywords, ai_analysis)
     }}
     """
     
-    try:
-        # DeepSeek API调用（需要根据DeepSeek的具体API调整）
-        url = "https://api.deepseek.com/v1/chat/completions"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {DEEPSEEK_API_KEY}"
-        }
-        data = {
-            "model": "deepseek-chat",
-            "messages": [
+    def request_generation():
+        content = llm_client.chat(
+            "deepseek", "deepseek-chat",
+            [
                 {"role": "system", "content": "你是一个专业的社交媒体内容创作专家，擅长为小红书等平台创作吸引人的内容。"},
                 {"role": "user", "content": prompt}
             ],
-            "response_format": {"type": "json_object"}
-        }
-        
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        result = response.json()
+            response_format={"type": "json_object"}
+        )
         
-        # 解析结果
-        content = result["choices"][0]["message"]["content"]
         result_json = json.loads(content)
         return result_json["title"], result_json["body"]
+    
+    try:
+        return llm_cache.cached_call(
+            "deepseek-chat", "generate", PROMPT_TEMPLATE_VERSION,
+            (original_title, original_text, keywords, ai_analysis),
+            request_generation, bypass=bypass_cache
+        )
     except Exception as e:
         print(f"DeepSeek API调用失败: {str(e)}")
         return "", ""
 
+# 流式生成时模型可能在标题前加上的前缀
+TITLE_PREFIX_PATTERN = re.compile(r'^(#+\s*)?(优化)?标题\s*[:：]\s*')
+
+def build_stream_generation_prompt(original_title, original_text, keywords, ai_analysis):
+    """构建流式生成的提示词，标题和正文以纯文本输出，便于边生成边显示"""
+    analysis_text = ""
+    if ai_analysis:
+        analysis_text = f"""
+        分析信息:
+        - 主题: {ai_analysis.get('topic', '未知')}
+        - 产品类别: {ai_analysis.get('category', '未知')}
+        - 写作风格: {ai_analysis.get('style', '未知')}
+        - 目标受众: {ai_analysis.get('audience', '未知')}
+        - 情感基调: {ai_analysis.get('tone', '未知')}
+        """
+    
+    return f"""
+    根据以下小红书帖子内容和分析结果，生成一个SEO优化、更有吸引力的标题和正文：
+    
+    原标题: {original_title}
+    
+    原内容: {original_text}
+    
+    关键词: {', '.join(keywords)}
+    
+    {analysis_text}
+    
+    请生成:
+    1. 一个吸引人的标题（不超过30个字）
+    2. 一个完整的正文（保留原文的核心信息，但使其更具吸引力、更易阅读、更符合小红书平台风格）
+    
+    输出格式: 第一行只输出标题，换行后输出正文，不要输出JSON或其他说明文字。
+    """
+
+def generate_with_openai_stream(original_title, original_text, keywords, ai_analysis):
+    """使用OpenAI API流式生成优化内容，逐段返回生成的文本"""
+    prompt = build_stream_generation_prompt(original_title, original_text, keywords, ai_analysis)
+    return llm_client.chat_stream(
+        "openai", "gpt-3.5-turbo",
+        [
+            {"role": "system", "content": "你是一个专业的社交媒体内容创作专家，擅长为小红书等平台创作吸引人的内容。"},
+            {"role": "user", "content": prompt}
+        ]
+    )
+
+def generate_with_deepseek_stream(original_title, original_text, keywords, ai_analysis):
+    """使用DeepSeek API流式生成优化内容，逐段返回生成的文本"""
+    prompt = build_stream_generation_prompt(original_title, original_text, keywords, ai_analysis)
+    return llm_client.chat_stream(
+        "deepseek", "deepseek-chat",
+        [
+            {"role": "system", "content": "你是一个专业的社交媒体内容创作专家，擅长为小红书等平台创作吸引人的内容。"},
+            {"role": "user", "content": prompt}
+        ]
+    )
+
+class TitleBodySplitter:
+    """把流式生成的文本拆分为标题和正文：第一行非空文本是标题，其余是正文"""
+    
+    def __init__(self):
+        self.title = ""
+        self.body = ""
+        self.in_body = False
+    
+    def feed(self, chunk):
+        """
+        处理一段生成的文本
+        
+        Returns:
+            list: [(字段, 增量文本)]，字段为"title"或"body"
+        """
+        events = []
+        while chunk and not self.in_body:
+            head, newline, chunk = chunk.partition("\n")
+            if head:
+                self.title += head
+                events.append(("title", head))
+            if newline and self.title.strip():
+                self.in_body = True
+        if self.in_body and chunk:
+            if not self.body:
+                chunk = chunk.lstrip("\n")
+            if chunk:
+                self.body += chunk
+                events.append(("body", chunk))
+        return events
+    
+    def result(self):
+        """返回整理后的(标题, 正文)"""
+        return TITLE_PREFIX_PATTERN.sub("", self.title.strip()), self.body.strip()
+
+# 流式生成的缓存任务名，build_stream_generation_prompt与非流式生成的提示词模板不同
+STREAM_GENERATE_TASK = "generate_stream"
+
+def stream_optimized_content(original_title, original_text, keywords, ai_analysis, bypass_cache=False):
+    """
+    流式生成优化标题和正文
+    
+    依次产生("title", 增量文本)和("body", 增量文本)，最后产生("done", {"title", "body"})，
+    done中的内容以整理后的完整结果为准。流式提示词与非流式生成不同，大模型缓存单独存放，
+    缓存命中时一次返回；
+    未配置AI服务或生成失败时使用规则生成。
+    """
+    if USE_DEEPSEEK:
+        model, generate = "deepseek-chat", generate_with_deepseek_stream
+    elif USE_OPENAI:
+        model, generate = "gpt-3.5-turbo", generate_with_openai_stream
+    else:
+        model, generate = None, None
+    
+    inputs = (original_title, original_text, keywords, ai_analysis)
+    title, body = "", ""
+    if model:
+        cached = None if bypass_cache else llm_cache.lookup(model, STREAM_GENERATE_TASK, PROMPT_TEMPLATE_VERSION, inputs)
+        if cached:
+            title, body = cached
+            yield "title", title
+            yield "body", body
+        else:
+            splitter = TitleBodySplitter()
+            try:
+                for chunk in generate(original_title, original_text, keywords, ai_analysis):
+                    for event in splitter.feed(chunk):
+                        yield event
+                title, body = splitter.result()
+                llm_cache.store(model, STREAM_GENERATE_TASK, PROMPT_TEMPLATE_VERSION, inputs, (title, body))
+            except Exception as e:
+                logger.error(f"流式生成失败: {str(e)}")
+                title, body = "", ""
+    
+    # 如果AI生成失败，回退到规则生成
+    if not title or not body:
+        keyword = keywords[0] if keywords else "好物"
+        title = generate_title(keyword, original_title)
+        body = generate_body(keyword, original_text, [])
+    
+    yield "done", {"title": title, "body": body}
+
 def generate_title(keyword, original_title):
     """使用规则生成优化标题"""
     title_templates = [
@@ -1022,18 +1369,19 @@ def fetch_top_posts(keyword, max_posts=10):
         
         # 发起请求
         # response = requests.get(search_url, headers=headers, cookies=cookies, proxies=proxies, timeout=15)
-        response = requests.get(search_url, headers=headers, cookies=cookies, timeout=15)
+        response = get_session().get(search_url, headers=headers, cookies=cookies, timeout=15)
         response.raise_for_status()
         
         # 解析HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = parse_html(response.text, SEARCH_STRAINER)
         
         # 尝试多种选择器找到帖子容器
         posts_container = soup.select('div.note-list section') or soup.select('div.items-wrapper div.item') or soup.select('div.feeds-container div.note-item')
         
         if not posts_container:
             # 如果找不到帖子，检查是否有反爬信息
-            if "验证" in soup.text or "校验" in soup.text or "captcha" in soup.text.lower():
+            page_text = get_page_text(response.text)
+            if "验证" in page_text or "校验" in page_text or "captcha" in page_text.lower():
                 print("检测到可能的反爬验证，使用备选方法...")
                 # 尝试备选选择器
                 posts_container = soup.select('div.search-container div.note-item') or soup.select('div.content div.note-item')
@@ -1048,10 +1396,10 @@ def fetch_top_posts(keyword, max_posts=10):
                 
                 add_random_delay(1, 3)
                 alternative_url = f"https://www.xiaohongshu.com/search_result/xhs/search?keyword={encoded_keyword}&sort=general&page=1"
-                alternative_response = requests.get(alternative_url, headers=alternative_headers, cookies=cookies, timeout=15)
+                alternative_response = get_session().get(alternative_url, headers=alternative_headers, cookies=cookies, timeout=15)
                 
                 if alternative_response.status_code == 200:
-                    alternative_soup = BeautifulSoup(alternative_response.text, 'html.parser')
+                    alternative_soup = parse_html(alternative_response.text, SEARCH_STRAINER)
                     posts_container = alternative_soup.select('div.note-list section') or alternative_soup.select('div.items-wrapper div.item')
                 
                 if not posts_container:
@@ -1128,7 +1476,7 @@ def fetch_top_posts_api(keyword, max_posts=10):
         # proxies = {"http": get_random_proxy(), "https": get_random_proxy()} if get_random_proxy() else None
         # response = requests.get(api_url, params=params, headers=headers, cookies=cookies, proxies=proxies, timeout=15)
         
-        response = requests.get(api_url, params=params, headers=headers, cookies=cookies, timeout=15)
+        response = get_session().get(api_url, params=params, headers=headers, cookies=cookies, timeout=15)
         
         # 检查状态码，如果是500等服务器错误，尝试替代API接口
         if response.status_code >= 400:
@@ -1149,7 +1497,7 @@ def fetch_top_posts_api(keyword, max_posts=10):
             alternative_headers = get_enhanced_headers(is_api=True)
             alternative_headers["User-Agent"] = get_random_user_agent()
             
-            alternative_response = requests.get(
+            alternative_response = get_session().get(
                 alternative_api_url, 
                 params=alternative_params, 
                 headers=alternative_headers,
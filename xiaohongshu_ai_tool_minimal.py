@@ -2,13 +2,15 @@ import os
 import random
 import time
 import requests
-from bs4 import BeautifulSoup
 import re
 import json
 import hashlib
 from urllib.parse import quote
 import logging
 
+import request_scheduler
+from html_parsing import parse_html, NOTE_STRAINER
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -55,11 +57,9 @@ def get_random_user_agent():
     """返回随机用户代理"""
     return random.choice(USER_AGENTS)
 
-def add_random_delay(min_seconds=1.0, max_seconds=3.0):
-    """添加随机延迟"""
-    delay = random.uniform(min_seconds, max_seconds)
-    time.sleep(delay)
-    return delay
+def add_random_delay(min_seconds=1.0, max_seconds=3.0, host="www.xiaohongshu.com"):
+    """等待请求调度器分配的发送时机（min_seconds/max_seconds仅为兼容保留）"""
+    return request_scheduler.wait(host)
 
 def get_enhanced_headers(referer=None, is_api=False):
     """获取增强的请求头"""
@@ -98,10 +98,14 @@ def make_request(url, method="GET", params=None, headers=None, cookies=None,
         is_api = "api" in url
         headers = get_enhanced_headers(url, is_api)
     
+    # 重试前的退避延迟
+    retry_delay = 0
+    
     for attempt in range(max_retries):
         try:
-            # 添加随机延迟
-            add_random_delay(1 + attempt * 0.5, 3 + attempt * 0.5)
+            # 等待调度器分配发送时机
+            request_scheduler.wait(url, retry_delay)
+            retry_delay = 0
             
             # 发送请求
             response = requests.request(
@@ -117,7 +121,7 @@ def make_request(url, method="GET", params=None, headers=None, cookies=None,
             if response.status_code == 429:
                 wait_time = 5 * (2 ** attempt)
                 logger.warning(f"收到429响应，等待{wait_time}秒后重试...")
-                time.sleep(wait_time)
+                request_scheduler.penalize(url, wait_time)
                 headers["User-Agent"] = get_random_user_agent()
                 continue
                 
@@ -126,7 +130,7 @@ def make_request(url, method="GET", params=None, headers=None, cookies=None,
         except requests.RequestException as e:
             logger.error(f"请求失败 (尝试 {attempt+1}/{max_retries}): {str(e)}")
             if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
+                retry_delay = 2 ** attempt
             else:
                 raise
 
@@ -135,7 +139,7 @@ def fetch_post_content(url):
     try:
         response = make_request(url)
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = parse_html(response.text, NOTE_STRAINER)
         
         # 提取标题
         title_elem = soup.select_one('h1.title') or soup.select_one('div.content-container div.title')
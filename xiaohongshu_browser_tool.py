@@ -8,18 +8,19 @@ from datetime import datetime
 import re
 import os
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from webdriver_manager.chrome import ChromeDriverManager
 
-from bs4 import BeautifulSoup
 import requests
 
+import request_scheduler
+import browser_pool
+from embedded_state import extract_embedded_content
+from html_parsing import parse_html, NOTE_STRAINER
+from selector_plan import BROWSER_NOTE_PLAN, first_text, first_attr, collect_urls
+from browser_pool import BROWSER_CONFIG
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -45,12 +46,6 @@ USER_AGENTS = [
 def get_random_user_agent():
     return random.choice(USER_AGENTS)
 
-def add_random_delay(min_seconds=1.0, max_seconds=3.0):
-    """添加随机延迟，降低被检测为机器人的概率"""
-    delay = random.uniform(min_seconds, max_seconds)
-    logger.debug(f"添加随机延迟: {delay:.2f}秒")
-    time.sleep(delay)
-
 def scroll_to_bottom(driver, scroll_count=3, scroll_pause=1.0):
     """滚动到页面底部以加载更多内容"""
     for i in range(scroll_count):
@@ -79,6 +74,192 @@ def normalize_url(url):
         return f"https://www.xiaohongshu.com/discovery/item/{note_id}"
     return url
 
+# 页面就绪检测
+# 等待出现任意一个选择器即认为内容已加载
+READY_SELECTORS = "h1.title, .note-content .title, .content .title, .note-content .desc, .content .desc"
+# 登录弹窗的关闭按钮
+MODAL_CLOSE_SELECTOR = "div.modal button.close"
+
+# 每次轮询时先关闭可见的登录弹窗，再检查内容或页面初始数据是否就绪
+READINESS_SCRIPT = """
+const closeButton = document.querySelector(arguments[0]);
+let modalClosed = false;
+if (closeButton && closeButton.offsetParent !== null) {
+    closeButton.click();
+    modalClosed = true;
+}
+let ready = null;
+if (document.querySelector(arguments[1])) {
+    ready = "dom";
+} else if (window.__INITIAL_STATE__ || window.__INITIAL_SSR_STATE__) {
+    ready = "state";
+}
+return {ready: ready, modalClosed: modalClosed, href: location.href, readyState: document.readyState};
+"""
+
+def wait_until_ready(driver, timeout=None, poll_interval=None):
+    """
+    等待页面内容就绪
+    
+    轮询检查标题/内容选择器或页面初始数据，出现任意一个立即返回；
+    登录弹窗在同一次轮询中检测并关闭，不单独阻塞等待。
+    
+    Args:
+        driver: WebDriver
+        timeout: 最长等待时间（秒），超过后放弃等待
+        poll_interval: 轮询间隔（秒）
+        
+    Returns:
+        str: "dom"（内容元素已出现）或"state"（初始数据已出现），超时返回None
+    """
+    timeout = timeout or BROWSER_CONFIG.get("READY_TIMEOUT", 10)
+    poll_interval = poll_interval or BROWSER_CONFIG.get("READY_POLL_INTERVAL", 0.1)
+    start = time.time()
+    
+    def check(driver):
+        status = driver.execute_script(READINESS_SCRIPT, MODAL_CLOSE_SELECTOR, READY_SELECTORS) or {}
+        if status.get("modalClosed"):
+            logger.info("关闭了弹窗")
+        return status.get("ready") or False
+    
+    try:
+        ready = WebDriverWait(driver, timeout, poll_frequency=poll_interval).until(check)
+        logger.info(f"页面就绪 ({ready}): {time.time() - start:.2f}秒")
+        return ready
+    except TimeoutException:
+        logger.warning(f"等待页面就绪超时 ({timeout}秒)")
+        return None
+
+def extract_content_from_driver(driver, url, html=None):
+    """
+    使用选择器从已加载的页面中提取帖子内容
+    
+    一次取回渲染后的页面源码，在本地用预编译的选择器计划匹配，
+    不再对每个候选选择器分别发起WebDriver查询。
+    
+    Args:
+        driver: 已打开帖子页面的WebDriver
+        url: 帖子原始URL
+        html: 已经取回的页面源码，为None时从driver读取
+        
+    Returns:
+        dict: 帖子内容
+    """
+    if html is None:
+        html = driver.page_source
+    fields = BROWSER_NOTE_PLAN.run(parse_html(html, NOTE_STRAINER))
+    
+    title = first_text(fields["title"])
+    text = first_text(fields["text"])
+    # 与浏览器中读取src属性一致，相对链接转换为完整链接
+    images = collect_urls(fields["images"], base_url=url, attrs=("src",))
+    video = first_attr(fields["video"], "src")
+    
+    # 整理结果
+    result = {
+        "title": title if title else "未找到标题",
+        "text": text if text else "未找到内容",
+        "images": images,
+        "video": video,
+        "original_url": url,
+        "source": "selenium"
+    }
+    
+    logger.info(f"成功抓取内容: 标题={result['title'][:20]}... 内容长度={len(result['text'])} 图片数={len(images)}")
+    return result
+
+def extract_content_from_page_source(html, url):
+    """
+    从页面源码中解析帖子内容，选择器提取失败时使用
+    
+    Args:
+        html: 页面源码
+        url: 帖子原始URL
+        
+    Returns:
+        dict: 帖子内容
+    """
+    # 页面内嵌数据
+    content = extract_embedded_content(html, extract_note_id(url))
+    if content:
+        content["original_url"] = url
+        return content
+    
+    soup = parse_html(html, NOTE_STRAINER)
+    
+    # 基础解析
+    title = soup.find('h1') or soup.find('title')
+    title = title.text.strip() if title else "未找到标题"
+    
+    # 查找主要内容
+    main_content = soup.find('article') or soup.find('main') or soup.find('div', class_='content')
+    text = main_content.text.strip() if main_content else "未找到内容"
+    
+    # 查找图片
+    images = []
+    for img in soup.find_all('img'):
+        src = img.get('src')
+        if src and src.startswith('http') and src not in images:
+            images.append(src)
+    
+    logger.info(f"从页面源码提取到内容: 标题={title[:20]}... 内容长度={len(text)} 图片数={len(images)}")
+    return {
+        "title": title,
+        "text": text,
+        "images": images,
+        "video": None,
+        "original_url": url,
+        "source": "html_source"
+    }
+
+
+def extract_loaded_page(driver, url, ready, strict=False):
+    """
+    从已加载的页面提取帖子内容，选择器提取失败时从页面源码解析
+    
+    Args:
+        driver: 已打开帖子页面的WebDriver
+        url: 帖子原始URL
+        ready: wait_until_ready的返回值，None表示等待超时
+        strict: 为True时页面初始数据中必须包含该URL的笔记，不回退到其他笔记
+        
+    Returns:
+        dict: 帖子内容，全部失败时返回None
+    """
+    html = driver.page_source
+    
+    # 优先从页面内嵌数据中提取，不需要逐个尝试选择器
+    try:
+        content = extract_embedded_content(html, extract_note_id(url), strict)
+        if content:
+            content["original_url"] = url
+            return content
+    except Exception as e:
+        logger.debug(f"从页面内嵌数据提取失败: {str(e)}")
+    
+    if ready:
+        # 尝试多种选择器来获取内容
+        try:
+            return extract_content_from_driver(driver, url, html)
+        except Exception as e:
+            logger.error(f"提取内容时出错: {str(e)}")
+            logger.error(traceback.format_exc())
+    else:
+        logger.error("页面加载超时")
+        # 保存页面源代码以便调试
+        with open("timeout_page_source.html", "w", encoding="utf-8") as f:
+            f.write(html)
+        logger.info("已保存页面源代码到timeout_page_source.html")
+    
+    # 如果正常提取失败，尝试从页面源码直接解析
+    try:
+        logger.info("尝试从页面源码解析内容...")
+        return extract_content_from_page_source(html, url)
+    except Exception as e:
+        logger.error(f"从页面源码解析内容失败: {str(e)}")
+        logger.error(traceback.format_exc())
+    return None
+
 # 主要功能
 def fetch_post_content_selenium(url):
     """使用Selenium爬取小红书帖子内容"""
@@ -87,238 +268,205 @@ def fetch_post_content_selenium(url):
     normalized_url = normalize_url(url)
     logger.info(f"标准化URL: {normalized_url}")
     
-    options = Options()
-    
-    # 无头模式 (取消注释以启用)
-    # options.add_argument("--headless=new")
-    
-    # 禁用自动化检测
-    options.add_argument("--disable-blink-features=AutomationControlled")
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    options.add_experimental_option("useAutomationExtension", False)
-    
-    # 随机用户代理
-    user_agent = get_random_user_agent()
-    options.add_argument(f"user-agent={user_agent}")
-    
-    # 添加其他配置以避免检测
-    options.add_argument("--disable-extensions")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-infobars")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-browser-side-navigation")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--disable-features=VizDisplayCompositor")
+    # 从浏览器池借出一个已启动的浏览器
+    pool = browser_pool.get_pool()
+    try:
+        pooled = pool.checkout()
+    except Exception as e:
+        logger.error(f"无法获取WebDriver: {str(e)}")
+        return None
+    driver = pooled.driver
+    broken = False
     
     try:
-        # 初始化Selenium WebDriver
-        logger.info("初始化WebDriver...")
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
-        
-        # 修改JavaScript环境以避免检测
-        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-            "source": """
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                });
-                window.navigator.chrome = {
-                    runtime: {}
-                };
-                Object.defineProperty(navigator, 'plugins', {
-                    get: () => [1, 2, 3, 4, 5]
-                });
-            """
-        })
+        # 随机用户代理
+        driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": get_random_user_agent()})
         
-        # 打开URL
+        # 打开URL，发出请求的时机由调度器决定
+        request_scheduler.wait(normalized_url)
         logger.info(f"访问URL: {normalized_url}")
         driver.get(normalized_url)
         
-        # 等待页面加载
-        add_random_delay(3.0, 5.0)
+        # 等待标题/内容或页面初始数据出现，同时关闭登录弹窗
+        ready = wait_until_ready(driver)
         
-        # 滚动页面以加载全部内容
-        scroll_to_bottom(driver, scroll_count=2)
+        # 触发懒加载图片设置src，不等待图片下载
+        if ready:
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
         
-        # 检查是否有需要登录的弹窗，如果有则尝试关闭
-        try:
-            close_button = WebDriverWait(driver, 3).until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, "div.modal button.close"))
-            )
-            close_button.click()
-            logger.info("关闭了弹窗")
-            add_random_delay(1.0, 2.0)
-        except:
-            logger.debug("没有检测到弹窗或无法关闭")
+        return extract_loaded_page(driver, url, ready)
+    
+    except Exception as e:
+        broken = True
+        logger.error(f"Selenium抓取失败: {str(e)}")
+        logger.error(traceback.format_exc())
+    
+    finally:
+        # 归还浏览器，出错的浏览器会被关闭
+        pool.checkin(pooled, broken)
+    
+    return None
+
+def extract_tab(driver, url, ready, navigated, href):
+    """
+    从多标签页抓取中的一个标签页提取帖子内容
+
+    页面还没有离开上一个帖子，或者加载的笔记ID与URL不一致时返回None，
+    不把其他帖子的内容当作这个URL的结果。
+    """
+    if not navigated:
+        logger.warning(f"标签页没有跳转到新页面: {url}")
+        return None
+    # 短链接的ID与跳转后的笔记ID不同，无法比较
+    expected_id = None if "xhslink.com" in url else extract_note_id(url)
+    loaded_id = extract_note_id(href or "")
+    if expected_id and loaded_id and loaded_id != expected_id:
+        logger.warning(f"标签页加载的笔记 {loaded_id} 与URL不一致: {url}")
+        return None
+    if ready:
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+    return extract_loaded_page(driver, url, ready, strict=expected_id is not None)
+
+def fetch_posts_multi_tab(urls, max_tabs=None, timeout=None):
+    """
+    在同一个浏览器中用多个标签页并发抓取多个帖子
+    
+    每个标签页通过JS跳转发起导航而不阻塞，之后轮流检查各标签页是否就绪，
+    就绪的标签页立即提取内容并加载下一个URL。各URL的导航时机仍由请求调度器决定。
+    
+    Args:
+        urls: 帖子URL列表
+        max_tabs: 最多同时打开的标签页数
+        timeout: 单个页面等待就绪的最长时间（秒），超时后从页面源码解析
         
-        # 尝试多种选择器来获取内容
-        try:
-            # 等待标题加载
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "h1.title, .note-content .title, .content .title"))
-            )
-            
-            # 提取标题
-            title_selectors = [
-                "h1.title", 
-                ".note-content .title", 
-                ".content .title",
-                ".note-top .title"
-            ]
-            
-            title = None
-            for selector in title_selectors:
-                try:
-                    title_elem = driver.find_element(By.CSS_SELECTOR, selector)
-                    title = title_elem.text.strip()
-                    if title:
-                        break
-                except:
-                    continue
-            
-            # 提取内容文本
-            content_selectors = [
-                ".note-content .content", 
-                ".content .desc", 
-                ".note-content .desc",
-                ".note-content"
-            ]
-            
-            text = None
-            for selector in content_selectors:
-                try:
-                    content_elem = driver.find_element(By.CSS_SELECTOR, selector)
-                    text = content_elem.text.strip()
-                    if text:
-                        break
-                except:
-                    continue
-            
-            # 提取图片
-            image_selectors = [
-                ".note-content img", 
-                ".slide-item img", 
-                ".image-container img",
-                ".carousel img"
-            ]
-            
-            images = []
-            for selector in image_selectors:
-                try:
-                    img_elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                    for img in img_elements:
-                        src = img.get_attribute("src")
-                        if src and src.startswith("http") and src not in images:
-                            images.append(src)
-                except:
-                    continue
-            
-            # 提取视频
-            video_selectors = [
-                "video source", 
-                "video"
-            ]
-            
-            video = None
-            for selector in video_selectors:
-                try:
-                    video_elem = driver.find_element(By.CSS_SELECTOR, selector)
-                    video = video_elem.get_attribute("src")
-                    if video:
-                        break
-                except:
-                    continue
-            
-            # 整理结果
-            result = {
-                "title": title if title else "未找到标题",
-                "text": text if text else "未找到内容",
-                "images": images,
-                "video": video,
-                "original_url": url,
-                "source": "selenium"
-            }
-            
-            logger.info(f"成功抓取内容: 标题={result['title'][:20]}... 内容长度={len(result['text'])} 图片数={len(images)}")
-            return result
-            
-        except TimeoutException:
-            logger.error("页面加载超时")
-            # 保存页面源代码以便调试
-            with open("timeout_page_source.html", "w", encoding="utf-8") as f:
-                f.write(driver.page_source)
-            logger.info("已保存页面源代码到timeout_page_source.html")
-            
-        except Exception as e:
-            logger.error(f"提取内容时出错: {str(e)}")
-            logger.error(traceback.format_exc())
+    Returns:
+        dict: {URL: 帖子内容}，抓取失败的URL对应None
+    """
+    max_tabs = max_tabs or BROWSER_CONFIG.get("MAX_TABS", 4)
+    timeout = timeout or BROWSER_CONFIG.get("READY_TIMEOUT", 10)
+    poll_interval = BROWSER_CONFIG.get("READY_POLL_INTERVAL", 0.1)
+    
+    results = {url: None for url in urls}
+    queue = list(dict.fromkeys(urls))
+    if not queue:
+        return results
+    
+    pool = browser_pool.get_pool()
+    try:
+        pooled = pool.checkout()
+    except Exception as e:
+        logger.error(f"无法获取WebDriver: {str(e)}")
+        return results
+    driver = pooled.driver
+    broken = False
+    
+    main_handle = driver.current_window_handle
+    tabs = {}
+    
+    def assign(handle):
+        """为标签页分配下一个URL，按调度器预约的时间发起导航"""
+        if not queue:
+            tabs.pop(handle, None)
+            return
+        url = queue.pop(0)
+        delay = request_scheduler.reserve(normalize_url(url))
+        tabs[handle] = {"url": url, "navigate_at": time.time() + delay, "started": None, "previous_href": None}
+    
+    try:
+        user_agent = get_random_user_agent()
+        driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": user_agent})
         
-        # 如果正常提取失败，尝试从页面源码直接解析
-        try:
-            logger.info("尝试从页面源码解析内容...")
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            
-            # 尝试查找JSON数据
-            scripts = soup.find_all('script', type='application/ld+json')
-            for script in scripts:
-                try:
-                    data = json.loads(script.string)
-                    if isinstance(data, dict) and 'name' in data and 'description' in data:
-                        logger.info("从JSON数据中提取到内容")
-                        return {
-                            "title": data.get('name', '未找到标题'),
-                            "text": data.get('description', '未找到内容'),
-                            "images": [data.get('image', '')] if data.get('image') else [],
-                            "video": data.get('video', None),
-                            "original_url": url,
-                            "source": "json_ld"
-                        }
-                except:
+        # 打开标签页，新标签页需要重新设置反检测脚本、资源拦截和User-Agent
+        for index in range(min(max_tabs, len(queue))):
+            if index > 0:
+                driver.switch_to.new_window('tab')
+                browser_pool.prepare_tab(driver, pool.blocked_patterns, user_agent)
+            assign(driver.current_window_handle)
+        
+        logger.info(f"使用 {len(tabs)} 个标签页抓取 {len(queue) + len(tabs)} 个帖子")
+        
+        while tabs:
+            now = time.time()
+            for handle, tab in list(tabs.items()):
+                # 到达预约时间后发起导航，不等待页面加载
+                if tab["started"] is None:
+                    if now >= tab["navigate_at"]:
+                        driver.switch_to.window(handle)
+                        # 复用的标签页中还是上一个帖子的页面，记录跳转前的地址用于判断新页面是否已加载
+                        tab["previous_href"] = driver.execute_script(
+                            "const href = location.href; window.location.href = arguments[0]; return href;",
+                            normalize_url(tab["url"])
+                        )
+                        tab["started"] = time.time()
+                        logger.info(f"标签页访问URL: {tab['url']}")
                     continue
+                
+                driver.switch_to.window(handle)
+                try:
+                    status = driver.execute_script(READINESS_SCRIPT, MODAL_CLOSE_SELECTOR, READY_SELECTORS) or {}
+                except Exception:
+                    # 页面正在跳转时脚本可能执行失败，下一轮再检查
+                    status = {}
+                # 地址变化且新文档开始解析后才检查就绪，否则读到的是上一个帖子的页面
+                navigated = status.get("href") not in (None, tab["previous_href"]) and \
+                    status.get("readyState") in ("interactive", "complete")
+                ready = status.get("ready") if navigated else None
+                
+                if ready or now - tab["started"] >= timeout:
+                    results[tab["url"]] = extract_tab(driver, tab["url"], ready, navigated, status.get("href"))
+                    assign(handle)
             
-            # 基础解析
-            title = soup.find('h1') or soup.find('title')
-            title = title.text.strip() if title else "未找到标题"
-            
-            # 查找主要内容
-            main_content = soup.find('article') or soup.find('main') or soup.find('div', class_='content')
-            text = main_content.text.strip() if main_content else "未找到内容"
-            
-            # 查找图片
-            images = []
-            for img in soup.find_all('img'):
-                src = img.get('src')
-                if src and src.startswith('http') and src not in images:
-                    images.append(src)
-            
-            logger.info(f"从页面源码提取到内容: 标题={title[:20]}... 内容长度={len(text)} 图片数={len(images)}")
-            return {
-                "title": title,
-                "text": text,
-                "images": images,
-                "video": None,
-                "original_url": url,
-                "source": "html_source"
-            }
-            
-        except Exception as e:
-            logger.error(f"从页面源码解析内容失败: {str(e)}")
-            logger.error(traceback.format_exc())
+            time.sleep(poll_interval)
     
     except Exception as e:
-        logger.error(f"Selenium抓取失败: {str(e)}")
+        broken = True
+        logger.error(f"多标签页抓取失败: {str(e)}")
         logger.error(traceback.format_exc())
     
     finally:
-        try:
-            # 关闭浏览器
-            driver.quit()
-            logger.info("已关闭WebDriver")
-        except:
-            pass
+        # 关闭多余的标签页后归还浏览器
+        if not broken:
+            try:
+                for handle in driver.window_handles:
+                    if handle != main_handle:
+                        driver.switch_to.window(handle)
+                        driver.close()
+                driver.switch_to.window(main_handle)
+            except Exception as e:
+                logger.warning(f"关闭标签页失败: {str(e)}")
+                broken = True
+        pool.checkin(pooled, broken)
     
-    return None
+    return results
+
+def fetch_post_contents(urls, max_tabs=None):
+    """
+    批量抓取多个帖子内容
+    
+    Args:
+        urls: 小红书帖子URL列表
+        max_tabs: 最多同时打开的标签页数
+        
+    Returns:
+        dict: {URL: 帖子内容}，抓取失败的帖子返回空结果
+    """
+    contents = fetch_posts_multi_tab(urls, max_tabs)
+    
+    results = {}
+    for url, content in contents.items():
+        if content and content.get("text") and content.get("text") != "未找到内容":
+            results[url] = content
+        else:
+            logger.warning(f"抓取内容为空或无效: {url}")
+            results[url] = {
+                "title": "未找到标题",
+                "text": "未找到内容",
+                "images": [],
+                "video": None,
+                "original_url": url,
+                "source": "failed"
+            }
+    return results
 
 def manual_input(url):
     """允许用户手动输入内容"""
@@ -358,23 +506,29 @@ def manual_input(url):
     }
 
 def batch_input(urls):
-    """批量手动输入多个URL的内容"""
-    results = {}
+    """批量手动输入多个URL的内容，选择自动抓取的URL在同一个浏览器中并发抓取"""
+    choices = {}
     for url in urls:
         print(f"\n处理URL: {url}")
-        choice = input("自动抓取(A)还是手动输入(M)? [A/M]: ").strip().upper()
-        
-        if choice == 'M':
+        choices[url] = input("自动抓取(A)还是手动输入(M)? [A/M]: ").strip().upper()
+    
+    auto_urls = [url for url in urls if choices[url] != 'M']
+    if auto_urls:
+        print(f"尝试自动抓取 {len(auto_urls)} 个URL...")
+        fetched = fetch_post_contents(auto_urls)
+    else:
+        fetched = {}
+    
+    results = {}
+    for url in urls:
+        if choices[url] == 'M':
             results[url] = manual_input(url)
+        elif fetched[url].get('text') != '未找到内容':
+            results[url] = fetched[url]
+            print(f"自动抓取成功: {url}")
         else:
-            print("尝试自动抓取...")
-            result = fetch_post_content(url, allow_manual=False)
-            if result and result.get('text') != '未找到内容':
-                results[url] = result
-                print("自动抓取成功!")
-            else:
-                print("自动抓取失败，切换到手动输入")
-                results[url] = manual_input(url)
+            print(f"自动抓取失败，切换到手动输入: {url}")
+            results[url] = manual_input(url)
     
     return results
 
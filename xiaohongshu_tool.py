@@ -3,13 +3,29 @@ import re
 import json
 import time
 import random
+import threading
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 import hashlib
-from urllib.parse import quote
+from urllib.parse import quote, urlparse
 import logging
 from datetime import datetime
 
+import request_scheduler
+from task_graph import TaskGraph
+from embedded_state import extract_embedded_content
+from html_parsing import parse_html, get_page_text, NOTE_STRAINER, SEARCH_STRAINER
+from selector_plan import BASIC_NOTE_PLAN, ALTERNATIVE_NOTE_PLAN, first_match_text, first_attr
+
+# 导入配置
+try:
+    from config import REQUEST_CONFIG
+except ImportError:
+    REQUEST_CONFIG = {
+        "POOL_CONNECTIONS": 10,
+        "POOL_MAXSIZE": 20
+    }
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -51,13 +67,9 @@ class AntiCrawlUtils:
         # "http://proxy3.example.com:8080",
     ]
 
-    # 存储cookies，多个域名分别存储
-    _cookies_store = {
-        "www.xiaohongshu.com": DEFAULT_COOKIES.copy()
-    }
-
-    # 上次请求时间记录，用于请求间隔控制
-    _last_request_time = 0
+    # 每个域名一个会话，复用连接池和cookie jar
+    _sessions = {}
+    _sessions_lock = threading.Lock()
 
     # 代理索引
     _proxy_index = -1
@@ -88,36 +100,19 @@ class AntiCrawlUtils:
         return {"http": proxy, "https": proxy}
 
     @classmethod
-    def add_random_delay(cls, min_seconds=1.0, max_seconds=3.0, jitter=0.5):
-        """添加随机延迟，避免被检测为机器人
+    def add_random_delay(cls, min_seconds=1.0, max_seconds=3.0, jitter=0.5, host="www.xiaohongshu.com"):
+        """等待请求调度器分配的发送时机，避免被检测为机器人
+        
+        请求间隔由request_scheduler按域名统一控制：域名空闲时立即放行，
+        请求过密时按令牌桶和随机抖动排队，其他域名的请求不受影响。
         
         Args:
-            min_seconds: 最小延迟秒数
-            max_seconds: 最大延迟秒数
-            jitter: 抖动范围 (0-1)，增加随机性
+            min_seconds: 保留兼容旧调用，不再使用
+            max_seconds: 保留兼容旧调用，不再使用
+            jitter: 保留兼容旧调用，不再使用
+            host: 请求的目标域名
         """
-        # 计算自上次请求以来的时间
-        now = time.time()
-        elapsed = now - cls._last_request_time
-        
-        # 如果距离上次请求时间太短，增加等待时间
-        if elapsed < min_seconds:
-            min_seconds = max(min_seconds, min_seconds - elapsed)
-        else:
-            # 已经等待足够长的时间，可以减少等待
-            min_seconds = max(0.2, min_seconds * 0.8)
-        
-        # 添加抖动避免固定模式
-        jitter_value = random.uniform(-jitter, jitter)
-        max_with_jitter = max_seconds * (1 + jitter_value)
-        min_with_jitter = min_seconds * (1 - jitter_value * 0.5)  # 最小值抖动较小
-        
-        delay = random.uniform(min_with_jitter, max_with_jitter)
-        time.sleep(delay)
-        
-        # 更新最后请求时间
-        cls._last_request_time = time.time()
-        return delay
+        return request_scheduler.wait(host)
 
     @classmethod
     def get_enhanced_headers(cls, referer=None, is_api=False):
@@ -198,19 +193,53 @@ class AntiCrawlUtils:
                 cookies[name] = value
         return cookies
 
+    @classmethod
+    def get_session(cls, domain="www.xiaohongshu.com"):
+        """获取指定域名的共享会话
+        
+        同一域名的所有请求复用一个requests.Session，从而复用TCP/TLS长连接，
+        并由会话的cookie jar自动保存响应中的cookies。urllib3连接池和
+        RequestsCookieJar本身都是线程安全的，可以在gunicorn的多个线程间共享。
+        
+        Args:
+            domain: 域名
+        """
+        session = cls._sessions.get(domain)
+        if session is not None:
+            return session
+        
+        with cls._sessions_lock:
+            # 双重检查，避免并发时重复创建
+            session = cls._sessions.get(domain)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=REQUEST_CONFIG.get("POOL_CONNECTIONS", 10),
+                    pool_maxsize=REQUEST_CONFIG.get("POOL_MAXSIZE", 20),
+                    max_retries=0  # 重试由make_request自行处理
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                
+                # 使用默认cookies初始化cookie jar（cookie域名不含端口）
+                cookie_domain = domain.split(":")[0]
+                for name, value in cls.DEFAULT_COOKIES.items():
+                    session.cookies.set(name, value, domain=cookie_domain)
+                
+                cls._sessions[domain] = session
+                logger.info(f"Created pooled session for {domain}")
+        
+        return session
+
     @classmethod
     def get_cookies(cls, domain="www.xiaohongshu.com", custom_cookies_str=None):
-        """获取cookies，结合默认和自定义cookies
+        """获取cookies，结合会话中保存的和自定义cookies
         
         Args:
             domain: 域名
             custom_cookies_str: 自定义cookies字符串
         """
-        # 确保域名存在于存储中
-        if domain not in cls._cookies_store:
-            cls._cookies_store[domain] = cls.DEFAULT_COOKIES.copy()
-            
-        cookies = cls._cookies_store[domain].copy()
+        cookies = cls.get_session(domain).cookies.get_dict()
         
         # 如果提供了自定义cookies，合并
         if custom_cookies_str:
@@ -223,23 +252,21 @@ class AntiCrawlUtils:
     def update_cookies(cls, domain, response):
         """从响应中更新cookies
         
+        会话的cookie jar已经自动保存了响应中的cookies，这里只处理
+        未经过共享会话发出的请求（例如直接使用requests.get的调用方）。
+        
         Args:
             domain: 域名
             response: 请求响应对象
         """
         if not response or not response.cookies:
             return
-            
-        # 确保域名存在于存储中
-        if domain not in cls._cookies_store:
-            cls._cookies_store[domain] = cls.DEFAULT_COOKIES.copy()
-            
-        # 更新cookies
-        for key, value in response.cookies.items():
-            cls._cookies_store[domain][key] = value
+        
+        session = cls.get_session(domain)
+        session.cookies.update(response.cookies)
             
         # 记录cookies更新
-        logger.info(f"Updated cookies for {domain}, now has {len(cls._cookies_store[domain])} keys")
+        logger.info(f"Updated cookies for {domain}, now has {len(session.cookies)} keys")
 
     @classmethod
     def make_request(cls, url, method="GET", params=None, data=None, json_data=None, 
@@ -267,14 +294,13 @@ class AntiCrawlUtils:
         if retry_status_codes is None:
             retry_status_codes = [429, 500, 502, 503, 504]
             
-        # 提取域名
-        from urllib.parse import urlparse
+        # 提取域名，获取该域名的共享会话
         domain = urlparse(url).netloc
+        session = cls.get_session(domain)
+        
+        # 未提供cookies时由会话的cookie jar自动携带，
+        # 提供的cookies只作用于本次请求
         
-        # 如果没有提供cookies，使用存储的cookies
-        if cookies is None:
-            cookies = cls.get_cookies(domain)
-            
         # 如果没有提供请求头，生成增强的请求头
         if headers is None:
             is_api = "api" in url or method != "GET"
@@ -290,16 +316,17 @@ class AntiCrawlUtils:
         
         logger.info(f"Making {method} request to {url}")
         
+        # 重试前的退避延迟
+        retry_delay = 0
+        
         for attempt in range(max_retries):
             try:
-                # 添加随机延迟，重试次数越多延迟越长
-                jitter = 0.2 * (attempt + 1)
-                delay_min = 1 + attempt * backoff_factor
-                delay_max = 3 + attempt * backoff_factor * 1.5
-                cls.add_random_delay(delay_min, delay_max, jitter)
+                # 等待调度器分配发送时机，重试时附加退避延迟
+                request_scheduler.wait(domain, retry_delay)
+                retry_delay = 0
                 
-                # 执行请求
-                response = requests.request(
+                # 执行请求（复用会话的长连接）
+                response = session.request(
                     method=method,
                     url=url,
                     params=params,
@@ -312,18 +339,16 @@ class AntiCrawlUtils:
                     allow_redirects=allow_redirects
                 )
                 
-                # 更新cookies
-                cls.update_cookies(domain, response)
-                
                 # 如果状态码需要重试
                 if response.status_code in retry_status_codes:
                     logger.warning(f"Attempt {attempt+1}/{max_retries}: Received status code {response.status_code}, retrying...")
+                    retry_delay = (attempt + 1) * backoff_factor
                     
-                    # 如果返回429 (Too Many Requests)，增加更长的延迟
+                    # 如果返回429 (Too Many Requests)，推迟该域名的所有请求
                     if response.status_code == 429:
                         wait_time = 5 + attempt * 3
                         logger.warning(f"Rate limited (429). Waiting {wait_time} seconds before retry.")
-                        time.sleep(wait_time)
+                        request_scheduler.penalize(domain, wait_time)
                         
                         # 尝试切换用户代理和代理
                         headers["User-Agent"] = cls.get_random_user_agent()
@@ -342,9 +367,8 @@ class AntiCrawlUtils:
                 logger.error(f"Attempt {attempt+1}/{max_retries}: Request failed: {str(e)}")
                 
                 if attempt < max_retries - 1:
-                    wait_time = (backoff_factor ** attempt) * 2
-                    logger.info(f"Waiting {wait_time:.1f} seconds before retry")
-                    time.sleep(wait_time)
+                    retry_delay = (backoff_factor ** attempt) * 2
+                    logger.info(f"Waiting {retry_delay:.1f} seconds before retry")
                 else:
                     # 增加重试计数
                     cls._retry_count[retry_key] += 1
@@ -363,7 +387,7 @@ def get_random_user_agent():
     return AntiCrawlUtils.get_random_user_agent()
 
 def add_random_delay(min_seconds=1, max_seconds=3):
-    """添加随机延迟，避免被检测"""
+    """等待请求调度器分配的发送时机，避免被检测"""
     return AntiCrawlUtils.add_random_delay(min_seconds, max_seconds)
 
 def get_enhanced_headers(referer=None, is_api=False):
@@ -378,6 +402,10 @@ def get_cookies(custom_cookies_str=None):
     """获取cookies，结合默认和自定义cookies"""
     return AntiCrawlUtils.get_cookies(custom_cookies_str=custom_cookies_str)
 
+def get_session(domain="www.xiaohongshu.com"):
+    """获取指定域名的共享会话"""
+    return AntiCrawlUtils.get_session(domain)
+
 # 尝试导入媒体分析模块
 try:
     import media_analyzer
@@ -385,6 +413,111 @@ try:
 except ImportError:
     MEDIA_ANALYSIS_AVAILABLE = False
 
+# 移动端用户代理，用于备选抓取
+MOBILE_USER_AGENT = "Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Mobile/15E148 Safari/604.1"
+
+# 抓取失败时返回的空结果
+EMPTY_POST_CONTENT = {
+    "title": "未找到标题",
+    "text": "未找到内容，请手动输入",
+    "images": [],
+    "video": None
+}
+
+def is_captcha_page(page_text):
+    """检查页面文本是否包含反爬验证"""
+    return ("验证" in page_text or "校验" in page_text or "captcha" in page_text.lower())
+
+def parse_post_html(html):
+    """
+    从帖子页面HTML中解析内容
+    
+    Args:
+        html: 帖子页面HTML
+        
+    Returns:
+        dict: 包含文字、图片和视频URL的字典；需要使用备选方法时返回None
+    """
+    # 优先从页面内嵌数据中提取，不需要解析整个文档
+    content = extract_embedded_content(html)
+    if content:
+        return content
+    
+    # 检查是否有反爬验证
+    if is_captcha_page(get_page_text(html)):
+        logger.warning(f"检测到反爬验证码，尝试备选方法...")
+        return None
+    
+    soup = parse_html(html, NOTE_STRAINER)
+    
+    # 所有选择器在一次遍历中匹配；页面初始数据已经在上面处理过
+    fields = BASIC_NOTE_PLAN.run(soup)
+    
+    # 提取标题
+    if fields["title"]:
+        title = first_match_text(fields["title"])
+    else:
+        # 尝试JS渲染的帖子页面结构
+        title = first_attr(fields["meta_title"], 'content') or "未找到标题"
+    
+    # 提取正文内容
+    if not fields["text"]:
+        logger.warning(f"未能从页面直接提取内容，尝试备选方法...")
+        return None
+    content = first_match_text(fields["text"])
+    
+    # 提取图片URL，轮播图中没有图片时尝试其他选择器
+    img_elems = fields["images"] or fields["fallback_images"]
+    image_urls = [src for src in (first_attr([img], 'src', 'data-src') for img in img_elems) if src]
+    
+    # 提取视频URL
+    video_url = first_attr(fields["video"], 'src')
+    
+    # 如果内容非常短，可能抓取失败，尝试备选方法
+    if len(content) < 10 and not image_urls and not video_url:
+        logger.warning(f"抓取内容异常，尝试备选方法...")
+        return None
+    
+    logger.info(f"成功提取帖子内容: 标题={title[:20]}..., 内容长度={len(content)}, 图片数={len(image_urls)}")
+    
+    return {
+        "title": title,
+        "text": content,
+        "images": image_urls,
+        "video": video_url
+    }
+
+def parse_post_html_alternative(html):
+    """
+    备选解析方法，优先从页面内嵌的JSON数据中提取内容
+    
+    Args:
+        html: 帖子页面HTML
+        
+    Returns:
+        dict: 包含文字、图片和视频URL的字典
+    """
+    # 优先从页面内嵌的初始数据或JSON-LD中提取
+    content = extract_embedded_content(html)
+    if content:
+        return content
+    
+    soup = parse_html(html, NOTE_STRAINER)
+    
+    # 如果无法从JSON提取，使用传统方法
+    fields = ALTERNATIVE_NOTE_PLAN.run(soup)
+    title = first_match_text(fields["title"]) if fields["title"] else "未找到标题"
+    content = first_match_text(fields["text"]) if fields["text"] else "未找到内容"
+    image_urls = [src for src in (first_attr([img], 'src', 'data-src') for img in fields["images"]) if src]
+    video_url = first_attr(fields["video"], 'src')
+    
+    return {
+        "title": title,
+        "text": content,
+        "images": image_urls,
+        "video": video_url
+    }
+
 def fetch_post_content(url):
     """
     抓取小红书帖子内容，包括文字和图片
@@ -404,112 +537,11 @@ def fetch_post_content(url):
             timeout=15
         )
         
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 检查是否有反爬验证
-        if "验证" in soup.text or "校验" in soup.text or "captcha" in soup.text.lower():
-            logger.warning(f"检测到反爬验证码，尝试备选方法...")
+        content = parse_post_html(response.text)
+        if content is None:
             return fetch_post_content_alternative(url)
         
-        # 提取标题
-        title_elem = soup.select_one('h1.title') or soup.select_one('div.content-container div.title')
-        if not title_elem:
-            # 尝试JS渲染的帖子页面结构
-            title_elem = soup.select_one('meta[property="og:title"]')
-            title = title_elem['content'] if title_elem and 'content' in title_elem.attrs else "未找到标题"
-        else:
-            title = title_elem.text.strip()
-        
-        # 提取正文内容
-        content_elem = soup.select_one('div.content') or soup.select_one('div.desc')
-        if not content_elem:
-            # 尝试提取script中的数据
-            scripts = soup.select('script')
-            content = ""
-            for script in scripts:
-                if script.string and "window.__INITIAL_STATE__" in script.string:
-                    try:
-                        # 提取JSON部分
-                        json_str = script.string.split("window.__INITIAL_STATE__=")[1].split(";")[0]
-                        data = json.loads(json_str)
-                        # 尝试从数据中提取内容
-                        if "note" in data and "desc" in data["note"]:
-                            content = data["note"]["desc"]
-                            break
-                    except:
-                        pass
-            
-            if not content:
-                logger.warning(f"未能从页面直接提取内容，尝试备选方法...")
-                return fetch_post_content_alternative(url)
-        else:
-            content = content_elem.text.strip()
-        
-        # 提取图片URL
-        image_urls = []
-        img_elems = soup.select('div.carousel img') or soup.select('div.swiper-slide img')
-        
-        # 如果上面的选择器没有找到图片，尝试其他选择器
-        if not img_elems:
-            img_elems = soup.select('div.note-content img') or soup.select('img.upload-image')
-        
-        for img in img_elems:
-            if img.get('src'):
-                image_urls.append(img['src'])
-            elif img.get('data-src'):
-                image_urls.append(img['data-src'])
-                
-        # 如果图片列表为空，尝试从JavaScript数据中提取
-        if not image_urls:
-            scripts = soup.select('script')
-            for script in scripts:
-                if script.string and "window.__INITIAL_STATE__" in script.string:
-                    try:
-                        # 提取JSON部分
-                        json_str = script.string.split("window.__INITIAL_STATE__=")[1].split(";")[0]
-                        data = json.loads(json_str)
-                        # 尝试从数据中提取图片
-                        if "note" in data and "imageList" in data["note"]:
-                            for img in data["note"]["imageList"]:
-                                if "url" in img:
-                                    image_urls.append(img["url"])
-                    except:
-                        pass
-        
-        # 提取视频URL
-        video_url = None
-        video_elem = soup.select_one('video')
-        if video_elem and video_elem.get('src'):
-            video_url = video_elem['src']
-        else:
-            # 尝试从JavaScript数据中提取视频URL
-            scripts = soup.select('script')
-            for script in scripts:
-                if script.string and "window.__INITIAL_STATE__" in script.string:
-                    try:
-                        # 提取JSON部分
-                        json_str = script.string.split("window.__INITIAL_STATE__=")[1].split(";")[0]
-                        data = json.loads(json_str)
-                        # 尝试从数据中提取视频URL
-                        if "note" in data and "video" in data["note"] and "url" in data["note"]["video"]:
-                            video_url = data["note"]["video"]["url"]
-                            break
-                    except:
-                        pass
-        
-        # 如果内容非常短，可能抓取失败，尝试备选方法
-        if len(content) < 10 and not image_urls and not video_url:
-            logger.warning(f"抓取内容异常，尝试备选方法...")
-            return fetch_post_content_alternative(url)
-        
-        logger.info(f"成功提取帖子内容: 标题={title[:20]}..., 内容长度={len(content)}, 图片数={len(image_urls)}")
-        
-        return {
-            "title": title,
-            "text": content,
-            "images": image_urls,
-            "video": video_url
-        }
+        return content
     
     except Exception as e:
         logger.error(f"抓取帖子内容失败: {str(e)}，尝试备选方法")
@@ -520,7 +552,7 @@ def fetch_post_content_alternative(url):
     try:
         # 模拟移动设备
         mobile_headers = get_enhanced_headers(referer=url, is_api=False)
-        mobile_headers["User-Agent"] = "Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Mobile/15E148 Safari/604.1"
+        mobile_headers["User-Agent"] = MOBILE_USER_AGENT
         
         response = AntiCrawlUtils.make_request(
             url=url,
@@ -529,93 +561,72 @@ def fetch_post_content_alternative(url):
             max_retries=4
         )
         
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 尝试提取JSON数据
-        json_data = None
-        scripts = soup.select('script')
-        for script in scripts:
-            if script.string and ("window.__INITIAL_STATE__" in script.string or "window.__INITIAL_SSR_STATE__" in script.string):
-                try:
-                    # 提取JSON部分
-                    if "window.__INITIAL_STATE__" in script.string:
-                        json_str = script.string.split("window.__INITIAL_STATE__=")[1].split(";")[0]
-                    else:
-                        json_str = script.string.split("window.__INITIAL_SSR_STATE__=")[1].split(";")[0]
-                    
-                    json_data = json.loads(json_str)
-                    break
-                except:
-                    continue
+        return parse_post_html_alternative(response.text)
+    
+    except Exception as e:
+        logger.error(f"备选方法抓取失败: {str(e)}，使用手动输入提示")
+        # 如果备选方法也失败，直接返回空结果
+        # 调用方应检查结果是否为空并提示用户手动输入
+        return dict(EMPTY_POST_CONTENT)
+
+def parse_top_posts_html(html, max_posts=10):
+    """
+    从搜索结果页HTML中解析热门帖子
+    
+    Args:
+        html: 搜索结果页HTML
+        max_posts: 最大帖子数量
         
-        if json_data and "note" in json_data:
-            note_data = json_data["note"]
-            
-            # 提取标题 (通常是作者名称 + 正文前几个字)
-            title = note_data.get("title", "")
-            if not title and "user" in note_data and "nickname" in note_data["user"]:
-                # 如果没有标题，使用作者名称
-                title = note_data["user"]["nickname"] + "的笔记"
-            
-            # 提取正文
-            content = note_data.get("desc", "")
-            
-            # 提取图片
-            image_urls = []
-            if "imageList" in note_data:
-                for img in note_data["imageList"]:
-                    if "url" in img:
-                        image_urls.append(img["url"])
-            
-            # 提取视频
-            video_url = None
-            if "video" in note_data and "url" in note_data["video"]:
-                video_url = note_data["video"]["url"]
-            
-            return {
-                "title": title,
-                "text": content,
-                "images": image_urls,
-                "video": video_url
-            }
-        
-        # 如果无法从JSON提取，使用传统方法
-        title_elem = soup.select_one('h1.title') or soup.select_one('div.content-container div.title')
-        title = title_elem.text.strip() if title_elem else "未找到标题"
+    Returns:
+        tuple: (热门帖子列表，未找到帖子时为None, 是否检测到反爬验证)
+    """
+    soup = parse_html(html, SEARCH_STRAINER)
+    
+    # 尝试多种选择器找到帖子容器
+    posts_container = soup.select('div.note-list section') or soup.select('div.items-wrapper div.item') or soup.select('div.feeds-container div.note-item')
+    
+    captcha = False
+    if not posts_container:
+        # 如果找不到帖子，检查是否有反爬信息
+        captcha = is_captcha_page(get_page_text(html))
+        if captcha:
+            # 尝试备选选择器
+            posts_container = soup.select('div.search-container div.note-item') or soup.select('div.content div.note-item')
         
-        content_elem = soup.select_one('div.content') or soup.select_one('div.desc')
-        content = content_elem.text.strip() if content_elem else "未找到内容"
+        if not posts_container:
+            return None, captcha
+    
+    results = []
+    for post in posts_container[:max_posts]:
+        # 尝试不同选择器提取标题、链接和点赞数
+        title_elem = post.select_one('div.note-info h3') or post.select_one('div.note-content div.title') or post.select_one('div.note-desc')
+        link_elem = post.select_one('a') or post.select_one('div.note-content a')
+        likes_elem = post.select_one('span.like-count') or post.select_one('div.note-metrics span.like')
         
-        image_urls = []
-        img_elems = soup.select('div.carousel img') or soup.select('div.swiper-slide img') or soup.select('div.note-content img')
-        for img in img_elems:
-            if img.get('src'):
-                image_urls.append(img['src'])
-            elif img.get('data-src'):
-                image_urls.append(img['data-src'])
+        title = title_elem.text.strip() if title_elem else "未找到标题"
+        post_url = "https://www.xiaohongshu.com" + link_elem['href'] if link_elem and 'href' in link_elem.attrs else "#"
+        likes = int(likes_elem.text.replace('赞', '').strip()) if likes_elem else 0
         
-        video_url = None
-        video_elem = soup.select_one('video')
-        if video_elem and video_elem.get('src'):
-            video_url = video_elem['src']
+        # 如果找不到点赞数，尝试使用顺序作为权重
+        if likes == 0:
+            likes = max_posts - len(results)
         
-        return {
+        results.append({
+            "url": post_url,
             "title": title,
-            "text": content,
-            "images": image_urls,
-            "video": video_url
-        }
-    
-    except Exception as e:
-        logger.error(f"备选方法抓取失败: {str(e)}，使用手动输入提示")
-        # 如果备选方法也失败，直接返回空结果
-        # 调用方应检查结果是否为空并提示用户手动输入
-        return {
-            "title": "未找到标题",
-            "text": "未找到内容，请手动输入",
-            "images": [],
-            "video": None
-        }
+            "likes": likes
+        })
+        
+    # 按点赞数排序
+    results.sort(key=lambda x: x["likes"], reverse=True)
+    return results[:max_posts], captcha
+
+def build_search_urls(keyword):
+    """构建搜索结果页URL及备选URL"""
+    encoded_keyword = quote(keyword)
+    search_url = f"https://www.xiaohongshu.com/search_result?keyword={encoded_keyword}&source=web"
+    alternative_url = f"https://www.xiaohongshu.com/search_result/xhs/search?keyword={encoded_keyword}&sort=general&page=1"
+    return search_url, alternative_url
 
 def fetch_top_posts(keyword, max_posts=10):
     """
@@ -629,8 +640,7 @@ def fetch_top_posts(keyword, max_posts=10):
         list: 热门帖子列表
     """
     # 构建搜索URL，编码关键词
-    encoded_keyword = quote(keyword)
-    search_url = f"https://www.xiaohongshu.com/search_result?keyword={encoded_keyword}&source=web"
+    search_url, alternative_url = build_search_urls(keyword)
     
     headers = get_enhanced_headers(referer=search_url)
     
@@ -643,71 +653,100 @@ def fetch_top_posts(keyword, max_posts=10):
         )
         
         # 解析HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 尝试多种选择器找到帖子容器
-        posts_container = soup.select('div.note-list section') or soup.select('div.items-wrapper div.item') or soup.select('div.feeds-container div.note-item')
+        results, captcha = parse_top_posts_html(response.text, max_posts)
         
-        if not posts_container:
-            # 如果找不到帖子，检查是否有反爬信息
-            if "验证" in soup.text or "校验" in soup.text or "captcha" in soup.text.lower():
+        if results is None:
+            if captcha:
                 logger.warning("检测到可能的反爬验证，使用备选方法...")
-                # 尝试备选选择器
-                posts_container = soup.select('div.search-container div.note-item') or soup.select('div.content div.note-item')
-                
-                if not posts_container:
-                    return fetch_top_posts_api(keyword, max_posts)
-            else:
-                logger.warning("未找到帖子容器，尝试使用备选方式...")
-                # 尝试一次不同的UA和请求参数
-                alternative_headers = get_enhanced_headers()
-                alternative_headers["User-Agent"] = "Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Mobile/15E148 Safari/604.1"
-                
-                alternative_url = f"https://www.xiaohongshu.com/search_result/xhs/search?keyword={encoded_keyword}&sort=general&page=1"
-                
-                alternative_response = AntiCrawlUtils.make_request(
-                    url=alternative_url,
-                    headers=alternative_headers,
-                    timeout=15
-                )
-                
-                if alternative_response.status_code == 200:
-                    alternative_soup = BeautifulSoup(alternative_response.text, 'html.parser')
-                    posts_container = alternative_soup.select('div.note-list section') or alternative_soup.select('div.items-wrapper div.item')
-                
-                if not posts_container:
-                    return fetch_top_posts_api(keyword, max_posts)
-        
-        results = []
-        for post in posts_container[:max_posts]:
-            # 尝试不同选择器提取标题、链接和点赞数
-            title_elem = post.select_one('div.note-info h3') or post.select_one('div.note-content div.title') or post.select_one('div.note-desc')
-            link_elem = post.select_one('a') or post.select_one('div.note-content a')
-            likes_elem = post.select_one('span.like-count') or post.select_one('div.note-metrics span.like')
+                return fetch_top_posts_api(keyword, max_posts)
             
-            title = title_elem.text.strip() if title_elem else "未找到标题"
-            post_url = "https://www.xiaohongshu.com" + link_elem['href'] if link_elem and 'href' in link_elem.attrs else "#"
-            likes = int(likes_elem.text.replace('赞', '').strip()) if likes_elem else 0
+            logger.warning("未找到帖子容器，尝试使用备选方式...")
+            # 尝试一次不同的UA和请求参数
+            alternative_headers = get_enhanced_headers()
+            alternative_headers["User-Agent"] = MOBILE_USER_AGENT
             
-            # 如果找不到点赞数，尝试使用顺序作为权重
-            if likes == 0:
-                likes = max_posts - len(results)
+            alternative_response = AntiCrawlUtils.make_request(
+                url=alternative_url,
+                headers=alternative_headers,
+                timeout=15
+            )
             
-            results.append({
-                "url": post_url,
-                "title": title,
-                "likes": likes
-            })
+            if alternative_response.status_code == 200:
+                results, _ = parse_top_posts_html(alternative_response.text, max_posts)
             
-        # 按点赞数排序
-        results.sort(key=lambda x: x["likes"], reverse=True)
-        return results[:max_posts]
+            if results is None:
+                return fetch_top_posts_api(keyword, max_posts)
+        
+        return results
     
     except Exception as e:
         logger.error(f"直接爬取搜索结果失败: {str(e)}")
         # 尝试使用API方法
         return fetch_top_posts_api(keyword, max_posts)
 
+def build_search_api_requests(keyword, max_posts=10):
+    """
+    构建搜索API请求参数
+    
+    Returns:
+        tuple: ((主API地址, 参数), (备用API地址, 参数))
+    """
+    timestamp = int(time.time() * 1000)
+    sign = hashlib.md5(f"keyword={keyword}&source=web&t={timestamp}".encode()).hexdigest()
+    
+    api_url = "https://www.xiaohongshu.com/api/sns/web/v1/search/notes"
+    params = {
+        "keyword": keyword,
+        "source": "web",
+        "t": timestamp,
+        "sign": sign,
+        "page": 1,
+        "page_size": max_posts,
+        "sort": "general",  # general, popularity, time
+    }
+    
+    alternative_api_url = "https://www.xiaohongshu.com/api/sns/web/v1/search/notes_category"
+    alternative_params = {
+        "keyword": keyword,
+        "page": 1,
+        "page_size": max_posts,
+        "sort": "general",
+        "t": timestamp
+    }
+    
+    return (api_url, params), (alternative_api_url, alternative_params)
+
+def parse_top_posts_api_data(data, max_posts=10):
+    """
+    解析搜索API返回的JSON数据
+    
+    Returns:
+        list: 热门帖子列表，数据结构异常时返回None
+    """
+    if not (data.get("success") and data.get("data") and data["data"].get("notes")):
+        return None
+    
+    results = []
+    for note in data["data"]["notes"][:max_posts]:
+        title = note.get("title", "未找到标题")
+        post_id = note.get("id", "")
+        post_url = f"https://www.xiaohongshu.com/discovery/item/{post_id}" if post_id else "#"
+        likes = note.get("likes", 0) or note.get("liked_count", 0)
+        
+        # 如果找不到点赞数，尝试使用顺序作为权重
+        if likes == 0:
+            likes = max_posts - len(results)
+        
+        results.append({
+            "url": post_url,
+            "title": title,
+            "likes": likes
+        })
+    
+    # 按点赞数排序
+    results.sort(key=lambda x: x["likes"], reverse=True)
+    return results[:max_posts]
+
 def fetch_top_posts_api(keyword, max_posts=10):
     """
     使用小红书搜索API获取热门帖子
@@ -723,19 +762,7 @@ def fetch_top_posts_api(keyword, max_posts=10):
     
     try:
         # 尝试使用新版API端点
-        timestamp = int(time.time() * 1000)
-        sign = hashlib.md5(f"keyword={keyword}&source=web&t={timestamp}".encode()).hexdigest()
-        
-        api_url = "https://www.xiaohongshu.com/api/sns/web/v1/search/notes"
-        params = {
-            "keyword": keyword,
-            "source": "web",
-            "t": timestamp,
-            "sign": sign,
-            "page": 1,
-            "page_size": max_posts,
-            "sort": "general",  # general, popularity, time
-        }
+        (api_url, params), (alternative_api_url, alternative_params) = build_search_api_requests(keyword, max_posts)
         
         headers = get_enhanced_headers(referer=f"https://www.xiaohongshu.com/search_result?keyword={quote(keyword)}", is_api=True)
         
@@ -752,16 +779,6 @@ def fetch_top_posts_api(keyword, max_posts=10):
         if response.status_code >= 400:
             logger.warning(f"API请求失败，状态码: {response.status_code}，尝试备用API")
             
-            # 尝试备用API接口
-            alternative_api_url = "https://www.xiaohongshu.com/api/sns/web/v1/search/notes_category"
-            alternative_params = {
-                "keyword": keyword,
-                "page": 1,
-                "page_size": max_posts,
-                "sort": "general",
-                "t": int(time.time() * 1000)
-            }
-            
             # 使用不同的UA和请求头
             alternative_headers = get_enhanced_headers(is_api=True)
             alternative_headers["User-Agent"] = get_random_user_agent()
@@ -781,32 +798,12 @@ def fetch_top_posts_api(keyword, max_posts=10):
                 
             response = alternative_response
         
-        data = response.json()
-        
-        if data.get("success") and data.get("data") and data["data"].get("notes"):
-            results = []
-            for note in data["data"]["notes"][:max_posts]:
-                title = note.get("title", "未找到标题")
-                post_id = note.get("id", "")
-                post_url = f"https://www.xiaohongshu.com/discovery/item/{post_id}" if post_id else "#"
-                likes = note.get("likes", 0) or note.get("liked_count", 0)
-                
-                # 如果找不到点赞数，尝试使用顺序作为权重
-                if likes == 0:
-                    likes = max_posts - len(results)
-                
-                results.append({
-                    "url": post_url,
-                    "title": title,
-                    "likes": likes
-                })
-            
-            # 按点赞数排序
-            results.sort(key=lambda x: x["likes"], reverse=True)
-            return results[:max_posts]
-        else:
+        results = parse_top_posts_api_data(response.json(), max_posts)
+        if results is None:
             logger.warning("API返回数据结构异常，使用模拟数据")
             return generate_mock_top_posts(keyword if isinstance(keyword, list) else [keyword])
+        
+        return results
             
     except Exception as e:
         logger.error(f"API获取热门帖子失败: {str(e)}")
@@ -1048,15 +1045,177 @@ def manual_input():
         "video": video if video else None
     }
 
-def analyze_content(content):
+def find_top_posts(keywords):
+    """搜索第一个关键词的热门帖子，失败时使用模拟数据"""
+    try:
+        return fetch_top_posts(keywords[0] if keywords else "好物推荐")
+    except Exception as e:
+        logger.error(f"爬取热门帖子失败: {str(e)}")
+        # 爬取失败时使用模拟数据
+        return generate_mock_top_posts(keywords)
+
+def analyze_media(content, keywords):
     """
-    分析帖子内容
+    分析帖子中的图片和视频
     
     Args:
         content: 帖子内容字典
+        keywords: 文本关键词，用于找出视频中额外出现的关键词
         
     Returns:
-        dict: 包含关键词和相关热门帖子的字典
+        dict: 媒体分析结果和建议，媒体分析模块不可用时返回None
+    """
+    if not MEDIA_ANALYSIS_AVAILABLE:
+        logger.warning("媒体分析模块不可用，跳过媒体分析")
+        return None
+    
+    logger.info("媒体分析模块可用，开始分析媒体内容")
+    # 使用增强的媒体分析
+    try:
+        # 图片分析
+        media_analysis = {}
+        
+        # 对图片进行分析
+        if content.get("images"):
+            images = content["images"]
+            image_count = len(images)
+            logger.info(f"分析 {image_count} 张图片")
+            
+            # 图片数量建议
+            media_suggestions = []
+            if image_count < 3:
+                media_suggestions.append(f"当前仅有{image_count}张图片，建议增加到3-9张，展示更多产品细节")
+            elif image_count > 9:
+                media_suggestions.append(f"图片数量({image_count})偏多，建议精选3-9张最具代表性的图片")
+            
+            # 尝试执行更深入的图片分析
+            try:
+                # 限制分析图片数量，避免过度请求
+                max_analyze_images = min(image_count, 3)
+                image_results = []
+                
+                # 使用媒体分析模块并发分析图片，结果顺序与图片顺序一致
+                logger.info(f"并发分析 {max_analyze_images} 张图片")
+                img_analyses = media_analyzer.batch_analyze_images(images, max_images=max_analyze_images)
+                
+                for i, img_analysis in enumerate(img_analyses):
+                    # 如果分析失败，使用基本分析结果
+                    if "error" in img_analysis:
+                        logger.warning(f"图片 {i+1} 分析失败: {img_analysis['error']}")
+                        continue
+                        
+                    image_results.append(img_analysis)
+                
+                # 如果至少有一张图片分析成功
+                if image_results:
+                    # 提取图片质量评分和吸引力评分
+                    avg_quality = sum(result.get("quality", 0) for result in image_results) / len(image_results)
+                    avg_appeal = sum(result.get("appeal", 0) for result in image_results) / len(image_results)
+                    
+                    # 提取共同关键词
+                    image_keywords = set()
+                    for result in image_results:
+                        if "keywords" in result:
+                            image_keywords.update(result["keywords"])
+                    
+                    # 只保留顶部5个关键词
+                    top_image_keywords = list(image_keywords)[:5]
+                    
+                    # 添加图片质量建议
+                    if avg_quality < 6:
+                        media_suggestions.append(f"图片质量评分较低 ({avg_quality:.1f}/10)，建议提高图片清晰度和光线")
+                    if avg_appeal < 6:
+                        media_suggestions.append(f"图片吸引力评分较低 ({avg_appeal:.1f}/10)，建议优化构图和主题突出度")
+                    
+                    # 保存图片分析结果
+                    media_analysis["image_analysis"] = {
+                        "quality": round(avg_quality, 1),
+                        "appeal": round(avg_appeal, 1),
+                        "keywords": top_image_keywords
+                    }
+            except Exception as image_analysis_err:
+                logger.error(f"高级图片分析失败: {str(image_analysis_err)}")
+        else:
+            media_suggestions = ["未检测到图片，建议添加产品图片以增强内容可视化效果"]
+        
+        # 视频分析
+        if content.get("video"):
+            video_url = content["video"]
+            logger.info(f"开始分析视频: {video_url[:50]}...")
+            
+            try:
+                # 分析视频内容
+                video_analysis = media_analyzer.analyze_video(video_url)
+                
+                # 如果分析成功
+                if "quality" in video_analysis:
+                    # 添加视频质量建议
+                    if video_analysis["quality"] < 6:
+                        media_suggestions.append(f"视频质量评分较低 ({video_analysis['quality']}/10)，建议提高视频清晰度和稳定性")
+                    if video_analysis["appeal"] < 6:
+                        media_suggestions.append(f"视频吸引力评分较低 ({video_analysis['appeal']}/10)，建议优化内容叙事和视觉效果")
+                        
+                    # 添加视频关键词
+                    if "keywords" in video_analysis:
+                        # 获取所有关键词
+                        all_keywords = set(keywords)
+                        video_keywords = set(video_analysis.get("keywords", []))
+                        
+                        # 找出视频关键词中未包含在文本关键词中的
+                        new_keywords = video_keywords - all_keywords
+                        if new_keywords:
+                            media_suggestions.append(f"视频包含额外关键词: {', '.join(new_keywords)}，建议在正文中适当提及")
+                    
+                    # 保存视频分析结果
+                    media_analysis["video_analysis"] = {
+                        "quality": video_analysis["quality"],
+                        "appeal": video_analysis["appeal"],
+                        "keywords": video_analysis.get("keywords", [])[:5],
+                        "frame_count": video_analysis.get("frame_count", 0)
+                    }
+            except Exception as video_err:
+                logger.error(f"视频分析失败: {str(video_err)}")
+                media_suggestions.append("检测到视频但无法解析，请确保视频格式正确并可公开访问")
+        else:
+            media_suggestions.append("未检测到视频，建议添加产品使用视频，可以展示实际效果和使用方法")
+        
+        # 添加综合建议
+        if len(content.get("images", [])) > 0 and not content.get("video"):
+            media_suggestions.append("建议将最具特色的一张图片制作成短视频，增加内容多样性")
+        
+        # 添加分析结果
+        media_analysis["suggestions"] = media_suggestions
+        return media_analysis
+        
+    except Exception as media_err:
+        logger.error(f"媒体分析总体失败: {str(media_err)}")
+        # 基础分析作为备用
+        media_suggestions = []
+        
+        # 图片基础分析
+        if content.get("images"):
+            image_count = len(content["images"])
+            if image_count < 3:
+                media_suggestions.append(f"当前仅有{image_count}张图片，建议增加到3-9张，展示更多产品细节")
+            elif image_count > 9:
+                media_suggestions.append(f"图片数量({image_count})偏多，建议精选3-9张最具代表性的图片")
+        else:
+            media_suggestions.append("未检测到图片，建议添加产品图片以增强内容可视化效果")
+        
+        # 视频基础分析
+        if not content.get("video"):
+            media_suggestions.append("未检测到视频，建议添加产品使用视频，可以展示实际效果和使用方法")
+        
+        return {
+            "suggestions": media_suggestions
+        }
+
+def build_analysis_graph(content):
+    """
+    构建帖子分析的任务图
+    
+    关键词提取完成后，热门帖子搜索和媒体分析同时进行。
+    任务名称: keywords, top_posts, media_analysis
     """
     text = content["text"]
     title = content["title"]
@@ -1064,174 +1223,41 @@ def analyze_content(content):
     # 记录开始分析
     logger.info(f"开始分析内容: 标题={title[:20]}...")
     
-    # 简单关键词提取
-    keywords = extract_simple_keywords(title + " " + text)
-    logger.info(f"提取关键词: {keywords}")
+    def extract_keywords():
+        # 简单关键词提取
+        keywords = extract_simple_keywords(title + " " + text)
+        logger.info(f"提取关键词: {keywords}")
+        return keywords
     
-    # 尝试爬取相关热门帖子
-    try:
-        top_posts = fetch_top_posts(keywords[0] if keywords else "好物推荐")
-    except Exception as e:
-        logger.error(f"爬取热门帖子失败: {str(e)}")
-        # 爬取失败时使用模拟数据
-        top_posts = generate_mock_top_posts(keywords)
+    graph = TaskGraph()
+    graph.add("keywords", extract_keywords)
+    graph.add("top_posts", find_top_posts, deps=("keywords",))
+    graph.add("media_analysis", lambda keywords: analyze_media(content, keywords), deps=("keywords",))
+    return graph
+
+def analyze_content(content):
+    """
+    分析帖子内容
+    
+    关键词提取完成后，热门帖子搜索和媒体分析同时进行。
+    
+    Args:
+        content: 帖子内容字典
+        
+    Returns:
+        dict: 包含关键词和相关热门帖子的字典
+    """
+    results = build_analysis_graph(content).run()
     
     # 创建结果字典
     result = {
-        "keywords": keywords, 
-        "top_posts": top_posts
+        "keywords": results["keywords"], 
+        "top_posts": results["top_posts"]
     }
     
-    # 分析图片和视频内容(如果可用)
-    if MEDIA_ANALYSIS_AVAILABLE:
-        logger.info("媒体分析模块可用，开始分析媒体内容")
-        # 使用增强的媒体分析
-        try:
-            # 图片分析
-            media_analysis = {}
-            
-            # 对图片进行分析
-            if content.get("images"):
-                images = content["images"]
-                image_count = len(images)
-                logger.info(f"分析 {image_count} 张图片")
-                
-                # 图片数量建议
-                media_suggestions = []
-                if image_count < 3:
-                    media_suggestions.append(f"当前仅有{image_count}张图片，建议增加到3-9张，展示更多产品细节")
-                elif image_count > 9:
-                    media_suggestions.append(f"图片数量({image_count})偏多，建议精选3-9张最具代表性的图片")
-                
-                # 尝试执行更深入的图片分析
-                try:
-                    # 限制分析图片数量，避免过度请求
-                    max_analyze_images = min(image_count, 3)
-                    image_results = []
-                    
-                    # 使用媒体分析模块分析图片
-                    for i in range(max_analyze_images):
-                        img_url = images[i]
-                        logger.info(f"分析图片 {i+1}/{max_analyze_images}: {img_url[:50]}...")
-                        
-                        try:
-                            # 分析图片内容
-                            img_analysis = media_analyzer.analyze_image(img_url)
-                            
-                            # 如果分析失败，使用基本分析结果
-                            if "error" in img_analysis:
-                                logger.warning(f"图片 {i+1} 分析失败: {img_analysis['error']}")
-                                continue
-                                
-                            image_results.append(img_analysis)
-                        except Exception as img_err:
-                            logger.error(f"图片 {i+1} 分析异常: {str(img_err)}")
-                    
-                    # 如果至少有一张图片分析成功
-                    if image_results:
-                        # 提取图片质量评分和吸引力评分
-                        avg_quality = sum(result.get("quality", 0) for result in image_results) / len(image_results)
-                        avg_appeal = sum(result.get("appeal", 0) for result in image_results) / len(image_results)
-                        
-                        # 提取共同关键词
-                        image_keywords = set()
-                        for result in image_results:
-                            if "keywords" in result:
-                                image_keywords.update(result["keywords"])
-                        
-                        # 只保留顶部5个关键词
-                        top_image_keywords = list(image_keywords)[:5]
-                        
-                        # 添加图片质量建议
-                        if avg_quality < 6:
-                            media_suggestions.append(f"图片质量评分较低 ({avg_quality:.1f}/10)，建议提高图片清晰度和光线")
-                        if avg_appeal < 6:
-                            media_suggestions.append(f"图片吸引力评分较低 ({avg_appeal:.1f}/10)，建议优化构图和主题突出度")
-                        
-                        # 保存图片分析结果
-                        media_analysis["image_analysis"] = {
-                            "quality": round(avg_quality, 1),
-                            "appeal": round(avg_appeal, 1),
-                            "keywords": top_image_keywords
-                        }
-                except Exception as image_analysis_err:
-                    logger.error(f"高级图片分析失败: {str(image_analysis_err)}")
-            else:
-                media_suggestions = ["未检测到图片，建议添加产品图片以增强内容可视化效果"]
-            
-            # 视频分析
-            if content.get("video"):
-                video_url = content["video"]
-                logger.info(f"开始分析视频: {video_url[:50]}...")
-                
-                try:
-                    # 分析视频内容
-                    video_analysis = media_analyzer.analyze_video(video_url)
-                    
-                    # 如果分析成功
-                    if "quality" in video_analysis:
-                        # 添加视频质量建议
-                        if video_analysis["quality"] < 6:
-                            media_suggestions.append(f"视频质量评分较低 ({video_analysis['quality']}/10)，建议提高视频清晰度和稳定性")
-                        if video_analysis["appeal"] < 6:
-                            media_suggestions.append(f"视频吸引力评分较低 ({video_analysis['appeal']}/10)，建议优化内容叙事和视觉效果")
-                            
-                        # 添加视频关键词
-                        if "keywords" in video_analysis:
-                            # 获取所有关键词
-                            all_keywords = set(keywords)
-                            video_keywords = set(video_analysis.get("keywords", []))
-                            
-                            # 找出视频关键词中未包含在文本关键词中的
-                            new_keywords = video_keywords - all_keywords
-                            if new_keywords:
-                                media_suggestions.append(f"视频包含额外关键词: {', '.join(new_keywords)}，建议在正文中适当提及")
-                        
-                        # 保存视频分析结果
-                        media_analysis["video_analysis"] = {
-                            "quality": video_analysis["quality"],
-                            "appeal": video_analysis["appeal"],
-                            "keywords": video_analysis.get("keywords", [])[:5],
-                            "frame_count": video_analysis.get("frame_count", 0)
-                        }
-                except Exception as video_err:
-                    logger.error(f"视频分析失败: {str(video_err)}")
-                    media_suggestions.append("检测到视频但无法解析，请确保视频格式正确并可公开访问")
-            else:
-                media_suggestions.append("未检测到视频，建议添加产品使用视频，可以展示实际效果和使用方法")
-            
-            # 添加综合建议
-            if len(content.get("images", [])) > 0 and not content.get("video"):
-                media_suggestions.append("建议将最具特色的一张图片制作成短视频，增加内容多样性")
-            
-            # 添加分析结果
-            media_analysis["suggestions"] = media_suggestions
-            result["media_analysis"] = media_analysis
-            
-        except Exception as media_err:
-            logger.error(f"媒体分析总体失败: {str(media_err)}")
-            # 基础分析作为备用
-            media_suggestions = []
-            
-            # 图片基础分析
-            if content.get("images"):
-                image_count = len(content["images"])
-                if image_count < 3:
-                    media_suggestions.append(f"当前仅有{image_count}张图片，建议增加到3-9张，展示更多产品细节")
-                elif image_count > 9:
-                    media_suggestions.append(f"图片数量({image_count})偏多，建议精选3-9张最具代表性的图片")
-            else:
-                media_suggestions.append("未检测到图片，建议添加产品图片以增强内容可视化效果")
-            
-            # 视频基础分析
-            if not content.get("video"):
-                media_suggestions.append("未检测到视频，建议添加产品使用视频，可以展示实际效果和使用方法")
-            
-            result["media_analysis"] = {
-                "suggestions": media_suggestions
-            }
-    else:
-        logger.warning("媒体分析模块不可用，跳过媒体分析")
+    # 添加图片和视频分析结果(如果可用)
+    if results["media_analysis"] is not None:
+        result["media_analysis"] = results["media_analysis"]
     
     return result
 